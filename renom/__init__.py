@@ -5,8 +5,14 @@ from __future__ import absolute_import
 from renom.layers.activation import *
 from renom.layers.function import *
 from renom.layers.loss import *
-from renom.core import Variable
+from renom.core import Variable, no_grad, set_backward_threads, precision_policy
 from renom.operation import *
 from renom.optimizer import *
+from renom.tracer import trace
+from renom.elementwise import fuse
+from renom.profiler import profile
+from renom.inference import optimize_for_inference
+from renom.sparse import RowSparse
+from renom.layers.function.conv_engine import conv_autotune
 
 __version__ = "2.4.1"
@@ -38,10 +38,10 @@ class DQN(object):
         Returns:
             (int, ndarray): Action.
         """
-        self._network.set_models(inference=True)
         shape = [-1, ] + list(self._state_size)
         s = state.reshape(shape)
-        return np.argmax(self._network(s).as_ndarray(), axis=1)
+        with self._network.inference_mode():
+            return np.argmax(self._network(s).as_ndarray(), axis=1)
 
     def update(self):
         """This function updates target network."""
@@ -6,9 +6,96 @@ from . config import precision
 import contextlib
 import numpy as np
 import itertools
-from numbers import Number
+import threading
+from numbers import Number, Integral
 
 from renom.cuda import *
+from renom.mempool import cpu_pool
+from renom.sparse import RowSparse
+
+_backward_threads = 1
+_executor = None
+_worker = threading.local()
+
+
+def set_backward_threads(num_threads):
+    '''Sets the number of threads used for backward propagation on CPU.
+
+    If ``num_threads`` is greater than 1, nodes of independent branches of
+    a computational graph are processed in parallel. Most numpy operations
+    release the GIL, so that models which have parallel branches run
+    faster on multi-core machines. Note that the order of accumulation of
+    gradients is not deterministic in this mode.
+
+    Args:
+        num_threads (int): Number of threads. 1 disables parallel execution.
+
+    Example:
+        >>> import renom as rm
+        >>> rm.set_backward_threads(4)
+    '''
+    global _backward_threads, _executor
+    num_threads = int(num_threads)
+    if num_threads < 1:
+        raise ValueError('num_threads must be positive.')
+    if num_threads > 1:
+        try:
+            import concurrent.futures
+        except ImportError:
+            raise ImportError('Parallel backward propagation requires concurrent.futures. '
+                              'Install the "futures" package on Python 2.')
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+    _backward_threads = num_threads
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Imported here, since Python 2 lacks concurrent.futures unless the
+        # "futures" backport is installed.
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor(_backward_threads)
+    return _executor
+
+
+def _add_sparse(a, b):
+    # Sum of gradients either of which is RowSparse. The result is dense
+    # unless both of them are RowSparse.
+    if not isinstance(a, RowSparse):
+        a, b = b, a
+    return a + (b if isinstance(b, RowSparse) else to_value(b))
+
+
+def _is_basic_index(index):
+    if not isinstance(index, tuple):
+        index = (index, )
+    return all((isinstance(i, (Integral, slice)) and not isinstance(i, bool)) or
+               i is None or i is Ellipsis for i in index)
+
+
+class _Scatter(object):
+    # Gradient which is zero except for the elements selected by ``index``.
+    # Grads.add accumulates it into the gradient of the node in place when
+    # the buffer of the gradient is owned, without allocating a dense array.
+
+    def __init__(self, index, values, shape, dtype):
+        self.index = index
+        self.values = values
+        self.shape = shape
+        self.dtype = dtype
+
+    def add_to(self, out):
+        if _is_basic_index(self.index):
+            out[self.index] += self.values
+        else:
+            # Repeated indices are accumulated.
+            np.add.at(out, self.index, self.values)
+        return out
+
+    def as_ndarray(self):
+        return self.add_to(np.zeros(self.shape, dtype=self.dtype))
 
 
 class Grads:
@@ -39,28 +126,135 @@ class Grads:
         self.stroage = {}
         self.variables = {}
         self._auto_updates = []
+        self._refcounts = collections.Counter()
+        self._backwards = collections.Counter()
+        self._order = []
+        self._scheduled = set()
+        self._owned = set()
+        self._lock = threading.Lock()
 
         if root is not None:
             self._build_refcounts(root)
 
     def _build_refcounts(self, root):
-        self._refcounts = collections.Counter()
-        self._backwards = collections.Counter()
-
-        q = collections.deque(root._args)
-
-        def walk():
-            while q:
-                t = q.pop()
-                if isinstance(t, Node):
-                    yield t
-                    if not getattr(t, '_no_backward', False):
-                        for c in t._args:
-                            q.append(c)
+        q = [root]
+        seen = set([id(root)])
+        while q:
+            t = q.pop()
+            if t._no_backward:
+                continue
+            for c in t._args:
+                if isinstance(c, Node):
+                    nodeid = id(c)
+                    self._refcounts[nodeid] += 1
+                    if nodeid not in seen:
+                        seen.add(nodeid)
+                        q.append(c)
+
+        # Sort nodes topologically. A node is scheduled after every node
+        # which refers it as an argument.
+        pending = dict(self._refcounts)
+        ready = [root]
+        while ready:
+            t = ready.pop()
+            self._order.append(t)
+            if t._no_backward:
+                continue
+            for c in t._args:
+                if isinstance(c, Node):
+                    nodeid = id(c)
+                    pending[nodeid] -= 1
+                    if not pending[nodeid]:
+                        ready.append(c)
+
+        self._scheduled = set(id(n) for n in self._order)
+
+    def _run_backward(self, release=False, **kwargs):
+        if _backward_threads > 1 and not is_cuda_active() and \
+                not getattr(_worker, 'active', False):
+            self._run_backward_parallel(release, **kwargs)
+        else:
+            for i, node in enumerate(self._order):
+                if release:
+                    self._order[i] = None
+                self._backward_node(node, release, **kwargs)
+
+        if release:
+            self._order = []
+            self.stroage.clear()
+
+    def _backward_node(self, node, release, **kwargs):
+        nodeid = id(node)
+        diff = self.variables.get(nodeid, None)
+        if diff is not None:
+            node.backward(self, diff, **kwargs)
+
+        if release:
+            # Every node which refers this node has been processed.
+            # Stored attributes and gradient are no longer required.
+            if node._args and not isinstance(node, Variable):
+                self.variables.pop(nodeid, None)
+            if node.attrs:
+                # Pooled buffers kept for backward propagation, such as
+                # im2col arrays, are given back to the pool.
+                values = [v for v in node.attrs.get_attrs() if type(v) is np.ndarray]
+                cpu_pool.free(*(values + [v.base for v in values]))
+                node.attrs.clear()
+            node._args = []
+            node._requires_grad = False
+
+    def _run_backward_parallel(self, release, **kwargs):
+        # A node is submitted to the thread pool when every node which refers
+        # it has been processed. Nodes which become ready at the same time are
+        # processed by the current thread and other threads.
+        if not self._order:
+            return
 
-        for n in walk():
-            nodeid = id(n)
-            self._refcounts[nodeid] += 1
+        executor = _get_executor()
+        pending = dict(self._refcounts)
+        lock = threading.Lock()
+        finished = threading.Event()
+        # 'active' counts submitted tasks which have not exited. It is updated
+        # before submission, so that it reaches zero only after every task
+        # has finished. No node is scheduled after an error.
+        state = {'active': 1, 'error': None}
+
+        def run(node):
+            _worker.active = True
+            try:
+                while node is not None:
+                    children = [] if node._no_backward else \
+                        [c for c in node._args if isinstance(c, Node)]
+                    self._backward_node(node, release, **kwargs)
+
+                    ready = []
+                    with lock:
+                        for c in children:
+                            nodeid = id(c)
+                            pending[nodeid] -= 1
+                            if not pending[nodeid]:
+                                ready.append(c)
+                        if state['error'] is not None:
+                            ready = []
+                        node = ready.pop() if ready else None
+                        state['active'] += len(ready)
+                    for c in ready:
+                        executor.submit(run, c)
+            except BaseException as e:
+                with lock:
+                    if state['error'] is None:
+                        state['error'] = e
+            finally:
+                _worker.active = False
+                with lock:
+                    state['active'] -= 1
+                    if not state['active']:
+                        finished.set()
+
+        executor.submit(run, self._order[0])
+        finished.wait()
+        if state['error'] is not None:
+            raise state['error']
 
     @contextlib.contextmanager
     def unlock_node(self, node):
@@ -73,36 +267,60 @@ class Grads:
 
     def store(self, node, dy):
         selfid = id(node)
-        self.stroage[selfid] = Node(dy)  # if cuda active, dy must be GPUValue type.
+        # if cuda active, dy must be GPUValue type.
+        self.stroage[selfid] = dy if isinstance(dy, np.ndarray) else Node(dy)
 
     def restore(self, node, default=None):
         selfid = id(node)
         return self.stroage.get(selfid, default)
 
-    def add(self, node, dy, caller=None):
-        selfid = id(node)
-        if selfid in self.variables:
-            v = self.variables[selfid]
-            with self.unlock_node(v):
+    def add(self, node, dy):
+        with self._lock:
+            selfid = id(node)
+            if selfid in self.variables:
+                v = self.variables[selfid]
+                with self.unlock_node(v):
+                    if isinstance(dy, GPUValue):
+                        diff = v.get_gpu() + dy
+                        v.set_gpu(diff)
+                    elif isinstance(dy, _Scatter) and type(v) is np.ndarray and \
+                            v.shape == dy.shape:
+                        if selfid not in self._owned:
+                            out = cpu_pool.empty(v.shape, np.result_type(v, dy.dtype))
+                            out[...] = v
+                            self.variables[selfid] = v = out
+                            self._owned.add(selfid)
+                        dy.add_to(v)
+                    elif isinstance(dy, _Scatter):
+                        self._add_dense(selfid, v, dy.as_ndarray())
+                    else:
+                        self._add_dense(selfid, v, dy)
+            else:
                 if isinstance(dy, GPUValue):
-                    diff = v.get_gpu() + dy
-                    v.set_gpu(diff)
-                else:
-                    v[...] += dy
+                    dy = Variable(dy)
+                elif isinstance(dy, _Scatter):
+                    dy = dy.as_ndarray()
+                    self._owned.add(selfid)
+                self.variables[selfid] = dy
+                if node._auto_update:
+                    self._auto_updates.append(node)
+
+            self._backwards[selfid] += 1
+            return self._refcounts[selfid] <= self._backwards[selfid], self
+
+    def _add_dense(self, selfid, v, dy):
+        if isinstance(v, RowSparse) or isinstance(dy, RowSparse):
+            self.variables[selfid] = _add_sparse(v, dy)
+            if not isinstance(self.variables[selfid], RowSparse):
+                self._owned.add(selfid)
+        elif selfid in self._owned or isinstance(v, Node):
+            v[...] += dy
         else:
-            if isinstance(dy, GPUValue):
-                dy = Variable(dy)
-            self.variables[selfid] = dy
-            if node._auto_update:
-                self._auto_updates.append(node)
-
-        if caller is not None:
-            caller_refs = self._refcounts[id(caller)] or 1
-        else:
-            caller_refs = 1
-        self._backwards[selfid] += caller_refs
-
-        return self._refcounts[selfid] <= self._backwards[selfid], GradsWithCaller(node, self)
+            # The first gradient may share its buffer with the gradient
+            # of other node. Allocate new buffer before accumulation.
+            out = cpu_pool.empty(np.broadcast(v, dy).shape, np.result_type(v, dy))
+            self.variables[selfid] = np.add(v, dy, out=out)
+            self._owned.add(selfid)
 
     _omit = object()
 
@@ -125,6 +343,70 @@ class Grads:
     def set(self, node, diff):
         self.variables[id(node)] = diff
 
+    def __iadd__(self, other):
+        '''Adds gradients of auto-update variables in ``other`` to this object.
+
+        Only gradients of leaf variables which are updated by :meth:`update`
+        are merged. This allows accumulation of gradients of several
+        micro-batches without keeping their computational graphs.
+
+        Example:
+            >>> import numpy as np
+            >>> import renom as rm
+            >>> model = rm.Dense(2)
+            >>> x = np.random.rand(8, 3)
+            >>> total = None
+            >>> for micro in np.split(x, 4):
+            ...     with model.train():
+            ...         loss = rm.sum(model(micro))
+            ...     if total is None:
+            ...         total = loss.grad()
+            ...     else:
+            ...         total += loss.grad()
+            ...
+            >>> total *= 1 / 4.
+            >>> total.update(rm.Sgd(0.01))
+        '''
+        with self._lock:
+            for node in other._auto_updates:
+                nodeid = id(node)
+                diff = other.variables.get(nodeid, None)
+                if diff is None:
+                    continue
+
+                cur = self.variables.get(nodeid, None)
+                if cur is None:
+                    self.variables[nodeid] = diff
+                    self._auto_updates.append(node)
+                elif is_cuda_active():
+                    self.variables[nodeid] = Variable(get_gpu(cur) + get_gpu(diff))
+                elif isinstance(cur, RowSparse) or isinstance(diff, RowSparse):
+                    self.variables[nodeid] = _add_sparse(cur, diff)
+                    if not isinstance(self.variables[nodeid], RowSparse):
+                        self._owned.add(nodeid)
+                elif nodeid in self._owned:
+                    cur += to_value(diff)
+                else:
+                    # The buffer may be shared with other Grads object.
+                    self.variables[nodeid] = np.add(to_value(cur), to_value(diff))
+                    self._owned.add(nodeid)
+        return self
+
+    def __imul__(self, factor):
+        '''Multiplies every gradient by ``factor``.'''
+        with self._lock:
+            for nodeid, diff in list(self.variables.items()):
+                if is_cuda_active():
+                    self.variables[nodeid] = Variable(get_gpu(diff) * factor)
+                elif isinstance(diff, RowSparse):
+                    self.variables[nodeid] = diff * factor
+                elif nodeid in self._owned:
+                    diff *= factor
+                else:
+                    self.variables[nodeid] = to_value(diff) * factor
+                    self._owned.add(nodeid)
+        return self
+
     def update_node(self, node, opt=None):
         if node.prevent_update:
             return
@@ -138,6 +420,8 @@ class Grads:
                     if is_cuda_active():
                         ngpu = get_gpu(node)
                         ngpu -= get_gpu(dy)
+                    elif isinstance(dy, RowSparse):
+                        node[dy.index] -= dy.values
                     else:
                         node[...] -= dy
             node.detach_graph()
@@ -156,27 +440,24 @@ class Grads:
                     are not updated.
         '''
 
+        packed = getattr(opt, "_packed", None)
+        if packed is not None and not is_cuda_active():
+            # Parameters packed by Optimizer.pack are updated at once.
+            done = packed.update(opt, self, models)
+        else:
+            done = ()
+
         if not models:
             for node in self._auto_updates:
-                self.update_node(node, opt)
+                if id(node) not in done:
+                    self.update_node(node, opt)
         else:
             for model in models:
                 for node in model.params.values():
-                    if id(node) in self.variables:
+                    if id(node) in self.variables and id(node) not in done:
                         self.update_node(node, opt)
 
 
-class GradsWithCaller(object):
-    def __init__(self, caller, grad):
-        self.grad__ = getattr(grad, 'grad__', grad)
-        self.caller = caller
-
-    def add(self, node, dy):
-        return self.grad__.add(node, dy, self.caller)
-
-    def __getattr__(self, name):
-        return getattr(self.grad__, name)
-
 # todo: move this method to Cython
 
 
@@ -679,6 +960,10 @@ class GPUValue(object):
             cuadd(self, other, ret)
             return ret
 
+    def __radd__(self, other):
+        with use_device(self.device_id):
+            return self.__add__(other)
+
     def __iadd__(self, other):
         with use_device(self.device_id):
             assert getattr(self, "shape", (1,)) == getattr(self, "shape", (1,))
@@ -737,6 +1022,10 @@ class GPUValue(object):
             cusub(self, other, ret)
             return ret
 
+    def __rsub__(self, other):
+        with use_device(self.device_id):
+            return -self + other
+
     def __isub__(self, other):
         with use_device(self.device_id):
             assert getattr(self, "shape", (1,)) == getattr(self, "shape", (1,))
@@ -832,8 +1121,24 @@ def to_value(array):
         return array
 
 
+class _Stored(object):
+    '''Array stored in lower precision by the precision policy.'''
+
+    __slots__ = ('value', 'dtype')
+
+    def __init__(self, value, dtype):
+        self.value = value
+        self.dtype = dtype
+
+    @property
+    def nbytes(self):
+        return self.value.nbytes
+
+
 class GraphAttrs(object):
 
+    STORAGE_DTYPE = None
+
     def __init__(self):
         object.__setattr__(self, 'v__attrs', {})
 
@@ -846,14 +1151,27 @@ class GraphAttrs(object):
     def get_attrs(self):
         return self.v__attrs.values()
 
+    def set_state(self, name, value):
+        '''Sets an attribute which is read by following forward calculation,
+        such as moving averages of batch normalization. It is kept in its
+        dtype regardless of the storage dtype of the precision policy.'''
+        self.v__attrs[name] = value
+
     def __setattr__(self, name, value):
+        storage = self.STORAGE_DTYPE
+        if storage is not None and type(value) is np.ndarray and value.dtype.kind == 'f' \
+                and value.dtype.itemsize > storage.itemsize:
+            value = _Stored(value.astype(storage), value.dtype)
         self.v__attrs[name] = value
 
     def __getattr__(self, name):
         try:
-            return self.v__attrs[name]
+            value = self.v__attrs[name]
         except KeyError:
             raise AttributeError('%r has no attribute %r' % (self, name))
+        if type(value) is _Stored:
+            return value.value.astype(value.dtype)
+        return value
 
 
 class Node(np.ndarray):
@@ -871,9 +1189,15 @@ class Node(np.ndarray):
     _gpu = None
     attrs = None
     ACTIVE_NODE = None
+    COMPUTE_DTYPE = precision
+    TRACER = None
+    REPLAY_NODE = None
+    PROFILER = None
+    NO_GRAD = False
     _model = None
     _auto_update = False
     _no_backward = False
+    _requires_grad = False
     _args = ()
 
     def __new__(cls, value):
@@ -882,40 +1206,77 @@ class Node(np.ndarray):
 
     @classmethod
     def _create_node(cls, value):
+        target = Node.REPLAY_NODE
+        if target is not None and type(target) is cls:
+            # A traced operation is replayed. The recorded node is refilled
+            # instead of creating a new node.
+            Node.REPLAY_NODE = None
+            target._refill(value)
+            return target
+
         if isinstance(value, np.ndarray):
-            ret = value.astype(precision).view(cls)
+            if cls.NO_GRAD and value.dtype == cls.COMPUTE_DTYPE and not issubclass(cls, Variable):
+                ret = value.view(cls)
+            else:
+                ret = value.astype(cls.COMPUTE_DTYPE).view(cls)
         elif isinstance(value, GPUValue):
             ret = super(Node, cls).__new__(
                 cls, shape=value.shape, dtype=value.dtype)
             ret._gpu = value
 
         elif isinstance(value, Number):
-            ret = np.array(value, dtype=precision).view(cls)
+            ret = np.array(value, dtype=cls.COMPUTE_DTYPE).view(cls)
         else:
             raise ValueError('Invalid Node value: %r' % value)
 
-        assert ret.dtype == precision, (
+        assert ret.dtype == cls.COMPUTE_DTYPE, (
             "Type miss matched. Required is {}, actual is {}".format(
-                precision().dtype, ret.dtype))
+                np.dtype(cls.COMPUTE_DTYPE), ret.dtype))
 
         ret.attrs = GraphAttrs()
-        if cls.ACTIVE_NODE is not None:
+        if cls.ACTIVE_NODE is not None and not cls.NO_GRAD:
             cls.ACTIVE_NODE[id(ret)] = ret
         return ret
 
     @classmethod
     def calc_value(cls, *args, **kwargs):
-        if is_cuda_active():
-            value = cls._oper_gpu(*args, **kwargs)
-        else:
-            value = cls._oper_cpu(*args, **kwargs)
+        tracer = cls.TRACER
+        if tracer is not None:
+            tracer.depth += 1
+        profiler = cls.PROFILER
+        if profiler is not None:
+            frame = profiler.begin(cls, 'forward')
+        value = None
+        try:
+            if is_cuda_active():
+                value = cls._oper_gpu(*args, **kwargs)
+            else:
+                value = cls._oper_cpu(*args, **kwargs)
+        finally:
+            if tracer is not None:
+                tracer.depth -= 1
+            if profiler is not None:
+                profiler.end(frame, value, args)
         return value
 
     def __init__(self, *args, **kwargs):
         self.setflags(write=False)
-        self._args = [a for a in args if isinstance(a, Node)]
-        self._args.extend(a for a in kwargs.values() if isinstance(a, Node))
+        if self.NO_GRAD:
+            self.attrs.clear()
+            return
+        inputs = []
+        for a in itertools.chain(args, kwargs.values()):
+            if isinstance(a, Node):
+                inputs.append(a)
+            elif isinstance(a, (list, tuple)):
+                inputs.extend(v for v in a if isinstance(v, Node))
+        self._args = inputs
+        self._requires_grad = any(a.requires_grad for a in inputs)
         self._reduce_graph()
+        if self.TRACER is not None:
+            self.TRACER.record(self, args, kwargs)
+        if self.PROFILER is not None:
+            self.PROFILER.bind(self)
         return
 
     @property
@@ -930,6 +1291,17 @@ class Node(np.ndarray):
     def auto_update(self, value):
         raise Exception()
 
+    @property
+    def requires_grad(self):
+        '''True if gradients must be propagated to this node.
+
+        Variables require gradients while they are updated by their model.
+        Other nodes cache the flag of their inputs on construction.
+        '''
+        if self._auto_update:
+            return self.auto_update and not self.prevent_update
+        return self._requires_grad
+
     @property
     def prevent_update(self):
         if self._model:
@@ -963,6 +1335,19 @@ class Node(np.ndarray):
         self.release_gpu()
         self._gpu = gpu
 
+    def _refill(self, value):
+        # Overwrites the value of this node and clears its attributes.
+        if isinstance(value, GPUValue):
+            self.set_gpu(value)
+        else:
+            if np.shape(value) != self.shape:
+                raise ValueError('Shape of %s changed from traced shape %s to %s.' %
+                                 (type(self).__name__, self.shape, np.shape(value)))
+            self.setflags(write=True)
+            np.ndarray.__setitem__(self, Ellipsis, value)
+            self.setflags(write=False)
+        self.attrs.clear()
+
     def to_cpu(self):
         '''Send the data on GPU device to CPU.'''
         if self._gpu:
@@ -1005,7 +1390,7 @@ class Node(np.ndarray):
         if self._gpu:
             return self._gpu.new_array()
         if isinstance(self, Number):
-            return np.array(self, dtype=precision)
+            return np.array(self, dtype=self.COMPUTE_DTYPE)
         else:
             ret = np.ndarray(shape=self.shape, dtype=self.dtype, buffer=self)
             ret.setflags(write=True)
@@ -1025,19 +1410,20 @@ class Node(np.ndarray):
             initial (ndarray): Initial value of following the graph.
             detach_graph (boolean): If it's True, the computational graph will be destroyed.
         '''
-        if not self._has_autoupdate():
+        if not self._requires_grad:
             return Grads()
 
         if initial is None:
             if self.size > 1:
                 raise ValueError("Initial diff is required for scalar value.")
-            initial = np.ones_like(self).astype(precision)
+            initial = np.ones_like(self)
             if is_cuda_active():
                 initial = Node(initial)
                 initial.to_gpu()
 
         context = Grads(self)
-        self._update_diff(context, initial, **kwargs)
+        context.add(self, initial)
+        context._run_backward(release=detach_graph, **kwargs)
 
         if detach_graph:
             self.detach_graph()
@@ -1045,7 +1431,9 @@ class Node(np.ndarray):
 
     def _update_diff(self, context, dy, **kwargs):
         ready, context = context.add(self, dy)
-        if ready:
+        # Scheduled nodes are processed by Grads._run_backward in topological
+        # order. Other nodes are not reachable through _args, so propagate now.
+        if ready and id(self) not in context._scheduled:
             diff = context.get(self)
             self.backward(context, diff, **kwargs)
 
@@ -1054,48 +1442,47 @@ class Node(np.ndarray):
             return self.attrs.get_attrs()
         return []
 
-    def _has_autoupdate(self):
-        '''Check if the graph to witch this node belongs need to update.'''
-
-        for v in self._get_graph():
-            if isinstance(v, Node):
-                if v.auto_update:
-                    return True
-
-                if any((o is not None) for o in v._get_graph()):
-                    return True
-
     def _reduce_graph(self):
-        if self.attrs:
-            if not self._has_autoupdate():
-                self._no_backward = True
-                self.attrs.clear()
-                self._args = []
+        if not self._requires_grad:
+            self._no_backward = True
+            self.attrs.clear()
+            self._args = []
         return False
 
     def detach_graph(self):
         '''This method destroys computational graph.'''
 
-        for v in self._get_graph():
-            if isinstance(v, Node):
-                v.detach_graph()
-        if self.attrs:
-            self.attrs.clear()
+        q = [self]
+        while q:
+            t = q.pop()
+            for v in t._get_graph():
+                if isinstance(v, Node):
+                    q.append(v)
+            if t.attrs:
+                t.attrs.clear()
 
-        self._args = []
+            t._args = []
+            t._requires_grad = False
 
     def backward(self, context, dy, **kwargs):
         if self._no_backward:
             return
 
-        if is_cuda_active():
-            if self._gpu:
-                with use_device(self._gpu.device_id):
+        profiler = self.PROFILER
+        if profiler is not None:
+            frame = profiler.begin(type(self), 'backward', self)
+        try:
+            if is_cuda_active():
+                if self._gpu:
+                    with use_device(self._gpu.device_id):
+                        return self._backward_gpu(context, dy, **kwargs)
+                else:
                     return self._backward_gpu(context, dy, **kwargs)
             else:
-                return self._backward_gpu(context, dy, **kwargs)
-        else:
-            return self._backward_cpu(context, dy, **kwargs)
+                return self._backward_cpu(context, dy, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.end(frame)
 
     def __neg__(self):
         return Neg(self)
@@ -1369,6 +1756,85 @@ class Node(np.ndarray):
         return Reshape(self, shape)
 
 
+@contextlib.contextmanager
+def no_grad():
+    '''Context manager to disable creation of computational graph.
+
+    Nodes created in this context have no reference to their inputs and
+    can not be used for backward propagation. Results of operations are
+    wrapped without being copied, if their dtype matches to the precision.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> x = rm.Variable(np.random.rand(2, 3))
+        >>> with rm.no_grad():
+        ...     z = rm.sum(x * 2)
+        ...
+        >>> print(z.grad().get(x, None))
+        None
+    '''
+    prev = Node.NO_GRAD
+    Node.NO_GRAD = True
+    try:
+        yield
+    finally:
+        Node.NO_GRAD = prev
+
+
+def get_precision():
+    '''Returns the dtype of values of Node objects in the current precision
+    policy.'''
+    return Node.COMPUTE_DTYPE
+
+
+@contextlib.contextmanager
+def precision_policy(compute=None, storage=None):
+    '''Context manager to change the precision of calculation.
+
+    Values of Node objects created in this context have the dtype
+    ``compute``. Parameters created by initializers in this context also
+    have the dtype ``compute``. If ``storage`` is specified, floating point
+    arrays which are kept for backward propagation, such as im2col buffers
+    and dropout masks, are stored with the dtype ``storage`` and restored
+    to their original dtype when they are used. States which are read by
+    following forward calculation, such as moving averages of batch
+    normalization, keep their dtype. Backward propagation should be
+    executed in the same context.
+
+    The compute dtype can be changed only on CPU.
+
+    Args:
+        compute (dtype): Dtype of calculation. If None, the precision is not changed.
+        storage (dtype): Dtype of arrays stored for backward propagation.
+            For example, ``np.float16`` halves the memory of them. If None,
+            the storage dtype is not changed.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> x = rm.Variable(np.random.rand(2, 3))
+        >>> with rm.precision_policy(compute=np.float64):
+        ...     z = rm.sum(x * x)
+        ...     grad = z.grad()
+        ...
+        >>> z.dtype
+        dtype('float64')
+    '''
+    prev = Node.COMPUTE_DTYPE, GraphAttrs.STORAGE_DTYPE
+    if compute is not None:
+        compute = np.dtype(compute).type
+        if is_cuda_active() and compute != precision:
+            raise ValueError('Precision of calculation can not be changed on GPU.')
+        Node.COMPUTE_DTYPE = compute
+    if storage is not None:
+        GraphAttrs.STORAGE_DTYPE = np.dtype(storage)
+    try:
+        yield
+    finally:
+        Node.COMPUTE_DTYPE, GraphAttrs.STORAGE_DTYPE = prev
+
+
 class Variable(Node):
     '''Variable class.
 
@@ -1392,6 +1858,11 @@ class Variable(Node):
         ret._auto_update = auto_update
         return ret
 
+    def __init__(self, value, auto_update=True):
+        # Variable is a leaf of computational graph even if it is created
+        # from a Node object.
+        super(Variable, self).__init__()
+
     def backward(self, context, dy, **kwargs):
         pass
 
@@ -2035,10 +2506,14 @@ class GetItem(BinOp):
         return get_gpu(lhs)[rhs]
 
     def _backward_cpu(self, context, dy, **kwargs):
-        if isinstance(self.attrs._lhs, Node):
-            zero = np.zeros_like(np.array(self.attrs._lhs))
-            zero[self.attrs._rhs] = np.array(dy)
-            self.attrs._lhs._update_diff(context, zero, **kwargs)
+        lhs = self.attrs._lhs
+        if isinstance(lhs, Node):
+            rhs = self.attrs._rhs
+            if isinstance(rhs, Node):
+                rhs = to_value(rhs)
+            elif isinstance(rhs, tuple):
+                rhs = tuple(to_value(i) if isinstance(i, Node) else i for i in rhs)
+            lhs._update_diff(context, _Scatter(rhs, to_value(dy), lhs.shape, lhs.dtype), **kwargs)
 
     def _backward_gpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._lhs, Node):
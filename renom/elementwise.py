@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import functools
+import operator
+from numbers import Number
+import numpy as np
+from renom.core import Node, get_gpu, to_value, broad_cast, cu_broad_cast
+from renom.cuda import is_cuda_active
+
+_ADD, _SUB, _MUL, _DIV, _NEG, _POW = range(6)
+
+_UFUNCS = {
+    _ADD: np.add,
+    _SUB: np.subtract,
+    _MUL: np.multiply,
+    _DIV: np.true_divide,
+    _POW: np.power,
+}
+
+_OPERATORS = {
+    _ADD: operator.add,
+    _SUB: operator.sub,
+    _MUL: operator.mul,
+    _DIV: operator.truediv,
+    _POW: operator.pow,
+}
+
+
+class _Const(object):
+    __slots__ = ('value', )
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _Program(object):
+    '''Sequence of elementwise operations.
+
+    Operands of an instruction are indices of slots or ``_Const`` objects.
+    The first slots hold the inputs, and each instruction stores its result
+    in the following slot.
+    '''
+
+    def __init__(self, num_inputs):
+        self.num_inputs = num_inputs
+        self.code = []
+
+    def emit(self, op, a, b=None):
+        self.code.append((op, a, b))
+        return _Symbol(self, self.num_inputs + len(self.code) - 1)
+
+    def operand(self, value):
+        if isinstance(value, _Symbol):
+            if value._prog is not self:
+                raise ValueError('Symbols of other fused function can not be used.')
+            return value._slot
+        if isinstance(value, Node):
+            raise TypeError('Node object must be passed to fused function as an argument.')
+        if isinstance(value, (Number, np.ndarray)):
+            return _Const(value)
+        return NotImplemented
+
+    def last_uses(self):
+        last = {}
+        for k, (op, a, b) in enumerate(self.code):
+            for s in (a, b):
+                if isinstance(s, int):
+                    last[s] = k
+        return last
+
+    def required_slots(self):
+        # Slots whose values are referred in backward propagation.
+        n = self.num_inputs
+        req = set()
+        for k, (op, a, b) in enumerate(self.code):
+            if op == _MUL:
+                req.update(s for s in (a, b) if isinstance(s, int))
+            elif op == _DIV:
+                if isinstance(b, int):
+                    req.add(b)
+                req.add(n + k)
+            elif op == _POW:
+                req.add(a)
+        return req
+
+
+class _Symbol(object):
+    '''Placeholder of an array which records applied operations.'''
+
+    __slots__ = ('_prog', '_slot')
+
+    # Let numpy arrays on the left hand side delegate to reflected operators.
+    __array_ufunc__ = None
+
+    def __init__(self, prog, slot):
+        self._prog = prog
+        self._slot = slot
+
+    def _binop(self, op, other, reverse=False):
+        o = self._prog.operand(other)
+        if o is NotImplemented:
+            return NotImplemented
+        if reverse:
+            return self._prog.emit(op, o, self._slot)
+        return self._prog.emit(op, self._slot, o)
+
+    def __add__(self, other):
+        return self._binop(_ADD, other)
+
+    def __radd__(self, other):
+        return self._binop(_ADD, other, True)
+
+    def __sub__(self, other):
+        return self._binop(_SUB, other)
+
+    def __rsub__(self, other):
+        return self._binop(_SUB, other, True)
+
+    def __mul__(self, other):
+        return self._binop(_MUL, other)
+
+    def __rmul__(self, other):
+        return self._binop(_MUL, other, True)
+
+    def __truediv__(self, other):
+        return self._binop(_DIV, other)
+
+    def __rtruediv__(self, other):
+        return self._binop(_DIV, other, True)
+
+    __div__ = __truediv__
+    __rdiv__ = __rtruediv__
+
+    def __pow__(self, other):
+        if not isinstance(other, Number):
+            raise TypeError('Exponent of fused function must be a number.')
+        return self._binop(_POW, other)
+
+    def __neg__(self):
+        return self._prog.emit(_NEG, self._slot)
+
+    def __pos__(self):
+        return self
+
+
+def _value(values, s):
+    if isinstance(s, _Const):
+        return s.value
+    return values[s]
+
+
+def _shape(v):
+    return getattr(v, 'shape', ())
+
+
+def _run_cpu(prog, inputs, keep=()):
+    '''Evaluates the program. Results of intermediate operations are
+    written to the buffers of the temporaries which are no longer used.'''
+    n = prog.num_inputs
+    values = list(inputs)
+    owned = set()
+    last = prog.last_uses()
+    for k, (op, a, b) in enumerate(prog.code):
+        x = _value(values, a)
+        out = None
+        if op == _NEG:
+            shape = _shape(x)
+            cands = (a, )
+        else:
+            y = _value(values, b)
+            shape = np.broadcast(x, y).shape
+            cands = (a, b)
+
+        for s in cands:
+            if s in owned and last[s] == k and s not in keep and _shape(values[s]) == shape:
+                out = values[s]
+                break
+
+        if op == _NEG:
+            r = np.negative(x, out=out)
+        elif op == _POW and y == 0.5:
+            r = np.sqrt(x, out=out)
+        elif op == _POW and y == 2:
+            r = np.square(x, out=out)
+        else:
+            r = _UFUNCS[op](x, y, out=out)
+
+        values.append(r)
+        if isinstance(r, np.ndarray):
+            owned.add(n + k)
+
+        # Release temporaries which are no longer used.
+        for s in cands:
+            if isinstance(s, int) and s >= n and last[s] == k and s not in keep:
+                values[s] = None
+    return values
+
+
+def _run_gpu(prog, inputs, keep=()):
+    n = prog.num_inputs
+    values = list(inputs)
+    last = prog.last_uses()
+    for k, (op, a, b) in enumerate(prog.code):
+        x = _value(values, a)
+        if op == _NEG:
+            values.append(-x)
+            cands = (a, )
+        else:
+            values.append(_OPERATORS[op](x, _value(values, b)))
+            cands = (a, b)
+        for s in cands:
+            if isinstance(s, int) and s >= n and last[s] == k and s not in keep:
+                values[s] = None
+    return values
+
+
+def _accumulate(grads, owned, s, d, inplace):
+    g = grads[s]
+    if g is None:
+        grads[s] = d
+    elif inplace and s in owned and _shape(g) == np.broadcast(g, d).shape:
+        g += d
+    else:
+        grads[s] = g + d
+        owned.add(s)
+
+
+def _backward(prog, values, requires, dy, inplace):
+    '''Propagates gradient from the output to the inputs. Gradients keep
+    the broadcasted shape until they reach the inputs.'''
+    n = prog.num_inputs
+    grads = [None] * (n + len(prog.code))
+    grads[-1] = dy
+    owned = set()
+    for k in reversed(range(len(prog.code))):
+        g = grads[n + k]
+        grads[n + k] = None
+        if g is None:
+            continue
+
+        op, a, b = prog.code[k]
+        ra = isinstance(a, int) and requires[a]
+        rb = isinstance(b, int) and requires[b]
+        if op == _ADD:
+            if ra:
+                _accumulate(grads, owned, a, g, inplace)
+            if rb:
+                _accumulate(grads, owned, b, g, inplace)
+        elif op == _SUB:
+            if ra:
+                _accumulate(grads, owned, a, g, inplace)
+            if rb:
+                _accumulate(grads, owned, b, -g, inplace)
+                owned.add(b)
+        elif op == _NEG:
+            if ra:
+                _accumulate(grads, owned, a, -g, inplace)
+                owned.add(a)
+        elif op == _MUL:
+            if ra:
+                _accumulate(grads, owned, a, g * _value(values, b), inplace)
+                owned.add(a)
+            if rb:
+                _accumulate(grads, owned, b, g * _value(values, a), inplace)
+                owned.add(b)
+        elif op == _DIV:
+            y = _value(values, b)
+            if ra:
+                _accumulate(grads, owned, a, g / y, inplace)
+                owned.add(a)
+            if rb:
+                _accumulate(grads, owned, b, -g * values[n + k] / y, inplace)
+                owned.add(b)
+        elif op == _POW:
+            if ra:
+                c = b.value
+                _accumulate(grads, owned, a, g * c * _value(values, a) ** (c - 1), inplace)
+                owned.add(a)
+    return grads[:n]
+
+
+class elementwise(Node):
+    '''Node of a fused elementwise expression. This object is created by
+    functions decorated with :func:`fuse`.'''
+
+    def __new__(cls, prog, *args):
+        return cls.calc_value(prog, *args)
+
+    @classmethod
+    def _requires(cls, prog, args):
+        requires = [isinstance(a, Node) and a.requires_grad for a in args]
+        for op, a, b in prog.code:
+            requires.append(any(isinstance(s, int) and requires[s] for s in (a, b)))
+        return requires
+
+    @classmethod
+    def _create(cls, prog, args, values, requires, keep):
+        ret = cls._create_node(values[-1])
+        if len(values) - 1 not in keep:
+            values[-1] = None
+        ret.attrs._prog = prog
+        ret.attrs._inputs = args
+        ret.attrs._values = values
+        ret.attrs._requires = requires
+        return ret
+
+    @classmethod
+    def _oper_cpu(cls, prog, *args):
+        requires = cls._requires(prog, args)
+        keep = prog.required_slots() if requires[-1] else ()
+        values = _run_cpu(prog, [to_value(a) for a in args], keep)
+        return cls._create(prog, args, values, requires, keep)
+
+    @classmethod
+    def _oper_gpu(cls, prog, *args):
+        requires = cls._requires(prog, args)
+        keep = prog.required_slots() if requires[-1] else ()
+        values = _run_gpu(prog, [get_gpu(a) for a in args], keep)
+        return cls._create(prog, args, values, requires, keep)
+
+    def _backward_cpu(self, context, dy, **kwargs):
+        args = self.attrs._inputs
+        grads = _backward(self.attrs._prog, self.attrs._values,
+                          self.attrs._requires, to_value(dy), True)
+        for a, g in zip(args, grads):
+            if g is not None and isinstance(a, Node):
+                if _shape(g) != a.shape:
+                    g = broad_cast(to_value(a), g)
+                a._update_diff(context, g, **kwargs)
+
+    def _backward_gpu(self, context, dy, **kwargs):
+        args = self.attrs._inputs
+        grads = _backward(self.attrs._prog, self.attrs._values,
+                          self.attrs._requires, get_gpu(dy), False)
+        for a, g in zip(args, grads):
+            if g is not None and isinstance(a, Node):
+                if _shape(g) != a.shape:
+                    g = cu_broad_cast(get_gpu(a), g)
+                a._update_diff(context, g, **kwargs)
+
+
+def fuse(func):
+    '''Decorator which fuses elementwise operations in the function into one
+    operation.
+
+    The decorated function is called with placeholder objects, and the
+    operations ``+``, ``-``, ``*``, ``/``, unary ``-`` and ``**`` with a
+    number exponent applied to them are recorded. The recorded operations
+    are evaluated in one node without creating a Node object for each of
+    them. Buffers of temporary arrays are reused, and only the values which
+    are required by backward propagation are kept.
+
+    Arguments of the decorated function can be Node objects, ndarrays or
+    numbers. Other values used in the function are treated as constants.
+
+    The decorated function has the method ``compute``, which evaluates the
+    expression and returns an array without creating a node. It is used
+    where no gradient is required, such as update rules of optimizers.
+
+    Args:
+        func (function): Function which consists of elementwise operations.
+
+    Returns:
+        function: Function which returns a Node object.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> @rm.fuse
+        ... def axpby(a, x, b, y, c):
+        ...     return a * x + b * y - c
+        ...
+        >>> x = rm.Variable(np.random.rand(2, 3))
+        >>> y = rm.Variable(np.random.rand(2, 3))
+        >>> z = axpby(2., x, 3., y, 1.)
+        >>> grad = rm.sum(z).grad()
+        >>> grad.get(x)
+        array([[ 2.,  2.,  2.],
+               [ 2.,  2.,  2.]], dtype=float32)
+    '''
+    def trace(num_inputs):
+        prog = _Program(num_inputs)
+        ret = func(*[_Symbol(prog, i) for i in range(num_inputs)])
+        if not isinstance(ret, _Symbol) or ret._slot < prog.num_inputs:
+            raise ValueError('Fused function must return a result of operations of its arguments.')
+        if ret._slot != prog.num_inputs + len(prog.code) - 1:
+            # Operations after the result are not evaluated.
+            del prog.code[ret._slot - prog.num_inputs + 1:]
+        return prog
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        return elementwise(trace(len(args)), *args)
+
+    def compute(*args):
+        prog = trace(len(args))
+        if is_cuda_active():
+            return _run_gpu(prog, [get_gpu(a) for a in args])[-1]
+        return _run_cpu(prog, [to_value(a) for a in args])[-1]
+
+    wrapper.compute = compute
+    return wrapper
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import copy
+import numpy as np
+from renom.core import Variable, to_value, get_precision
+from renom.layers.function.parameterized import Model, Sequential
+from renom.layers.function.dense import Dense
+from renom.layers.function.conv2d import Conv2d
+from renom.layers.function.batch_normalize import BatchNormalize
+
+
+def _channel_shape(layer):
+    # Shape of batch normalization parameters which can be folded into the layer.
+    if type(layer) is Dense:
+        return (1, layer.params.w.shape[1])
+    return (1, layer.params.w.shape[0], 1, 1)
+
+
+def _foldable(layer, bn):
+    if type(layer) not in (Dense, Conv2d) or not layer.params or not bn.params:
+        return False
+    if getattr(layer, "_activation", None) is not None:
+        # Batch normalization is applied after the activation.
+        return False
+    shape = _channel_shape(layer)
+    if bn.params.w.shape != shape:
+        return False
+    return all(np.broadcast(np.empty(shape), np.asarray(v)).shape == shape
+               for v in (bn._mov_mean, bn._mov_std))
+
+
+def _fold(layer, bn):
+    # Batch normalization in inference mode computes
+    #   w_bn * (y - mean) / sqrt(var + eps) + b_bn
+    # for the output y of the layer, which is an affine function of y per
+    # output channel. It is applied to the weight and bias of the layer.
+    shape = _channel_shape(layer)
+    mean = np.broadcast_to(np.asarray(bn._mov_mean, dtype=np.float64), shape)
+    var = np.broadcast_to(np.asarray(bn._mov_std, dtype=np.float64), shape)
+    scale = to_value(bn.params.w).astype(np.float64) / np.sqrt(var + bn._epsilon)
+    bias = to_value(bn.params.b).astype(np.float64) - mean * scale
+
+    w = to_value(layer.params.w).astype(np.float64)
+    b = to_value(layer.params.b).astype(np.float64)
+    if type(layer) is Dense:
+        w = w * scale
+    else:
+        w = w * scale.reshape(-1, 1, 1, 1)
+
+    ret = copy.copy(layer)
+    ret._parameters = None
+    ret.params = {
+        "w": Variable(w.astype(get_precision()), auto_update=True),
+        "b": Variable((b * scale + bias).astype(get_precision()), auto_update=True)}
+    return ret
+
+
+def _optimize(model):
+    if isinstance(model, Sequential):
+        layers = []
+        for layer in model._layers:
+            layer = _optimize(layer)
+            if layers and isinstance(layer, BatchNormalize) and _foldable(layers[-1], layer):
+                layers[-1] = _fold(layers[-1], layer)
+            else:
+                layers.append(layer)
+        ret = Sequential(layers)
+        ret._device_id = model._device_id
+        ret._precision_policy = model._precision_policy
+        return ret
+
+    if not isinstance(model, Model):
+        return model
+    children = {k: v for k, v in model.__dict__.items() if isinstance(v, Model)}
+    if not children:
+        return model
+    ret = copy.copy(model)
+    for k, v in children.items():
+        setattr(ret, k, _optimize(v))
+    return ret
+
+
+def optimize_for_inference(model):
+    '''Returns a model for inference in which batch normalization layers are
+    folded into the preceding :class:`Dense` or :class:`Conv2d` layers.
+
+    The moving mean and variance and the scale and shift of a
+    :class:`BatchNormalize` layer are applied to the weight and bias of the
+    layer placed just before it in a :class:`Sequential` model. Sequential
+    models held by other models are also optimized, but layers called in
+    the ``forward`` method of other models are not folded, because the
+    order of the calls is unknown.
+
+    The given model is not modified. Layers which are not folded are shared
+    with the given model. The returned model computes the same outputs as
+    the given model in inference mode, and it is not supposed to be trained.
+
+    Args:
+        model (Model): Model to be optimized.
+
+    Returns:
+        Model: Optimized model.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> model = rm.Sequential([rm.Conv2d(8), rm.BatchNormalize(mode="feature"), rm.Relu()])
+        >>> x = np.random.rand(4, 3, 8, 8)
+        >>> with model.train():
+        ...     z = model(x)
+        ...
+        >>> model.set_models(inference=True)
+        >>> folded = rm.optimize_for_inference(model)
+        >>> len(folded._layers)
+        2
+        >>> np.allclose(folded(x), model(x), atol=1e-5)
+        True
+    '''
+    return _optimize(model)
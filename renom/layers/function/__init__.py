@@ -11,3 +11,4 @@ from .lrn import Lrn
 from .unpool2d import MaxUnPool2d, max_unpool2d
 from .lstm import Lstm as Lstm
 from .embedding import embedding, Embedding
+from .checkpoint import checkpoint, Checkpoint
@@ -47,8 +47,8 @@ class batch_normalize(Node):
 
         if not inference:
             N = np.prod([x.shape[s] for s in axs])
-            ret.attrs._mov_m = (1 - momentum) * mov_m + momentum * mean
-            ret.attrs._mov_v = (1 - momentum) * mov_s + momentum * var * N / max(N - 1., 1.)
+            ret.attrs.set_state('_mov_m', (1 - momentum) * mov_m + momentum * mean)
+            ret.attrs.set_state('_mov_v', (1 - momentum) * mov_s + momentum * var * N / max(N - 1., 1.))
         return ret
 
     @classmethod
@@ -77,8 +77,8 @@ class batch_normalize(Node):
         ret.attrs._v = sq_var
 
         if not inference:
-            ret.attrs._mov_m = mv_m
-            ret.attrs._mov_v = mv_v
+            ret.attrs.set_state('_mov_m', mv_m)
+            ret.attrs.set_state('_mov_v', mv_v)
         return ret
 
     def _backward_cpu(self, context, dy, **kwargs):
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+import contextlib
+import numpy as np
+from renom.core import Node, Variable, no_grad, to_value, get_gpu
+from renom.cuda import is_cuda_active
+from .parameterized import Model
+
+
+class checkpoint(Node):
+    '''Applies a model to the input without keeping its intermediate nodes.
+    The intermediate nodes are recomputed in backward propagation.
+
+    The model must depend only on the input and its own parameters.
+    Random numbers drawn by ``np.random`` and by random number generators
+    of layers such as :class:`Dropout` are replayed in the recomputation.
+
+    Args:
+        model (Model): Model to apply.
+        x (Node, ndarray): Input array.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> model = rm.Sequential([rm.Dense(3), rm.Relu()])
+        >>> x = rm.Variable(np.random.rand(2, 4))
+        >>> z = rm.checkpoint(model, x)
+        >>> grad = rm.sum(z).grad()
+    '''
+
+    def __new__(cls, model, x):
+        flags = [(m, m.auto_update, m._prevent_update) for m in model.iter_models()]
+        nparams = cls._num_params(model)
+        rng = cls._random_state(model)
+        with no_grad():
+            z = model(x)
+
+        if cls._num_params(model) != nparams:
+            # Initialization of parameters consumed random numbers.
+            # Run again so that the recomputation draws the same numbers.
+            rng = cls._random_state(model)
+            with no_grad():
+                z = model(x)
+
+        if is_cuda_active():
+            value = get_gpu(z).copy()
+        else:
+            value = to_value(z)
+
+        ret = cls._create_node(value)
+        ret.attrs._model = model
+        ret.attrs._x = x
+        ret.attrs._rng = rng
+        ret.attrs._flags = flags
+        return ret
+
+    @staticmethod
+    def _random_state(model):
+        generators = [(m, m._rng.get_state()) for m in model.iter_models()
+                      if getattr(m, '_rng', None) is not None]
+        return np.random.get_state(), generators
+
+    @staticmethod
+    def _set_random_state(state):
+        global_state, generators = state
+        np.random.set_state(global_state)
+        for m, s in generators:
+            m._rng.set_state(s)
+
+    @staticmethod
+    def _num_params(model):
+        return sum(len(m.params) for m in model.iter_models())
+
+    def __init__(self, model, x):
+        params = [p for m in model.iter_models() for p in m.params.values()]
+        super(checkpoint, self).__init__(x, params)
+
+    @contextlib.contextmanager
+    def _forward_state(self):
+        # Reproduces the random state and the flags of models at forward.
+        model = self.attrs._model
+        rng = self._random_state(model)
+        flags = [(m, m.auto_update, m._prevent_update) for m in model.iter_models()]
+        self._set_random_state(self.attrs._rng)
+        for m, update, prevent in self.attrs._flags:
+            m.auto_update = update
+            m._prevent_update = prevent
+        try:
+            yield
+        finally:
+            self._set_random_state(rng)
+            for m, update, prevent in flags:
+                m.auto_update = update
+                m._prevent_update = prevent
+
+    def _recompute(self, context, dy, **kwargs):
+        x = self.attrs._x
+        if isinstance(x, Node) and x.requires_grad:
+            x = Variable(x)
+
+        with self._forward_state():
+            z = self.attrs._model(x)
+
+        grads = z.grad(dy, **kwargs)
+        if isinstance(x, Variable) and x is not self.attrs._x:
+            dx = grads.get(x, None)
+            if dx is not None:
+                self.attrs._x._update_diff(context, dx, **kwargs)
+
+        for p in self._args:
+            if p is not self.attrs._x:
+                dp = grads.get(p, None)
+                if dp is not None:
+                    p._update_diff(context, dp, **kwargs)
+
+    def _backward_cpu(self, context, dy, **kwargs):
+        self._recompute(context, dy, **kwargs)
+
+    def _backward_gpu(self, context, dy, **kwargs):
+        self._recompute(context, dy, **kwargs)
+
+
+class Checkpoint(Model):
+    '''Wraps a model so that its intermediate nodes are not kept during
+    forward propagation, but recomputed during backward propagation.
+    This reduces memory consumption of training in exchange for an
+    additional forward calculation of the wrapped model.
+
+    Note that moving averages of BatchNormalize in the wrapped model are
+    updated at the recomputation. Recurrent layers which keep their states
+    between calls are not supported.
+
+    Args:
+        model (Model): Model to wrap.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> model = rm.Sequential([
+        ...     rm.Checkpoint(rm.Sequential([rm.Conv2d(8), rm.Relu(), rm.Conv2d(8), rm.Relu()])),
+        ...     rm.Flatten(),
+        ...     rm.Dense(10),
+        ... ])
+        >>> x = np.random.rand(2, 3, 16, 16)
+        >>> with model.train():
+        ...     loss = rm.sum(model(x))
+        >>> grad = loss.grad()
+    '''
+
+    def __init__(self, model):
+        self.model = model
+
+    def forward(self, x):
+        return checkpoint(self.model, x)
@@ -2,7 +2,8 @@
 # encoding: utf-8
 
 import numpy as np
-from renom.layers.function.utils import im2col, col2im, out_size, tuplize
+from renom.layers.function.utils import out_size, tuplize
+from renom.layers.function.conv_engine import conv_forward, conv_backward_data, conv_backward_filter
 from renom.core import Node, Variable, to_value, GPUValue, get_gpu, precision
 from .parameterized import Parametrized
 from renom.utility.initializer import GlorotNormal
@@ -20,12 +21,8 @@ class conv2d(Node):
 
     @classmethod
     def _oper_cpu(cls, x, w, b, in_shape, out_shape, kernel, stride, padding):
-        col = im2col(to_value(x),
-                     out_shape[1:], kernel,
-                     stride, padding)
-
-        value = np.rollaxis(np.tensordot(col, to_value(w),
-                                         ([1, 2, 3], [1, 2, 3])), 3, 1)
+        value, col = conv_forward(to_value(x), to_value(w), stride, padding,
+                                  keep_col=isinstance(w, Node) and w.requires_grad)
         if b is not None:
             value += b
         ret = cls._create_node(value)
@@ -65,16 +62,16 @@ class conv2d(Node):
     def _backward_cpu(self, context, dy, **kwargs):
         dy = to_value(dy)
 
-        if isinstance(self.attrs._x, Node):
-            dx = np.tensordot(self.attrs._w, dy, (0, 1))
-            dx = np.rollaxis(dx, 3)
-            dx = col2im(dx, self.attrs._in_shape[1:],
-                        self.attrs._stride, self.attrs._padding)
-            self.attrs._x._update_diff(context, dx, **kwargs)
+        x = self.attrs._x
+        if isinstance(x, Node):
+            dx = conv_backward_data(dy, to_value(self.attrs._w), x.shape,
+                                    self.attrs._stride, self.attrs._padding)
+            x._update_diff(context, dx, **kwargs)
 
         if isinstance(self.attrs._w, Node):
-            self.attrs._w._update_diff(context, np.tensordot(
-                dy, self.attrs._col, ([0, 2, 3], [0, 4, 5])), **kwargs)
+            dw = conv_backward_filter(to_value(x), dy, self.attrs._kernel, self.attrs._stride,
+                                      self.attrs._padding, self.attrs._col)
+            self.attrs._w._update_diff(context, dw, **kwargs)
 
         if isinstance(self.attrs._b, Node):
             self.attrs._b._update_diff(context, np.sum(dy, (0, 2, 3), keepdims=True), **kwargs)
@@ -0,0 +1,468 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Convolution algorithms for CPU.
+
+Convolution of ReNom flips the kernel, that is ``Conv2d`` computes
+
+    y[n, o, h, w] = sum_{c, i, j} x_pad[n, c, h * s_h + i, w * s_w + j] * w[o, c, k_h - 1 - i, k_w - 1 - j]
+
+Every algorithm computes this forward convolution. Backward propagation
+with respect to the input of a stride 1 convolution is also a forward
+convolution, so that it is executed by the same algorithms.
+
+The im2col and col2im arrays are those of ``renom.layers.function.utils``
+in channel major order, whose kernel axes are reversed, so that the
+kernel is used without flipping.
+
+Convolutions use ``gemm`` unless another algorithm has been selected for
+their shapes, stride, padding and dtype by autotuning. Autotuning is
+enabled by :func:`renom.conv_autotune`, after which ``Conv2d`` and
+``Deconv2d`` measure the algorithms at their first call with a new
+configuration. :func:`autotune` measures the convolutions of a function
+after it returns instead, so that the function itself is not slowed down.
+
+Results of autotuning are kept in memory and stored in a JSON cache file,
+which is read by later processes. The file is the one given by
+:func:`set_cache_file`, or else the environment variable
+``RENOM_CONV_CACHE``. If neither is given, the file is
+``~/.renom/conv_autotune.json`` while autotuning is enabled by
+:func:`renom.conv_autotune`, and results are not stored otherwise.
+"""
+from __future__ import division
+import collections
+import json
+import os
+import time
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from renom.core import get_precision
+from renom.mempool import cpu_pool
+from renom.layers.function.utils import im2col, col2im
+
+
+def _pad(x, padding):
+    p_h, p_w = padding
+    if not p_h and not p_w:
+        return x
+    N, C, H, W = x.shape
+    ret = cpu_pool.zeros((N, C, H + 2 * p_h, W + 2 * p_w), dtype=x.dtype)
+    ret[:, :, p_h:p_h + H, p_w:p_w + W] = x
+    return ret
+
+
+def _out_size(x_shape, kernel, stride, padding):
+    return tuple((x_shape[i + 2] + 2 * padding[i] - kernel[i]) // stride[i] + 1 for i in range(2))
+
+
+def _im2col(x, kernel, stride, padding):
+    # Columns of shape (C * k_h * k_w, N * out_h * out_w).
+    out = _out_size(x.shape, kernel, stride, padding)
+    col = im2col(x, out, kernel, stride, padding, channel_major=True)
+    return col.reshape(-1, x.shape[0] * out[0] * out[1])
+
+
+def _channel_major(y):
+    # (N, O, H, W) -> (O, N * H * W)
+    return y.transpose(1, 0, 2, 3).reshape(y.shape[1], -1)
+
+
+def _flipped(w):
+    return w[:, :, ::-1, ::-1]
+
+
+class ConvAlgorithm(object):
+    '''Base class of convolution algorithms.
+
+    Subclasses implement ``forward`` which returns the convolution of ``x``
+    by ``w`` and may override ``supports``.
+    '''
+
+    name = None
+
+    def supports(self, x_shape, w_shape, stride, padding):
+        return True
+
+    def forward(self, x, w, stride, padding):
+        raise NotImplementedError
+
+
+class Gemm(ConvAlgorithm):
+    '''im2col followed by one matrix product.'''
+
+    name = 'gemm'
+
+    def forward(self, x, w, stride, padding):
+        y, col = self.forward_col(x, w, stride, padding)
+        cpu_pool.free(col.base)
+        return y
+
+    def forward_col(self, x, w, stride, padding):
+        O, C, k_h, k_w = w.shape
+        out = _out_size(x.shape, (k_h, k_w), stride, padding)
+        col = _im2col(x, (k_h, k_w), stride, padding)
+        y = np.dot(w.reshape(O, -1), col).reshape((O, x.shape[0]) + out)
+        return np.ascontiguousarray(y.transpose(1, 0, 2, 3)), col
+
+
+class Winograd(ConvAlgorithm):
+    '''Winograd minimal filtering F(2x2, 3x3) for 3x3 kernels with stride 1.'''
+
+    name = 'winograd'
+
+    def supports(self, x_shape, w_shape, stride, padding):
+        return tuple(w_shape[2:]) == (3, 3) and tuple(stride) == (1, 1)
+
+    @staticmethod
+    def _transform_filter(w):
+        # G g G^T with G = [[1, 0, 0], [1/2, 1/2, 1/2], [1/2, -1/2, 1/2], [0, 0, 1]]
+        g = np.moveaxis(_flipped(w), (2, 3), (0, 1))
+        t = np.stack([g[0], (g[0] + g[1] + g[2]) / 2, (g[0] - g[1] + g[2]) / 2, g[2]])
+        u = np.stack([t[:, 0], (t[:, 0] + t[:, 1] + t[:, 2]) / 2,
+                      (t[:, 0] - t[:, 1] + t[:, 2]) / 2, t[:, 2]], axis=1)
+        return u.reshape(16, w.shape[0], w.shape[1])
+
+    def forward(self, x, w, stride, padding):
+        N, C, H, W = x.shape
+        O = w.shape[0]
+        out_h, out_w = _out_size(x.shape, (3, 3), stride, padding)
+        t_h, t_w = (out_h + 1) // 2, (out_w + 1) // 2
+
+        # Pad the input so that it is covered by the tiles.
+        p_h, p_w = padding
+        xp = cpu_pool.zeros((N, C, 2 * t_h + 2, 2 * t_w + 2), dtype=x.dtype)
+        h, w_ = min(H, 2 * t_h + 2 - p_h), min(W, 2 * t_w + 2 - p_w)
+        xp[:, :, p_h:p_h + h, p_w:p_w + w_] = x[:, :, :h, :w_]
+
+        # Tiles of shape (4, 4, C, N, t_h, t_w) overlapping by 2.
+        sn, sc, sh, sw = xp.strides
+        d = as_strided(xp, shape=(4, 4, C, N, t_h, t_w),
+                       strides=(sh, sw, sc, sn, 2 * sh, 2 * sw), writeable=False)
+
+        # B^T d B with B^T = [[1, 0, -1, 0], [0, 1, 1, 0], [0, -1, 1, 0], [0, 1, 0, -1]]
+        t = cpu_pool.empty(d.shape, dtype=x.dtype)
+        v = cpu_pool.empty(d.shape, dtype=x.dtype)
+        for src, dst in ((d, t), (t.swapaxes(0, 1), v.swapaxes(0, 1))):
+            np.subtract(src[0], src[2], out=dst[0])
+            np.add(src[1], src[2], out=dst[1])
+            np.subtract(src[2], src[1], out=dst[2])
+            np.subtract(src[1], src[3], out=dst[3])
+        cpu_pool.free(xp)
+
+        m = np.matmul(self._transform_filter(w).astype(x.dtype, copy=False),
+                      v.reshape(16, C, -1)).reshape(4, 4, O, N, t_h, t_w)
+        cpu_pool.free(t, v)
+
+        # A^T m A with A^T = [[1, 1, 1, 0], [0, 1, -1, -1]]. The result is
+        # written to the array of shape (N, O, t_h, 2, t_w, 2).
+        y = np.empty((N, O, t_h, 2, t_w, 2), dtype=x.dtype)
+        t = cpu_pool.empty((2, 4, O, N, t_h, t_w), dtype=x.dtype)
+        for src, dst in ((m, t), (t.swapaxes(0, 1), y.transpose(5, 3, 1, 0, 2, 4))):
+            np.add(src[0], src[1], out=dst[0])
+            dst[0] += src[2]
+            np.subtract(src[1], src[2], out=dst[1])
+            dst[1] -= src[3]
+        cpu_pool.free(t)
+
+        y = y.reshape(N, O, 2 * t_h, 2 * t_w)
+        if (2 * t_h, 2 * t_w) != (out_h, out_w):
+            y = y[:, :, :out_h, :out_w]
+        return y
+
+
+class FFT(ConvAlgorithm):
+    '''Convolution by products of Fourier transforms for stride 1.'''
+
+    name = 'fft'
+
+    def supports(self, x_shape, w_shape, stride, padding):
+        return tuple(stride) == (1, 1)
+
+    def forward(self, x, w, stride, padding):
+        N, C = x.shape[:2]
+        O, _, k_h, k_w = w.shape
+        xp = _pad(x, padding)
+        size = xp.shape[2:]
+        out_h, out_w = _out_size(x.shape, (k_h, k_w), stride, padding)
+
+        # Circular convolution of the padded size has no wrap around in the
+        # valid region.
+        fx = np.fft.rfft2(xp, size)
+        cpu_pool.free(xp)
+        fw = np.fft.rfft2(w, size)
+        f = fx.shape[2:]
+        fx = fx.reshape(N, C, -1).transpose(2, 0, 1)
+        fw = fw.reshape(O, C, -1).transpose(2, 1, 0)
+        fy = np.matmul(fx, fw).transpose(1, 2, 0).reshape((N, O) + f)
+        y = np.fft.irfft2(fy, size)
+        return y[:, :, k_h - 1:k_h - 1 + out_h, k_w - 1:k_w - 1 + out_w].astype(x.dtype)
+
+
+ALGORITHMS = collections.OrderedDict()
+
+
+def register_algorithm(algorithm):
+    '''Registers a convolution algorithm to the candidates of autotuning.
+
+    Args:
+        algorithm (ConvAlgorithm): Instance of a subclass of ConvAlgorithm.
+    '''
+    ALGORITHMS[algorithm.name] = algorithm
+
+
+for _algorithm in (Gemm(), Winograd(), FFT()):
+    register_algorithm(_algorithm)
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.renom', 'conv_autotune.json')
+
+_forced = None
+_autotune = False
+_cache = None
+_cache_file = None
+# Configurations of convolutions executed in autotune().
+_pending = None
+
+
+def set_algorithm(name=None):
+    '''Sets the convolution algorithm used on CPU.
+
+    Args:
+        name (str): One of the names of registered algorithms, ``gemm``,
+            ``winograd`` and ``fft`` by default. Unsupported configurations
+            fall back to ``gemm``. If None, the algorithm selected by
+            :func:`autotune` is used, or ``gemm`` if none was selected.
+    '''
+    global _forced
+    if name is not None and name not in ALGORITHMS:
+        raise ValueError('Unknown convolution algorithm: %r' % (name, ))
+    _forced = name
+
+
+def conv_autotune(enabled=True):
+    '''Enables or disables autotuning of convolutions on CPU.
+
+    While it is enabled, the first convolution of ``Conv2d``, ``Deconv2d``
+    and their functions with new shapes, stride, padding and dtype
+    measures the registered algorithms on random inputs, and following
+    convolutions of the configuration use the fastest one. Results are
+    stored in the cache file described in
+    :mod:`renom.layers.function.conv_engine`.
+
+    Args:
+        enabled (bool): If True, autotuning is enabled.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> rm.conv_autotune(True)
+        >>> layer = rm.Conv2d(16, padding=1)
+        >>> z = layer(np.random.rand(8, 3, 32, 32))
+    '''
+    global _autotune, _cache
+    _autotune = bool(enabled)
+    # The cache file may change.
+    _cache = None
+
+
+def set_cache_file(path=None):
+    '''Sets the file in which results of autotuning are stored. Results in
+    the file are used by following convolutions.
+
+    Args:
+        path (str): File name. If None, the file is chosen as described in
+            :mod:`renom.layers.function.conv_engine`.
+    '''
+    global _cache_file, _cache
+    _cache_file = path
+    _cache = None
+
+
+def _cache_path():
+    default = DEFAULT_CACHE_FILE if _autotune else None
+    return _cache_file or os.environ.get('RENOM_CONV_CACHE') or default
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        path = _cache_path()
+        if path is not None:
+            try:
+                with open(path) as f:
+                    _cache.update(json.load(f))
+            except (IOError, OSError, ValueError):
+                pass
+    return _cache
+
+
+def _save_cache():
+    path = _cache_path()
+    if path is None:
+        return
+    try:
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp = '%s.%d' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(_cache, f, indent=1, sort_keys=True)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        pass
+
+
+def clear_cache():
+    '''Removes results of autotuning from memory and from the cache file.'''
+    global _cache
+    _cache = {}
+    path = _cache_path()
+    if path is not None:
+        try:
+            os.remove(path)
+        except (IOError, OSError):
+            pass
+
+
+def _key(x_shape, w_shape, stride, padding, dtype):
+    return '%s %s %s %s %s' % (tuple(x_shape), tuple(w_shape), tuple(stride),
+                               tuple(padding), np.dtype(dtype).name)
+
+
+def _candidates(x_shape, w_shape, stride, padding):
+    return [a for a in ALGORITHMS.values() if a.supports(x_shape, w_shape, stride, padding)]
+
+
+def _select(x, w, stride, padding):
+    args = (x.shape, w.shape, stride, padding)
+    if _forced is not None:
+        return _forced if ALGORITHMS[_forced].supports(*args) else 'gemm'
+    if len(_candidates(*args)) == 1:
+        return 'gemm'
+
+    key = _key(x.shape, w.shape, stride, padding, x.dtype)
+    name = _load_cache().get(key)
+    if name in ALGORITHMS and ALGORITHMS[name].supports(*args):
+        return name
+    if _pending is not None:
+        _pending[key] = args + (x.dtype, )
+    elif _autotune:
+        name = _measure(*(args + (x.dtype, )))
+        _load_cache()[key] = name
+        _save_cache()
+        return name
+    return 'gemm'
+
+
+def _measure(x_shape, w_shape, stride, padding, dtype):
+    # Returns the name of the fastest algorithm for random inputs.
+    rng = np.random.RandomState(0)
+    x = rng.rand(*x_shape).astype(dtype)
+    w = rng.rand(*w_shape).astype(dtype)
+    best = None
+    for algorithm in _candidates(x_shape, w_shape, stride, padding):
+        # The first call includes allocation of buffers.
+        algorithm.forward(x, w, stride, padding)
+        start = time.time()
+        algorithm.forward(x, w, stride, padding)
+        t = time.time() - start
+        if best is None or t < best[0]:
+            best = (t, algorithm.name)
+    return best[1]
+
+
+def autotune(func, *args, **kwargs):
+    '''Calls ``func`` and selects the fastest algorithm for each
+    convolution executed in it which has not been tuned. Algorithms are
+    measured after ``func`` returns, so that the call itself is not slowed
+    down. Following convolutions of the same shapes, stride, padding and
+    dtype use the selected algorithms.
+
+    Args:
+        func (function): Function which executes convolutions, for example
+            a training step. It is called once with ``args`` and ``kwargs``.
+
+    Returns:
+        Return value of ``func``.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> from renom.layers.function import conv_engine
+        >>> model = rm.Sequential([rm.Conv2d(16, padding=1), rm.Relu(), rm.Conv2d(16, padding=1)])
+        >>> x = np.random.rand(8, 3, 32, 32)
+        >>> def step():
+        ...     with model.train():
+        ...         loss = rm.sum(model(x))
+        ...     loss.grad()
+        ...
+        >>> conv_engine.autotune(step)
+    '''
+    global _pending
+    prev, _pending = _pending, collections.OrderedDict()
+    try:
+        ret = func(*args, **kwargs)
+    finally:
+        pending, _pending = _pending, prev
+    if pending:
+        cache = _load_cache()
+        for key, config in pending.items():
+            cache[key] = _measure(*config)
+        _save_cache()
+    return ret
+
+
+def _prepare(x, w):
+    dtype = get_precision()
+    return np.asarray(x, dtype=dtype), np.asarray(w, dtype=dtype)
+
+
+def conv_forward(x, w, stride, padding, keep_col=False):
+    '''Convolution of ``x`` by ``w``.
+
+    Returns:
+        tuple: Output array and the im2col array if ``keep_col`` is True and
+        it was computed, otherwise None.
+    '''
+    x, w = _prepare(x, w)
+    stride, padding = tuple(stride), tuple(padding)
+    name = _select(x, w, stride, padding)
+    if name == 'gemm':
+        y, col = ALGORITHMS['gemm'].forward_col(x, w, stride, padding)
+        if not keep_col:
+            cpu_pool.free(col.base)
+            col = None
+        return y, col
+    return ALGORITHMS[name].forward(x, w, stride, padding), None
+
+
+def conv_backward_data(dy, w, x_shape, stride, padding):
+    '''Gradient of the convolution with respect to the input of shape ``x_shape``.'''
+    dy, w = _prepare(dy, w)
+    k_h, k_w = w.shape[2:]
+    p_h, p_w = padding
+    q_h, q_w = k_h - 1 - p_h, k_w - 1 - p_w
+    if tuple(stride) == (1, 1) and q_h >= 0 and q_w >= 0 and \
+            dy.shape[2] + 2 * q_h - k_h + 1 == x_shape[2] and \
+            dy.shape[3] + 2 * q_w - k_w + 1 == x_shape[3]:
+        # Convolution of dy by the transposed kernel.
+        wt = np.ascontiguousarray(_flipped(w).transpose(1, 0, 2, 3))
+        return conv_forward(dy, wt, (1, 1), (q_h, q_w))[0]
+
+    O, C = w.shape[:2]
+    N, _, out_h, out_w = dy.shape
+    dcol = np.dot(w.reshape(O, -1).T, _channel_major(dy))
+    dcol = dcol.reshape(C, k_h, k_w, N, out_h, out_w).transpose(3, 0, 1, 2, 4, 5)
+    return col2im(dcol, x_shape[2:], tuple(stride), tuple(padding))
+
+
+def conv_backward_filter(x, dy, kernel, stride, padding, col=None):
+    '''Gradient of the convolution with respect to the kernel.'''
+    x, dy = _prepare(x, dy)
+    temporary = col is None
+    if temporary:
+        col = _im2col(x, tuple(kernel), tuple(stride), tuple(padding))
+    O = dy.shape[1]
+    dw = np.dot(_channel_major(dy), col.T)
+    if temporary:
+        cpu_pool.free(col.base)
+    return dw.reshape((O, -1) + tuple(kernel))
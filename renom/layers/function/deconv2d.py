@@ -3,8 +3,10 @@
 
 
 import numpy as np
-from renom.layers.function.utils import col2im, transpose_out_size, im2col, tuplize
+from renom.layers.function.utils import transpose_out_size, tuplize
+from renom.layers.function.conv_engine import conv_forward, conv_backward_data, conv_backward_filter
 from renom.core import Node, Variable, to_value, GPUValue, get_gpu, precision
+from renom.mempool import cpu_pool
 from .parameterized import Parametrized
 from renom.utility.initializer import GlorotNormal
 from renom.cuda import cuda as cu
@@ -21,9 +23,10 @@ class deconv2d(Node):
 
     @classmethod
     def _oper_cpu(cls, x, w, b, in_shape, out_shape, kernel, stride, padding):
-        z = np.tensordot(w, x, (0, 1))
-        z = np.rollaxis(z, 3)
-        z = col2im(z, out_shape[1:], stride, padding) + b
+        z = conv_backward_data(to_value(x), to_value(w), [x.shape[0]] + list(out_shape),
+                               stride, padding)
+        if b is not None:
+            z = z + to_value(b)
         ret = cls._create_node(z)
         ret.attrs._x = x
         ret.attrs._w = w
@@ -56,17 +59,20 @@ class deconv2d(Node):
 
     def _backward_cpu(self, context, dy, **kwargs):
 
-        col = im2col(dy, self.attrs._in_shape[1:], self.attrs._kernel,
-                     self.attrs._stride, self.attrs._padding)
+        dy = to_value(dy)
+        w = self.attrs._w
+        dx, col = conv_forward(dy, to_value(w), self.attrs._stride, self.attrs._padding,
+                               keep_col=isinstance(w, Node))
 
         if isinstance(self.attrs._x, Node):
-            dx = np.tensordot(col, self.attrs._w, ([1, 2, 3], [1, 2, 3]))
-            dx = np.rollaxis(dx, 3, 1)
             self.attrs._x._update_diff(context, dx, **kwargs)
 
-        if isinstance(self.attrs._w, Node):
-            self.attrs._w._update_diff(context, np.tensordot(
-                self.attrs._x, col, ([0, 2, 3], [0, 4, 5])), **kwargs)
+        if isinstance(w, Node):
+            dw = conv_backward_filter(dy, to_value(self.attrs._x), self.attrs._kernel,
+                                      self.attrs._stride, self.attrs._padding, col)
+            if col is not None:
+                cpu_pool.free(col.base)
+            w._update_diff(context, dw, **kwargs)
 
         if isinstance(self.attrs._b, Node):
             self.attrs._b._update_diff(context, np.sum(dy, (0, 2, 3), keepdims=True), **kwargs)
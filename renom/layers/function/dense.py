@@ -2,12 +2,96 @@
 # -*- coding: utf-8 -*-
 
 import numpy as np
-from renom.core import Variable, precision
+from renom.core import Node, Variable, to_value, precision
 from renom.operation import dot
+from renom.layers.activation import relu, sigmoid, tanh
+from renom.cuda import is_cuda_active
 from .parameterized import Parametrized
 from renom.utility.initializer import GlorotNormal
 
 
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1.
+    return np.reciprocal(x, out=x)
+
+
+def _tanh(x):
+    return np.tanh(x, out=x)
+
+
+def _relu_backward(z, dy):
+    return np.multiply(dy, z > 0)
+
+
+def _sigmoid_backward(z, dy):
+    dx = np.subtract(1., z)
+    dx *= z
+    dx *= dy
+    return dx
+
+
+def _tanh_backward(z, dy):
+    dx = np.multiply(z, z)
+    np.subtract(1., dx, out=dx)
+    dx *= dy
+    return dx
+
+
+# Activation nodes, in-place activation functions and their derivatives
+# computed from outputs.
+_activations = {
+    "relu": (relu, _relu, _relu_backward),
+    "sigmoid": (sigmoid, _sigmoid, _sigmoid_backward),
+    "tanh": (tanh, _tanh, _tanh_backward),
+}
+
+
+class dense(Node):
+    '''Affine transformation followed by an activation function. The result
+    of the matrix product is used as the output buffer of the bias addition
+    and the activation, and the derivative of the activation is computed
+    from the output in backward propagation.
+    '''
+
+    def __new__(cls, x, w, b, activation=None):
+        return cls.calc_value(x, w, b, activation)
+
+    @classmethod
+    def _oper_cpu(cls, x, w, b, activation):
+        value = np.dot(to_value(x), to_value(w))
+        if b is not None:
+            value += to_value(b)
+        if activation is not None:
+            _activations[activation][1](value)
+        ret = cls._create_node(value)
+        ret.attrs._x = x
+        ret.attrs._w = w
+        ret.attrs._b = b
+        ret.attrs._activation = activation
+        return ret
+
+    def _backward_cpu(self, context, dy, **kwargs):
+        dy = to_value(dy)
+        activation = self.attrs._activation
+        if activation is not None:
+            dy = _activations[activation][2](to_value(self), dy)
+
+        if isinstance(self.attrs._x, Node):
+            self.attrs._x._update_diff(context, np.dot(dy, to_value(self.attrs._w).T), **kwargs)
+
+        if isinstance(self.attrs._w, Node):
+            self.attrs._w._update_diff(context, np.dot(to_value(self.attrs._x).T, dy), **kwargs)
+
+        if isinstance(self.attrs._b, Node):
+            self.attrs._b._update_diff(context, np.sum(dy, axis=0, keepdims=True), **kwargs)
+
+
 class Dense(Parametrized):
     '''Fully connected layer as described bellow.
 
@@ -18,10 +102,16 @@ class Dense(Parametrized):
     in the __init__ function.
     Otherwise, the weight is initialized in its first forward calculation.
 
+    If ``activation`` is given, the activation function is applied to the
+    output, and the matrix product, the bias addition and the activation are
+    computed as a single node on CPU.
+
     Args:
         output_size (int): Output unit size.
         input_size (int): Input unit size.
         initializer (Initializer): Initializer object for weight initialization.
+        activation (str): Name of the activation function. One of "relu",
+            "sigmoid" and "tanh".
 
     Example:
         >>> import numpy as np
@@ -33,15 +123,20 @@ class Dense(Parametrized):
         >>> z = layer(x)
         >>> z.shape
         (3, 3)
+        >>> layer = rm.Dense(3, activation="relu")
+        >>> z = layer(x)
     '''
 
-    def __init__(self, output_size, input_size=None, initializer=GlorotNormal()):
+    def __init__(self, output_size, input_size=None, initializer=GlorotNormal(), activation=None):
+        if activation is not None and activation not in _activations:
+            raise ValueError('Unknown activation function: %r' % (activation, ))
         self._output_size = output_size
         self._initializer = initializer
+        self._activation = activation
         super(Dense, self).__init__(input_size)
 
     def clone(self, n):
-        return [self.__class__(self._output_size) for _ in range(n)]
+        return [self.__class__(self._output_size, activation=self._activation) for _ in range(n)]
 
     def weight_initiallize(self, input_size):
         size_i = input_size[0] if isinstance(input_size, tuple) else input_size
@@ -51,4 +146,9 @@ class Dense(Parametrized):
             "b": Variable(np.zeros((1, size_o)).astype(precision), auto_update=True)}
 
     def forward(self, x):
-        return dot(x, self.params["w"]) + self.params["b"]
+        activation = getattr(self, "_activation", None)
+        if activation is None:
+            return dot(x, self.params["w"]) + self.params["b"]
+        if is_cuda_active():
+            return _activations[activation][0](dot(x, self.params["w"]) + self.params["b"])
+        return dense(x, self.params["w"], self.params["b"], activation)
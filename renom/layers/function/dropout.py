@@ -3,7 +3,7 @@
 
 from __future__ import division
 import numpy as np
-from renom.core import Node, get_gpu, precision, GPUValue
+from renom.core import Node, to_value, get_gpu, GPUValue
 from renom.layers.function.parameterized import Model
 
 try:
@@ -12,25 +12,52 @@ except ImportError:
     pass
 
 
+def _bernoulli(shape, keep_ratio, generator=None):
+    '''Returns a boolean mask whose elements are True with the probability
+    ``keep_ratio``, and the scale of kept elements.
+
+    The mask is drawn from 16 bit random integers, which is much cheaper than
+    drawing floating point numbers. The probability is rounded to a multiple
+    of 1/65536, and the scale is the inverse of the rounded probability.
+    '''
+    size = int(np.prod(shape))
+    threshold = int(round(keep_ratio * 65536))
+    rng = np.random if generator is None else generator
+    bits = np.frombuffer(rng.bytes(size * 2), dtype=np.uint16)
+    mask = np.less(bits, threshold).reshape(shape)
+    return mask, 65536. / threshold if threshold else 0.
+
+
 class dropout(Node):
 
-    def __new__(cls, x, dropout_ratio=0.5, inference=False):
+    def __new__(cls, x, dropout_ratio=0.5, inference=False, generator=None):
         if inference:
             return x
-        return cls.calc_value(x, 1. - dropout_ratio)
+        return cls.calc_value(x, 1. - dropout_ratio, generator)
 
     @classmethod
-    def _oper_cpu(cls, x, dropout_ratio):
-        mask = np.array(np.random.rand(*x.shape) < dropout_ratio, dtype=precision) / dropout_ratio
-        value = x * mask
+    def _oper_cpu(cls, x, dropout_ratio, generator):
+        mask, scale = _bernoulli(x.shape, dropout_ratio, generator)
+        value = np.multiply(to_value(x), mask)
+        value *= scale
 
         ret = cls._create_node(value)
         ret.attrs._x = x
-        ret.attrs._mask = mask
+        # The mask is kept as packed bits, 1 bit per element.
+        ret.attrs._mask = np.packbits(mask, axis=None)
+        ret.attrs._scale = scale
         return ret
 
+    def _mask_shape(self):
+        return self.attrs._x.shape
+
+    def _unpacked_mask(self):
+        shape = self._mask_shape()
+        mask = np.unpackbits(self.attrs._mask)[:int(np.prod(shape))]
+        return mask.reshape(shape)
+
     @classmethod
-    def _oper_gpu(cls, x, dropout_ratio):
+    def _oper_gpu(cls, x, dropout_ratio, generator):
         mask = get_gpu(x).empty_like_me()
         curand_generator().rand_bernoulli(mask, 1 - dropout_ratio)
         mask = mask / dropout_ratio
@@ -42,7 +69,8 @@ class dropout(Node):
 
     def _backward_cpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._x, Node):
-            dx = self.attrs._mask * dy
+            dx = np.multiply(to_value(dy), self._unpacked_mask())
+            dx *= self.attrs._scale
             self.attrs._x._update_diff(context, dx, **kwargs)
 
     def _backward_gpu(self, context, dy, **kwargs):
@@ -53,25 +81,30 @@ class dropout(Node):
 
 class spatial_dropout(dropout):
 
-    def __new__(cls, x, dropout_ratio=0.5, inference=False):
+    def __new__(cls, x, dropout_ratio=0.5, inference=False, generator=None):
         assert len(x.shape) == 4, "Spatial_dropout only accepts 4d tensors."
         if inference:
             return x
         else:
-            return cls.calc_value(x, 1. - dropout_ratio)
+            return cls.calc_value(x, 1. - dropout_ratio, generator)
 
     @classmethod
-    def _oper_cpu(cls, x, dropout_ratio):
-        mask = np.array(np.random.rand(*x.shape[:2]) < dropout_ratio,
-                        dtype=precision)[:, :, None, None] / dropout_ratio
-        value = x * mask
+    def _oper_cpu(cls, x, dropout_ratio, generator):
+        mask, scale = _bernoulli(x.shape[:2], dropout_ratio, generator)
+        value = np.multiply(to_value(x), mask[:, :, None, None])
+        value *= scale
         ret = cls._create_node(value)
         ret.attrs._x = x
-        ret.attrs._mask = mask
+        # 1 bit per feature map.
+        ret.attrs._mask = np.packbits(mask, axis=None)
+        ret.attrs._scale = scale
         return ret
 
+    def _mask_shape(self):
+        return self.attrs._x.shape[:2] + (1, 1)
+
     @classmethod
-    def _oper_gpu(cls, x, drop_out_ratio):
+    def _oper_gpu(cls, x, drop_out_ratio, generator):
         shape = (x.shape[0], x.shape[1], 1, 1)
         mask = GPUValue(shape=shape)
         curand_generator().rand_bernoulli(mask, 1 - drop_out_ratio)
@@ -91,8 +124,17 @@ class Dropout(Model):
     the data sets them to zero.
     Remaining data will be rescaled by ``1/(1 - dropout_ratio)``.
 
+    On CPU, the mask is drawn from 16 bit random integers, so that the
+    ratio is rounded to a multiple of 1/65536. The mask is kept as packed
+    bits for backward propagation.
+
     Args:
         dropout_ratio (float): Dropout ratio.
+        seed (int): Seed of the random number generator of this layer. If
+            given, masks are drawn from a ``numpy.random.RandomState`` owned by
+            the layer. Otherwise masks are drawn from the global random state
+            ``np.random``, so they follow ``np.random.seed``. This applies
+            only to CPU.
 
     Example:
         >>> import numpy as np
@@ -121,9 +163,10 @@ class Dropout(Model):
 
     """
 
-    def __init__(self, dropout_ratio=0.5):
+    def __init__(self, dropout_ratio=0.5, seed=None):
         self._dropout_ratio = dropout_ratio
         self.inference = False
+        self._rng = None if seed is None else np.random.RandomState(seed)
 
     def __call__(self, x):
         if self.inference:
@@ -131,7 +174,7 @@ class Dropout(Model):
         return self.forward(x)
 
     def forward(self, x):
-        return dropout(x, self._dropout_ratio, self.inference)
+        return dropout(x, self._dropout_ratio, self.inference, self._rng)
 
 
 class SpatialDropout(Dropout):
@@ -140,6 +183,10 @@ class SpatialDropout(Dropout):
 
     Args:
         dropout_ratio (float): Dropout ratio.
+        seed (int): Seed of the random number generator of this layer. If
+            it is None, masks are drawn from the global random state
+            ``np.random``, so they follow ``np.random.seed``. This applies
+            only to CPU.
 
     Raises:
         AssertionError: An assertion error will be raised if the input tensor dimension is not 4.
@@ -175,4 +222,4 @@ class SpatialDropout(Dropout):
     """
 
     def forward(self, x):
-        return spatial_dropout(x, self._dropout_ratio, self.inference)
+        return spatial_dropout(x, self._dropout_ratio, self.inference, self._rng)
@@ -3,7 +3,8 @@
 
 from __future__ import division
 import numpy as np
-from renom.core import Node, get_gpu, precision, GPUValue, Variable
+from renom.core import Node, get_gpu, precision, GPUValue, Variable, to_value
+from renom.sparse import RowSparse
 from renom.layers.function.parameterized import Parametrized
 from renom.utility.initializer import GlorotNormal
 from renom.cuda import cuda as cu
@@ -11,25 +12,23 @@ from renom.cuda import cuda as cu
 
 class embedding(Node):
 
-    def __new__(cls, x, w):
+    def __new__(cls, x, w, sparse_grad=False):
         assert x.shape[1] == 1
-        return cls.calc_value(x, w)
+        return cls.calc_value(x, w, sparse_grad)
 
     @classmethod
-    def _oper_cpu(cls, x, w):
-        if isinstance(x, Node):
-            index = x.as_ndarray().astype(np.int)[:, 0]
-        else:
-            index = x.astype(np.int)[:, 0]
+    def _oper_cpu(cls, x, w, sparse_grad):
+        index = np.asarray(to_value(x)).astype(np.intp)[:, 0]
         value = w[index]
         ret = cls._create_node(value)
         ret.attrs._x = x
         ret.attrs._w = w
         ret.attrs._index = index
+        ret.attrs._sparse_grad = sparse_grad
         return ret
 
     @classmethod
-    def _oper_gpu(cls, x, w):
+    def _oper_gpu(cls, x, w, sparse_grad):
         z = GPUValue(shape=(len(x), len(w[0])))
         cu.cuembedding_forward(get_gpu(x), get_gpu(w), z)
         ret = cls._create_node(z)
@@ -38,12 +37,15 @@ class embedding(Node):
         return ret
 
     def _backward_cpu(self, context, dy, **kwargs):
-        if isinstance(self.attrs._w, Node):
-            N = len(self.attrs._index)
-            dx = np.zeros(self.attrs._w.shape, dtype=self.attrs._w.dtype)
-            for i in range(N):
-                dx[self.attrs._index[i]] += dy[i]
-            self.attrs._w._update_diff(context, dx, **kwargs)
+        w = self.attrs._w
+        if isinstance(w, Node):
+            # Only the looked up rows have gradients. If sparse gradients are
+            # requested, the gradient of a weight Variable is kept as RowSparse
+            # so that optimizers update only those rows.
+            dx = RowSparse(self.attrs._index, to_value(dy).astype(w.dtype, copy=False), w.shape)
+            if not (self.attrs._sparse_grad and isinstance(w, Variable)):
+                dx = dx.as_ndarray()
+            w._update_diff(context, dx, **kwargs)
 
     def _backward_gpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._w, Node):
@@ -69,6 +71,10 @@ class Embedding(Parametrized):
         output_size (int): Output unit size.
         input_size (int): Input unit size. This is same as number of embedding characters.
         initializer (Initializer): Initializer object for weight initialization. 
+        sparse_grad (bool): If True, the gradient of the weight is a
+            :class:`renom.RowSparse` holding only the looked up rows, and
+            optimizers update only those rows. This applies only to CPU.
+            Otherwise the gradient is a dense array.
 
     Example:
         >>> import numpy as np
@@ -83,9 +89,10 @@ class Embedding(Parametrized):
         2. Both ``output_size`` and ``input_size`` must be specified.
     """
 
-    def __init__(self, output_size, input_size, initializer=GlorotNormal()):
+    def __init__(self, output_size, input_size, initializer=GlorotNormal(), sparse_grad=False):
         self._output_size = output_size
         self._initializer = initializer
+        self._sparse_grad = sparse_grad
         super(Embedding, self).__init__(input_size)
 
     def weight_initiallize(self, input_size):
@@ -95,4 +102,4 @@ class Embedding(Parametrized):
             "w": Variable(self._initializer((size_i, size_o)), auto_update=True)}
 
     def forward(self, x):
-        return embedding(x, self.params.w)
+        return embedding(x, self.params.w, self._sparse_grad)
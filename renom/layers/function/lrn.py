@@ -4,9 +4,47 @@
 from __future__ import division
 import numpy as np
 from renom.core import Node, get_gpu, to_value
+from renom.mempool import cpu_pool
 from renom.cuda import cuda as cu
 
 
+def _window_sum(x, n):
+    '''Sums of x over windows of n // 2 adjacent channels on each side.
+    Windows are computed as differences of the cumulative sum along the
+    channel axis, so that the cost does not depend on n. The cumulative sum
+    is taken in float64, since differences of a float32 sum lose small
+    channels next to large ones.
+    '''
+    shape = x.shape
+    N, C = shape[:2]
+    m = min(n // 2, C)
+    x = x.reshape(N, C, -1)
+    # The cumulative sum padded with m + 1 zeros in front and m copies of
+    # the total behind, so that the window of channel c is cs[c + 2m + 1] - cs[c].
+    cs = cpu_pool.empty((N, C + 2 * m + 1, x.shape[2]), dtype=np.float64)
+    cs[:, :m + 1] = 0
+    # Summing in place after the cast is faster than np.cumsum with dtype.
+    body = cs[:, m + 1:C + m + 1]
+    body[...] = x
+    np.cumsum(body, axis=1, out=body)
+    cs[:, C + m + 1:] = cs[:, C + m:C + m + 1]
+    ret = np.empty(x.shape, dtype=x.dtype)
+    np.subtract(cs[:, 2 * m + 1:], cs[:, :C], out=ret, casting='same_kind')
+    cpu_pool.free(cs)
+    return ret.reshape(shape)
+
+
+def _inverse_power(x, b):
+    # x ** -b. The default exponent 0.75 is computed with square roots,
+    # which is much faster than np.power.
+    if b == 0.75:
+        s = np.sqrt(x)
+        ret = np.sqrt(s)
+        ret *= s
+        return np.reciprocal(ret, out=ret)
+    return x ** -b
+
+
 class lrn(Node):
 
     def __new__(cls, x, n=5, k=2, a=1e-4, b=0.75):
@@ -14,15 +52,11 @@ class lrn(Node):
 
     @classmethod
     def _oper_cpu(cls, x, n, k, a, b):
-        xs = np.square(x).view(np.ndarray)
-        sum = np.array(xs.copy())
-        sum = xs.copy()
-        for i in range(1, n // 2 + 1):
-            sum[:, i:, :, :] += xs[:, :-i, :, :]
-            sum[:, :-i, :, :] += xs[:, i:, :, :]
-        unit_scale = k + a * sum
-        scale = unit_scale ** -b
-        value = x * scale
+        unit_scale = _window_sum(np.square(to_value(x)), n)
+        unit_scale *= a
+        unit_scale += k
+        scale = _inverse_power(unit_scale, b)
+        value = to_value(x) * scale
         ret = cls._create_node(value)
         ret.attrs._x = x
         ret.attrs._n = n
@@ -40,13 +74,15 @@ class lrn(Node):
             a = self.attrs._a
             b = self.attrs._b
             n = self.attrs._n
-            x = self.attrs._x
-            sum1 = (self * dy / unit_scale).view(np.ndarray)
-            sum2 = sum1.copy()
-            for i in range(1, n // 2 + 1):
-                sum2[:, i:, :, :] += sum1[:, :-i, :, :]
-                sum2[:, :-i, :, :] += sum1[:, i:, :, :]
-            self.attrs._x._update_diff(context, dy * scale - 2 * a * b * x * sum2, **kwargs)
+            x = to_value(self.attrs._x)
+            sum1 = np.multiply(to_value(self), dy)
+            sum1 /= unit_scale
+            sum2 = _window_sum(sum1, n)
+            sum2 *= x
+            sum2 *= -2 * a * b
+            dx = np.multiply(dy, scale, out=sum1)
+            dx += sum2
+            self.attrs._x._update_diff(context, dx, **kwargs)
 
     @classmethod
     def _oper_gpu(cls, x, n, k, a, b):
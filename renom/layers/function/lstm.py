@@ -5,11 +5,12 @@ from __future__ import division
 import numpy as np
 from renom.layers.activation.sigmoid import sigmoid
 from renom.layers.activation.tanh import tanh
-from renom.core import Node, Variable, get_gpu, precision, GPUValue
-from renom.operation import dot, sum
+from renom.core import Node, Variable, to_value, get_gpu, precision, get_precision, GPUValue
+from renom.operation import dot, sum, concat, reshape
 from renom.utility.initializer import GlorotNormal
 from .parameterized import Parametrized
 from renom.cuda import cuda as cu
+from renom.cuda import is_cuda_active
 
 
 def gate(x):
@@ -34,18 +35,20 @@ class lstm(Node):
 
     @classmethod
     def _oper_cpu(cls, x, pz, ps, w, wr, b):
-        s = np.zeros((x.shape[0], w.shape[1] // 4), dtype=precision) if ps is None else ps
-        z = np.zeros((x.shape[0], w.shape[1] // 4), dtype=precision) if pz is None else pz
+        s = np.zeros((x.shape[0], w.shape[1] // 4), dtype=get_precision()) if ps is None else ps
+        z = np.zeros((x.shape[0], w.shape[1] // 4), dtype=get_precision()) if pz is None else pz
 
-        u = dot(x, w) + dot(z, wr) + b
+        u = np.dot(to_value(x), to_value(w))
+        u += np.dot(to_value(z), to_value(wr))
+        u += to_value(b)
         m = u.shape[1] // 4
         u, gated = np.split(u, [m, ], axis=1)
-        u = tanh(u)
+        u = activation(u)
 
-        gated = sigmoid(gated)
+        gated = gate(gated)
 
-        state = gated[:, m:m * 2] * u + gated[:, :m] * s
-        z = tanh(state) * gated[:, m * 2:]
+        state = gated[:, m:m * 2] * u + gated[:, :m] * to_value(s)
+        z = activation(state) * gated[:, m * 2:]
 
         ret = cls._create_node(z)
         ret.attrs._x = x
@@ -55,7 +58,7 @@ class lstm(Node):
         ret.attrs._pz = pz
         ret.attrs._u = u
         ret.attrs._pstate = ps
-        ret.attrs._state = state
+        ret.attrs.set_state('_state', state)
         ret.attrs._gated = gated
         ret._state = state
 
@@ -106,18 +109,21 @@ class lstm(Node):
         b = self.attrs._b
 
         u = self.attrs._u
-        s = tanh(self.attrs._state)
+        s = activation(self.attrs._state)
 
         gated = self.attrs._gated
         gd = gate_diff(gated)
         ps = self.attrs._pstate
+        if ps is not None:
+            ps = to_value(ps)
 
         drt = context.restore(wr, np.zeros((n, m * 4), dtype=dy.dtype))
         dou = context.restore(w, np.zeros((n, m), dtype=dy.dtype))
+        drt, dou = to_value(drt), to_value(dou)
 
-        pfg = getattr(self.attrs, "_pfgate", np.zeros_like(self))
+        pfg = getattr(self.attrs, "_pfgate", np.zeros((n, m), dtype=dy.dtype))
 
-        e = dy
+        e = to_value(dy)
 
         do = e * s * gd[:, 2 * m:]
         dou = e * gated[:, 2 * m:] * activation_diff(s) + pfg * dou
@@ -127,7 +133,7 @@ class lstm(Node):
         dc = dou * activation_diff(u) * gated[:, m:2 * m]
 
         dr = np.hstack((dc, df, di, do))
-        dx = np.dot(dr, w.T)
+        dx = np.dot(dr, to_value(w).T)
 
         context.store(wr, dr)
         context.store(w, dou)
@@ -136,16 +142,16 @@ class lstm(Node):
             self.attrs._x._update_diff(context, dx)
 
         if isinstance(w, Node):
-            w._update_diff(context, np.dot(self.attrs._x.T, dr))
+            w._update_diff(context, np.dot(to_value(self.attrs._x).T, dr))
 
         if isinstance(wr, Node):
-            wr._update_diff(context, np.dot(self.T, drt))
+            wr._update_diff(context, np.dot(to_value(self).T, drt))
 
         if isinstance(b, Node):
             b._update_diff(context, np.sum(dr, axis=0, keepdims=True))
 
         if isinstance(self.attrs._pz, Node):
-            self.attrs._pz._update_diff(context, np.dot(dr, wr.T))
+            self.attrs._pz._update_diff(context, np.dot(dr, to_value(wr).T))
 
     def _backward_gpu(self, context, dy, **kwargs):
         w = self.attrs._w
@@ -186,6 +192,132 @@ class lstm(Node):
             self.attrs._pz._update_diff(context, dot(dr, wr.T))
 
 
+def _sigmoid(x):
+    # In-place logistic function.
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1.
+    np.reciprocal(x, out=x)
+    return x
+
+
+class lstm_sequence(Node):
+    '''Lstm over a whole sequence. The input of shape (N, T, D) is projected
+    for every timestep with one matrix product, the recurrence runs over
+    preallocated buffers, and backpropagation through time is done in the
+    backward of this single node.
+
+    Gates are laid out as in :class:`lstm`, i.e. cell input, forget gate,
+    input gate and output gate. ``pz`` and ``ps`` are the initial output and
+    state given as arrays, gradients are not propagated to them.
+    '''
+
+    def __new__(cls, x, pz, ps, w, wr, b):
+        return cls.calc_value(x, pz, ps, w, wr, b)
+
+    @classmethod
+    def _oper_cpu(cls, x, pz, ps, w, wr, b):
+        N, T, D = x.shape
+        m = w.shape[1] // 4
+        w_, wr_, b_ = to_value(w), to_value(wr), to_value(b)
+
+        # Time major copy of the input.
+        xt = np.ascontiguousarray(to_value(x).transpose(1, 0, 2)).reshape(T * N, D)
+
+        # Input projections of every timestep. After the loop below, this
+        # holds activated values of the cell input and the gates.
+        gated = np.dot(xt, w_).reshape(T, N, m * 4)
+        gated += b_
+        z = np.empty((T + 1, N, m), dtype=gated.dtype)
+        state = np.empty((T + 1, N, m), dtype=gated.dtype)
+        cell = np.empty((T, N, m), dtype=gated.dtype)
+        z[0] = 0 if pz is None else to_value(pz)
+        state[0] = 0 if ps is None else to_value(ps)
+        tmp = np.empty((N, m), dtype=gated.dtype)
+
+        for t in range(T):
+            g = gated[t]
+            g += np.dot(z[t], wr_)
+            np.tanh(g[:, :m], out=g[:, :m])
+            _sigmoid(g[:, m:])
+            np.multiply(g[:, m:m * 2], state[t], out=state[t + 1])
+            np.multiply(g[:, m * 2:m * 3], g[:, :m], out=tmp)
+            state[t + 1] += tmp
+            np.tanh(state[t + 1], out=cell[t])
+            np.multiply(cell[t], g[:, m * 3:], out=z[t + 1])
+
+        ret = cls._create_node(np.ascontiguousarray(z[1:].transpose(1, 0, 2)))
+        ret.attrs._x = x
+        ret.attrs._xt = xt
+        ret.attrs._w = w
+        ret.attrs._wr = wr
+        ret.attrs._b = b
+        ret.attrs._gated = gated
+        ret.attrs._z = z
+        ret.attrs._state = state
+        ret.attrs._cell = cell
+        ret._last = (z[T].copy(), state[T].copy())
+        return ret
+
+    def _backward_cpu(self, context, dy, **kwargs):
+        x = self.attrs._x
+        w, wr, b = self.attrs._w, self.attrs._wr, self.attrs._b
+        gated = self.attrs._gated
+        state = self.attrs._state
+        cell = self.attrs._cell
+        z = self.attrs._z
+        T, N, M = gated.shape
+        m = M // 4
+
+        dy = to_value(dy).transpose(1, 0, 2)
+        g = gated.reshape(T, N, 4, m)
+        u, f, i, o = g[:, :, 0], g[:, :, 1], g[:, :, 2], g[:, :, 3]
+
+        # Derivatives of the gates with respect to the state (first three)
+        # and the output (last one), computed for every timestep at once.
+        dr = np.empty_like(gated)
+        k = dr.reshape(T, N, 4, m)
+        np.multiply(u, u, out=k[:, :, 0])
+        np.subtract(1., k[:, :, 0], out=k[:, :, 0])
+        k[:, :, 0] *= i
+        np.subtract(1., g[:, :, 1:], out=k[:, :, 1:])
+        k[:, :, 1:] *= g[:, :, 1:]
+        k[:, :, 1] *= state[:-1]
+        k[:, :, 2] *= u
+        k[:, :, 3] *= cell
+        # Derivative of the output with respect to the state.
+        do = activation_diff(cell)
+        do *= o
+
+        wr_t = np.ascontiguousarray(to_value(wr).T)
+        dz = np.zeros((N, m), dtype=gated.dtype)
+        ds = np.zeros((N, m), dtype=gated.dtype)
+        tmp = np.empty((N, m), dtype=gated.dtype)
+        for t in reversed(range(T)):
+            d = k[t]
+            dz += dy[t]
+            d[:, 3] *= dz
+            np.multiply(dz, do[t], out=tmp)
+            ds += tmp
+            d[:, :3] *= ds[:, None]
+            ds *= f[t]
+            np.dot(dr[t], wr_t, out=dz)
+
+        dr = dr.reshape(T * N, M)
+        if isinstance(x, Node):
+            dx = np.dot(dr, to_value(w).T).reshape(T, N, -1).transpose(1, 0, 2)
+            x._update_diff(context, dx, **kwargs)
+
+        if isinstance(w, Node):
+            w._update_diff(context, np.dot(self.attrs._xt.T, dr), **kwargs)
+
+        if isinstance(wr, Node):
+            wr._update_diff(context, np.dot(z[:-1].reshape(T * N, m).T, dr), **kwargs)
+
+        if isinstance(b, Node):
+            b._update_diff(context, np.sum(dr, axis=0, keepdims=True), **kwargs)
+
+
 class Lstm(Parametrized):
     '''Long short time memory[4]_ .
     Lstm object has 8 weights and 4 biases parameters to learn.
@@ -216,6 +348,12 @@ class Lstm(Parametrized):
         output_size (int): Output unit size.
         input_size (int): Input unit size.
         initializer (Initializer): Initializer object for weight initialization.
+        sequence (bool): If True, the layer takes a whole sequence of shape
+            (N, T, D) and returns outputs of every timestep as an array of
+            shape (N, T, output_size). This runs much faster than calling the
+            layer for each timestep. The last output and state are carried to
+            the next call until :meth:`truncate` is called, but gradients are
+            not propagated across calls.
 
     Example:
         >>> import numpy as np
@@ -233,17 +371,23 @@ class Lstm(Parametrized):
         Add([[-0.01853334, -0.0585249 ,  0.01290053],
              [-0.0205425 , -0.05837972,  0.00467286]], dtype=float32)
         >>> layer.truncate()
+        >>>
+        >>> x = np.random.rand(n, t, d)
+        >>> layer = rm.Lstm(2, sequence=True)
+        >>> layer(x).shape
+        (2, 4, 2)
 
     .. [4] Learning Precise Timing with LSTM Recurrent Networks
     '''
 
-    def __init__(self, output_size, input_size=None, initializer=GlorotNormal()):
+    def __init__(self, output_size, input_size=None, initializer=GlorotNormal(), sequence=False):
         self._size_o = output_size
         self._initializer = initializer
+        self._sequence = sequence
         super(Lstm, self).__init__(input_size)
 
     def weight_initiallize(self, size_i):
-        size_i = size_i[0]
+        size_i = size_i[-1]
         size_o = self._size_o
         bias = np.zeros((1, size_o * 4), dtype=precision)
         bias[:, size_o:size_o * 2] = 1
@@ -254,16 +398,35 @@ class Lstm(Parametrized):
         }
 
     def forward(self, x):
+        if self._sequence:
+            return self._forward_sequence(x)
+        return self._forward_step(x)
+
+    def _forward_sequence(self, x):
+        if is_cuda_active():
+            # Runs the step-wise lstm and joins outputs along the time axis.
+            n, t = x.shape[:2]
+            z = [reshape(self._forward_step(x[:, i]), (n, 1, self._size_o)) for i in range(t)]
+            return concat(z, axis=1)
+
+        last = getattr(self, "_last", None)
+        pz, ps = (None, None) if last is None else last
+        ret = lstm_sequence(x, pz, ps, self.params.w, self.params.wr, self.params.b)
+        self._last = ret._last
+        return ret
+
+    def _forward_step(self, x):
         ret = lstm(x, getattr(self, "_z", None),
                    getattr(self, "_state", None),
                    self.params.w,
                    self.params.wr,
                    self.params.b)
         self._z = ret
-        self._state = getattr(ret.attrs, '_state', None)
+        self._state = getattr(ret, '_state', None)
         return ret
 
     def truncate(self):
         """Truncates temporal connection."""
+        self._last = None
         self._z = None
         self._state = None
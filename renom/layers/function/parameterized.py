@@ -8,7 +8,7 @@ import inspect
 import weakref
 import copy
 import numpy as np
-from renom.core import Node, Variable, GPUValue
+from renom.core import Node, Variable, GPUValue, no_grad, precision_policy
 from renom.operation import sum
 import renom.cuda
 from renom.cuda import use_device, is_cuda_active
@@ -49,6 +49,7 @@ class Model(with_metaclass(ABCMeta, object)):
     _prevent_update = False
     _parameters = None
     _device_id = 0
+    _precision_policy = None
     SERIALIZED = ()
 
     @property
@@ -68,7 +69,33 @@ class Model(with_metaclass(ABCMeta, object)):
 
     def __call__(self, *args, **kwargs):
         with use_device(self._device_id):
-            return self.forward(*args, **kwargs)
+            if self._precision_policy is None:
+                return self.forward(*args, **kwargs)
+            with precision_policy(*self._precision_policy):
+                return self.forward(*args, **kwargs)
+
+    def set_precision_policy(self, compute=None, storage=None):
+        """Sets the precision policy used in forward calculation of this model.
+        See :func:`renom.core.precision_policy`.
+
+        Note that backward propagation is executed with the policy of the
+        context where ``grad`` is called. The compute dtype should be
+        changed by the context manager instead, to apply it to both of them.
+
+        Args:
+            compute (dtype): Dtype of calculation.
+            storage (dtype): Dtype of arrays stored for backward propagation.
+
+        Example:
+            >>> import numpy as np
+            >>> import renom as rm
+            >>> model = rm.Sequential([rm.Conv2d(8), rm.Relu(), rm.Dropout()])
+            >>> model.set_precision_policy(storage=np.float16)
+        """
+        if compute is None and storage is None:
+            self._precision_policy = None
+        else:
+            self._precision_policy = (compute, storage)
 
     def set_gpu(self, device_id):
         self.set_models(_device_id=device_id)
@@ -157,6 +184,31 @@ class Model(with_metaclass(ABCMeta, object)):
         finally:
             self.set_prevent_update(False)
 
+    @contextmanager
+    def inference_mode(self):
+        """Context manager to execute forward calculation for inference.
+
+        Layers such as Dropout and BatchNormalize are set to the inference
+        mode, and no computational graph is created in this context.
+
+        Example:
+            >>> import renom as rm
+            >>> import numpy as np
+            >>>
+            >>> model = rm.Sequential([rm.Dense(3), rm.Dropout()])
+            >>> with model.inference_mode():
+            ...     z = model(np.random.rand(2, 4))
+            ...
+        """
+        prev = [(c, getattr(c, "inference", False)) for c in self.iter_models()]
+        self.set_models(inference=True)
+        try:
+            with no_grad():
+                yield self
+        finally:
+            for c, f in prev:
+                c.inference = f
+
     def iter_models(self):
         yield self
 
@@ -414,6 +466,10 @@ class Sequential(Model):
 
     Args:
         layers (list): A list of layer objects.
+        checkpoint_every (int): If specified, the layers are split into segments
+            of this number of layers. Intermediate nodes in each segment are not
+            kept in forward propagation, but recomputed in backward propagation.
+            See :class:`Checkpoint`.
 
     Example:
         >>> import renom as rm
@@ -431,14 +487,14 @@ class Sequential(Model):
         (32, 10)
     """
 
-    def __init__(self, layers, loss_function=None):
+    def __init__(self, layers, loss_function=None, checkpoint_every=None):
         self._layers = list(layers)
+        self._checkpoint_every = checkpoint_every
         for i, ly in enumerate(layers):
             setattr(self, "l%d" % (i), ly)
 
     def __call__(self, x):
-        with use_device(self._device_id):
-            return self.forward(x)
+        return super(Sequential, self).__call__(x)
 
     def append(self, layer):
         setattr(self, "l%d" % (len(self._layers)), layer)
@@ -450,6 +506,13 @@ class Sequential(Model):
 
     def forward(self, x):
         t = x
+        k = self._checkpoint_every
+        if k:
+            from .checkpoint import checkpoint
+            for i in range(0, len(self._layers), k):
+                t = checkpoint(Sequential(self._layers[i:i + k]), t)
+            return t
+
         for ly in self._layers:
             t = ly(t)
         return t
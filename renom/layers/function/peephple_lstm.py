@@ -5,7 +5,7 @@ from __future__ import division
 import numpy as np
 from renom.layers.activation.sigmoid import sigmoid
 from renom.layers.activation.tanh import tanh
-from renom.core import Node, Variable, to_value, get_gpu, precision, GPUValue
+from renom.core import Node, Variable, to_value, get_gpu, precision, get_precision, GPUValue
 import renom.operation as op
 from renom.utility.initializer import GlorotNormal
 from .parameterized import Parametrized
@@ -34,8 +34,8 @@ class peephole_lstm(Node):
 
     @classmethod
     def _oper_cpu(cls, x, pz, ps, w, wr, wc, b):
-        s = np.zeros((x.shape[0], w.shape[1] // 4), dtype=precision) if ps is None else ps
-        z = np.zeros((x.shape[0], w.shape[1] // 4), dtype=precision) if pz is None else pz
+        s = np.zeros((x.shape[0], w.shape[1] // 4), dtype=get_precision()) if ps is None else ps
+        z = np.zeros((x.shape[0], w.shape[1] // 4), dtype=get_precision()) if pz is None else pz
 
         u = np.dot(x, w) + np.dot(z, wr) + b
         m = u.shape[1] // 4
@@ -59,7 +59,8 @@ class peephole_lstm(Node):
         ret.attrs._u = u
         ret.attrs._pz = pz
         ret.attrs._pstate = ps
-        ret.attrs._state = state
+        ret.attrs.set_state('_state', state)
+        ret._state = state
         ret.attrs._gated = gated
 
         if isinstance(pz, Node):
@@ -90,6 +91,7 @@ class peephole_lstm(Node):
         ret.attrs._pz = pz
         ret.attrs._pstate = ps
         ret.attrs._state = s
+        ret._state = s
 
         if isinstance(pz, Node):
             pz.attrs._pfgate = u
@@ -277,7 +279,7 @@ class PeepholeLstm(Parametrized):
                             self.params.wc,
                             self.params.b)
         self._z = ret
-        self._state = getattr(ret.attrs, '_state', None)
+        self._state = getattr(ret, '_state', None)
         return ret
 
     def truncate(self):
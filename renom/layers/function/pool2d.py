@@ -3,7 +3,8 @@
 
 from __future__ import division
 import numpy as np
-from renom.core import Node, GPUValue, get_gpu
+from renom.core import Node, GPUValue, get_gpu, to_value
+from renom.mempool import cpu_pool
 from renom.layers.function.utils import im2col, col2im, out_size, tuplize
 from renom.cuda import cuda as cu
 
@@ -25,18 +26,24 @@ class pool_base(Node):
             self.attrs._x._update_diff(context, dx, **kwargs)
 
 
+def _index_dtype(size):
+    return np.uint8 if size <= np.iinfo(np.uint8).max else np.intp
+
+
 class max_pool2d(pool_base):
 
     @classmethod
     def _oper_cpu(cls, x, in_shape, out_shape, karnel, stride, padding):
-        col = im2col(x, out_shape[1:], karnel,
+        n, ic, oh, ow = (x.shape[0], ) + tuple(out_shape)
+        kh, kw = karnel
+        col = im2col(to_value(x), out_shape[1:], karnel,
                      stride, padding)
-        n, ic, kh, kw, oh, ow = col.shape
         col = col.reshape(n, ic, kh * kw, oh, ow)
         index = np.argmax(col, axis=2)
         value = np.max(col, axis=2)
+        cpu_pool.free(col.base)
         ret = cls._create_node(value)
-        ret.attrs._index = index
+        ret.attrs._index = index.astype(_index_dtype(kh * kw))
         ret.attrs._x = x
         ret.attrs._in_shape = in_shape
         ret.attrs._out_shape = out_shape
@@ -59,15 +66,17 @@ class max_pool2d(pool_base):
 
     def _backward_cpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._x, Node):
-            N = len(dy)
+            dy = to_value(dy)
+            N, C, out_h, out_w = dy.shape
+            k_h, k_w = self.attrs._kernel
             index = self.attrs._index
-            col = np.zeros((N, self.attrs._in_shape[0], self.attrs._kernel[0],
-                            self.attrs._kernel[1], self.attrs._out_shape[1], self.attrs._out_shape[2]))
-            col_k = np.rollaxis(col.reshape(
-                N, self.attrs._in_shape[0], -1, self.attrs._out_shape[1], self.attrs._out_shape[2]), 2)
-            for i in np.ndindex(N, self.attrs._in_shape[0], self.attrs._out_shape[1], self.attrs._out_shape[2]):
-                col_k[index[i]][i] = dy[i]
-            dx = col2im(col, self.attrs._in_shape[1:], self.attrs._stride, self.attrs._padding)
+            # Scatter dy to the positions of maximum values.
+            col = cpu_pool.zeros((N, C, k_h * k_w, out_h, out_w), dtype=dy.dtype)
+            n, c, h, w = np.ogrid[:N, :C, :out_h, :out_w]
+            col[n, c, index, h, w] = dy
+            dx = col2im(col.reshape(N, C, k_h, k_w, out_h, out_w), self.attrs._in_shape[1:],
+                        self.attrs._stride, self.attrs._padding)
+            cpu_pool.free(col)
             self.attrs._x._update_diff(context, dx, **kwargs)
 
 
@@ -75,11 +84,9 @@ class average_pool2d(pool_base):
 
     @classmethod
     def _oper_cpu(cls, x, in_shape, out_shape, karnel, stride, padding):
-        col = im2col(x, out_shape[1:], karnel,
-                     stride, padding)
-        n, ic, kh, kw, oh, ow = col.shape
-        col = col.reshape(n, ic, kh * kw, oh, ow)
-        value = np.mean(col, axis=2)
+        col = im2col(to_value(x), out_shape[1:], karnel,
+                     stride, padding, copy=False)
+        value = np.mean(col, axis=(2, 3))
         ret = cls._create_node(value)
         ret.attrs._x = x
         ret.attrs._in_shape = in_shape
@@ -103,12 +110,9 @@ class average_pool2d(pool_base):
 
     def _backward_cpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._x, Node):
-            N = len(dy)
-            col = np.zeros((N, self.attrs._in_shape[0], self.attrs._kernel[0],
-                            self.attrs._kernel[1], self.attrs._out_shape[1], self.attrs._out_shape[2]))
-            col_k = np.rollaxis(col.reshape(
-                N, self.attrs._in_shape[0], -1, self.attrs._out_shape[1], self.attrs._out_shape[2]), 2)
-            col_k[:] = dy / float(len(col_k))
+            k_h, k_w = self.attrs._kernel
+            dy = to_value(dy)[:, :, None, None] / float(k_h * k_w)
+            col = np.broadcast_to(dy, dy.shape[:2] + (k_h, k_w) + dy.shape[4:])
             dx = col2im(col, self.attrs._in_shape[1:], self.attrs._stride, self.attrs._padding)
             self.attrs._x._update_diff(context, dx, **kwargs)
 
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from renom.core import precision
+from numpy.lib.stride_tricks import as_strided
+from renom.core import get_precision
+from renom.mempool import cpu_pool
 
 
 def out_size(size, k, s, p):
@@ -11,39 +13,90 @@ def transpose_out_size(size, k, s, p):
     return (np.array(s) * (np.array(size) - 1) + np.array(k) - 2 * np.array(p)).astype(np.int)
 
 
-def im2col(img, size, kernel, stride, padding, padwith=0.):
+def _windows(img, size, kernel, stride):
+    # View of shape (N, C, k_h, k_w, out_h, out_w) whose kernel axes are
+    # reversed. img must be large enough to contain every window.
+    N, channel = img.shape[:2]
+    s_n, s_c, s_h, s_w = img.strides
+    view = as_strided(img, shape=(N, channel) + tuple(kernel) + tuple(size),
+                      strides=(s_n, s_c, s_h, s_w, s_h * stride[0], s_w * stride[1]),
+                      writeable=img.flags.writeable)
+    return view[:, :, ::-1, ::-1]
+
+
+def _padded_shape(shape, size, kernel, stride, padding):
+    return shape[:2] + tuple(max(shape[i + 2] + 2 * padding[i], (size[i] - 1) * stride[i] + kernel[i])
+                             for i in range(2))
+
+
+def im2col(img, size, kernel, stride, padding, padwith=0., copy=True, channel_major=False):
+    """Returns an array of shape (N, C, k_h, k_w, out_h, out_w) which holds
+    the windows of the input. The kernel axes are reversed.
+
+    If ``copy`` is False, a read only strided view of the (padded) input is
+    returned instead of a new array. Consumers which reduce over the kernel
+    axes or take strided operands can use it without copying the columns.
+
+    If ``channel_major`` is True, a contiguous array of shape
+    (C, k_h, k_w, N, out_h, out_w) is returned, which is reshaped to the
+    matrix of columns of a convolution without copying.
+    """
     N, channel, in_h, in_w = img.shape
-    out_h, out_w = size
-    k_h, k_w = kernel
-    s_h, s_w = stride
     p_h, p_w = padding
-    img_n = np.pad(img, ((0, 0), (0, 0), (p_h, p_h + s_h - 1),
-                         (p_w, p_w + s_w - 1)), mode="constant", constant_values=padwith)
-    col = np.ndarray((N, channel, k_h, k_w, out_h, out_w), dtype=precision)
-    for i in range(k_h):
-        iu = i + s_h * out_h
-        for j in range(k_w):
-            ju = j + s_w * out_w
-            col[:, :, k_h - 1 - i, k_w - 1 - j, :,
-                :] = img_n[:, :, i:iu:s_h, j:ju:s_w]
+    shape = _padded_shape(img.shape, size, kernel, stride, padding)
+    if shape == img.shape:
+        img_n = img
+    else:
+        img_n = cpu_pool.full(shape, padwith, dtype=img.dtype)
+        img_n[:, :, p_h:p_h + in_h, p_w:p_w + in_w] = img
+    view = _windows(np.asarray(img_n), size, kernel, stride)
+    if not copy:
+        view.flags.writeable = False
+        return view
+    if channel_major:
+        view = view.transpose(1, 2, 3, 0, 4, 5)
+    col = cpu_pool.empty(view.shape, dtype=get_precision())
+    col[...] = view
+    cpu_pool.free(img_n)
     return col
 
 
 def col2im(col, size, stride, padding):
+    """Sums up windows of shape (N, C, k_h, k_w, out_h, out_w) into an array
+    of shape (N, C) + size. This is the inverse operation of ``im2col``.
+
+    Kernel offsets ``q * stride + r`` with the same ``q`` cover disjoint
+    pixels, so that each group of ``stride`` offsets is scattered by one
+    strided addition. Windows which do not overlap are written at once.
+    """
     in_h, in_w = size
-    s_h, s_w = stride
     p_h, p_w = padding
+    s_h, s_w = stride
     N, channel, k_h, k_w, out_h, out_w = col.shape
-    img = np.zeros((N, channel, in_h + 2 * p_h + s_h - 1,
-                    in_w + 2 * p_w + s_w - 1), dtype=precision)
-    for i in range(k_h):
-        iu = i + s_h * out_h
-        for j in range(k_w):
-            ju = j + s_w * out_w
-            img[:, :, i:iu:s_h, j:ju:s_w] += col[:, :, k_h - 1 - i, k_w - 1 - j, :, :]
-    im_shape = img.shape
-    return img[:, :, p_h:im_shape[2] - (p_h + s_h - 1),
-               p_w:im_shape[3] - (p_w + s_w - 1)]
+    q_h, q_w = -(-k_h // s_h), -(-k_w // s_w)
+    shape = _padded_shape((N, channel, in_h, in_w), (out_h, out_w), (k_h, k_w), stride, padding)
+    shape = shape[:2] + (max(shape[2], (q_h - 1 + out_h) * s_h), max(shape[3], (q_w - 1 + out_w) * s_w))
+    if q_h == q_w == 1 and shape[2:] == (out_h * s_h, out_w * s_w) and stride == (k_h, k_w):
+        # Windows cover the image without overlap.
+        img = cpu_pool.empty(shape, dtype=get_precision())
+    else:
+        img = cpu_pool.zeros(shape, dtype=get_precision())
+
+    # Kernel offsets in ascending order.
+    col = col[:, :, ::-1, ::-1]
+    s_n, s_c, s_y, s_x = img.strides
+    for i in range(q_h):
+        for j in range(q_w):
+            r_h, r_w = min(s_h, k_h - i * s_h), min(s_w, k_w - j * s_w)
+            view = as_strided(img[:, :, i * s_h:, j * s_w:], shape=(N, channel, r_h, r_w, out_h, out_w),
+                              strides=(s_n, s_c, s_y, s_x, s_y * s_h, s_x * s_w))
+            group = col[:, :, i * s_h:i * s_h + r_h, j * s_w:j * s_w + r_w]
+            # The columns are given first, so that numpy iterates in their order.
+            if q_h == q_w == 1:
+                np.positive(group, out=view)
+            else:
+                np.add(group, view, out=view)
+    return img[:, :, p_h:p_h + in_h, p_w:p_w + in_w]
 
 
 def tuplize(x):
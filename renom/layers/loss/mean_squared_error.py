@@ -2,8 +2,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division
 import numpy as np
-from renom.core import BinOp, Node, get_gpu
+from renom.core import BinOp, Node, get_gpu, to_value
 from renom.cuda import cuda as cu
+from renom.elementwise import fuse
+
+
+@fuse
+def _squared_difference(x, y):
+    return (x - y) ** 2
+
+
+@fuse
+def _scaled_difference(x, y, scale):
+    return (x - y) * scale
 
 
 class mean_squared_error(BinOp):
@@ -12,25 +23,25 @@ class mean_squared_error(BinOp):
     def _oper_cpu(cls, lhs, rhs):
         assert rhs.ndim > 1, "Input arrays must have no less than 2 dimension."
         N = len(lhs)
-        return np.sum((lhs - rhs) ** 2) / (N * 2)
+        return np.sum(_squared_difference.compute(lhs, rhs)) / (N * 2)
 
     @classmethod
     def _oper_gpu(cls, lhs, rhs):
         assert rhs.ndim > 1, "Input arrays must have no less than 2 dimension."
         N = len(lhs)
-        return cu.cusum(get_gpu((get_gpu(lhs) - get_gpu(rhs)) ** 2)) / (N * 2)
+        return cu.cusum(_squared_difference.compute(lhs, rhs)) / (N * 2)
 
     def _backward_cpu(self, context, dy, **kwargs):
-        sub = self.attrs._lhs - self.attrs._rhs
         if isinstance(self.attrs._lhs, Node):
             N = len(self.attrs._lhs)
-            self.attrs._lhs._update_diff(context, sub * dy / N, **kwargs)
+            sub = _scaled_difference.compute(self.attrs._lhs, self.attrs._rhs, to_value(dy) / N)
+            self.attrs._lhs._update_diff(context, sub, **kwargs)
 
     def _backward_gpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._lhs, Node):
             N = len(self.attrs._lhs)
-            sub = get_gpu(self.attrs._lhs) - get_gpu(self.attrs._rhs)
-            self.attrs._lhs._update_diff(context, sub * get_gpu(dy) / N, **kwargs)
+            sub = _scaled_difference.compute(self.attrs._lhs, self.attrs._rhs, get_gpu(dy) / N)
+            self.attrs._lhs._update_diff(context, sub, **kwargs)
 
 
 class MeanSquaredError(object):
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import numpy as np
+from renom.core import Node, Variable, to_value
+from renom.sparse import RowSparse
+from renom.layers.function.parameterized import Parametrized
+from renom.cuda import is_cuda_active
+
+
+class _Sampler(object):
+    '''Distribution of sampled classes.
+
+    ``distribution`` is "uniform", "log_uniform" or an array of (not
+    necessarily normalized) probabilities of classes. "log_uniform" is the
+    Zipfian distribution ``P(c) = log((c + 2) / (c + 1)) / log(classes + 1)``,
+    which suits vocabularies sorted by frequency.
+    '''
+
+    def __init__(self, distribution, classes):
+        self.classes = classes
+        if isinstance(distribution, str):
+            assert distribution in ("uniform", "log_uniform"), \
+                "Unknown distribution: %r" % (distribution, )
+            self._kind = distribution
+        else:
+            p = np.asarray(distribution, dtype=np.float64).reshape(-1)
+            assert len(p) == classes, "Distribution must have a probability for each class."
+            self._kind = None
+            self._p = p / np.sum(p)
+            self._cdf = np.cumsum(self._p)
+
+    def sample(self, n, generator=None):
+        rng = np.random if generator is None else generator
+        u = rng.random_sample(n)
+        if self._kind == "uniform":
+            return (u * self.classes).astype(np.int64)
+        if self._kind == "log_uniform":
+            ret = np.exp(u * np.log(self.classes + 1.)).astype(np.int64) - 1
+            return np.minimum(ret, self.classes - 1)
+        return np.minimum(np.searchsorted(self._cdf, u, side='right'), self.classes - 1)
+
+    def probability(self, index):
+        if self._kind == "uniform":
+            return np.full(index.shape, 1. / self.classes)
+        if self._kind == "log_uniform":
+            return np.log((index + 2.) / (index + 1.)) / np.log(self.classes + 1.)
+        return self._p[index]
+
+
+def _sparse_grad(param, index, values, sparse_grad):
+    # Gradient of the columns of ``param``, which are the last axis. It is
+    # kept as RowSparse for weight Variables if sparse gradients are
+    # requested, and is dense otherwise.
+    ret = RowSparse(index, values.astype(param.dtype, copy=False), param.shape,
+                    axis=param.ndim - 1)
+    return ret if sparse_grad and isinstance(param, Variable) else ret.as_ndarray()
+
+
+class sampled_softmax_cross_entropy(Node):
+
+    def __new__(cls, x, y, w, b=None, num_sampled=64, distribution="uniform",
+                generator=None, remove_accidental_hits=True, sparse_grad=False):
+        assert not is_cuda_active(), "Sampled softmax cross entropy is computed on CPU."
+        assert x.ndim == 2 and w.ndim == 2, "Input and weight must be matrices."
+        assert b is None or b.shape == (1, w.shape[1]), "Bias must have the shape (1, classes)."
+        if not isinstance(distribution, _Sampler):
+            distribution = _Sampler(distribution, w.shape[1])
+        y = np.asarray(to_value(y)).astype(np.int64).reshape(len(x))
+        sampled = distribution.sample(num_sampled, generator)
+        return cls.calc_value(x, y, w, b, sampled, distribution, remove_accidental_hits,
+                              sparse_grad)
+
+    @classmethod
+    def _oper_cpu(cls, x, y, w, b, sampled, distribution, remove_accidental_hits, sparse_grad):
+        # Logits of the true class and the sampled classes are placed in one
+        # (N, 1 + num_sampled) array, from which log(num_sampled * P(c)) is
+        # subtracted. The loss is the softmax cross entropy of the true class.
+        N = len(x)
+        xv = to_value(x)
+        wv = to_value(w)
+        # Columns of the weight of the true classes and the sampled classes.
+        wt = np.take(wv, y, axis=1)
+        ws = np.take(wv, sampled, axis=1)
+        logits = np.empty((N, 1 + len(sampled)), dtype=np.result_type(xv, wv))
+        np.einsum('nd,dn->n', xv, wt, out=logits[:, 0])
+        logits[:, 1:] = np.dot(xv, ws)
+        if b is not None:
+            bv = to_value(b).reshape(-1)
+            logits[:, 0] += bv[y]
+            logits[:, 1:] += bv[sampled]
+        logits[:, 0] -= np.log(len(sampled) * distribution.probability(y))
+        logits[:, 1:] -= np.log(len(sampled) * distribution.probability(sampled))
+        if remove_accidental_hits:
+            logits[:, 1:][y[:, None] == sampled[None]] = -np.inf
+
+        logits -= np.max(logits, axis=1, keepdims=True)
+        picked = np.sum(logits[:, 0])
+        np.exp(logits, out=logits)
+        summed = np.sum(logits, axis=1, keepdims=True)
+        logits /= summed
+        loss = (np.sum(np.log(summed)) - picked) / N
+
+        ret = cls._create_node(loss)
+        ret.attrs._x = x
+        ret.attrs._y = y
+        ret.attrs._w = w
+        ret.attrs._b = b
+        ret.attrs._sampled = sampled
+        ret.attrs._z = logits
+        ret.attrs._sparse_grad = sparse_grad
+        return ret
+
+    def _backward_cpu(self, context, dy, **kwargs):
+        x, y, w, b = self.attrs._x, self.attrs._y, self.attrs._w, self.attrs._b
+        sampled, sparse_grad = self.attrs._sampled, self.attrs._sparse_grad
+        dz = np.array(self.attrs._z)
+        dz[:, 0] -= 1
+        dz *= to_value(dy) / len(dz)
+        dt, ds = dz[:, :1], dz[:, 1:]
+        wv = to_value(w)
+
+        if isinstance(x, Node):
+            dx = dt * np.take(wv, y, axis=1).T
+            dx += np.dot(ds, np.take(wv, sampled, axis=1).T)
+            x._update_diff(context, dx, **kwargs)
+
+        # Gradients of the columns of the true classes and the sampled classes.
+        index = np.concatenate([y, sampled])
+        if isinstance(w, Node):
+            xv = to_value(x)
+            dw = np.concatenate([(dt * xv).T, np.dot(xv.T, ds)], axis=1)
+            w._update_diff(context, _sparse_grad(w, index, dw, sparse_grad), **kwargs)
+
+        if isinstance(b, Node):
+            db = np.concatenate([dt[:, 0], np.sum(ds, axis=0)]).reshape(1, -1)
+            b._update_diff(context, _sparse_grad(b, index, db, sparse_grad), **kwargs)
+
+
+class SampledSoftmaxCrossEntropy(object):
+    """Softmax cross entropy evaluated on the true class and classes
+    sampled from a distribution, for outputs with a very large number of
+    classes. [SampledSoftmax]_
+
+    The output of the last layer is given instead of logits, together with
+    the output layer. The output layer is a :class:`renom.Dense` object,
+    or its weight ``w`` of shape (input size, classes) and its bias ``b`` of
+    shape (1, classes). Logits are computed only for the
+    true class of each sample and ``num_sampled`` classes sampled once per
+    call, and ``log(num_sampled * P(c))`` is subtracted from them.
+    Sampled classes which equal the true class of a sample are excluded
+    from its softmax when ``remove_accidental_hits`` is True.
+
+    If ``sparse_grad`` is True, gradients of the weight and the bias
+    Variables are :class:`renom.RowSparse` with ``axis`` 1, which hold only
+    the columns of the true and sampled classes, and optimizers update only
+    those columns.
+
+    The loss is an estimate used for training. The exact loss is obtained
+    with :func:`softmax_cross_entropy` applied to the output of the output
+    layer, ``rm.dot(x, w) + b``.
+    The loss is computed on CPU.
+
+    Args:
+        num_sampled (int): Number of sampled classes.
+        distribution (str, ndarray): "uniform", "log_uniform" or probabilities
+            of classes, from which classes are sampled.
+        seed (int): Seed of a ``numpy.random.RandomState`` owned by the
+            object. If it is None, ``numpy.random`` is used.
+        remove_accidental_hits (bool): If True, sampled classes equal to
+            the true class are excluded.
+        sparse_grad (bool): If True, gradients of the weight and the bias
+            are sparse. Otherwise they are dense arrays.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> classes, size = 100000, 32
+        >>> layer = rm.Dense(classes, input_size=size)
+        >>> x = rm.Variable(np.random.rand(8, size))
+        >>> y = np.random.randint(0, classes, 8)
+        >>> loss_func = rm.SampledSoftmaxCrossEntropy(num_sampled=64, distribution="log_uniform",
+        ...                                           sparse_grad=True)
+        >>> loss = loss_func(x, y, layer)
+        >>> dw = loss.grad().get(layer.params.w)
+        >>> dw.values.shape[1] <= 8 + 64
+        True
+        >>> # Evaluation with all classes.
+        >>> loss = rm.softmax_cross_entropy(layer(x), y)
+
+    .. [SampledSoftmax] Sebastien Jean, Kyunghyun Cho, Roland Memisevic, Yoshua Bengio.
+        On Using Very Large Target Vocabulary for Neural Machine Translation(2015)
+        https://arxiv.org/abs/1412.2007
+    """
+
+    def __init__(self, num_sampled=64, distribution="uniform", seed=None,
+                 remove_accidental_hits=True, sparse_grad=False):
+        self._num_sampled = num_sampled
+        self._distribution = distribution
+        self._sampler = None
+        self._remove_accidental_hits = remove_accidental_hits
+        self._rng = None if seed is None else np.random.RandomState(seed)
+        self._sparse_grad = sparse_grad
+
+    def __call__(self, x, y, w, b=None):
+        if isinstance(w, Parametrized):
+            if not w.params:
+                w.weight_initiallize(x.shape[1:])
+            w, b = w.params["w"], w.params.get("b")
+        if self._sampler is None or self._sampler.classes != w.shape[1]:
+            self._sampler = _Sampler(self._distribution, w.shape[1])
+        return sampled_softmax_cross_entropy(x, y, w, b, self._num_sampled, self._sampler,
+                                             self._rng, self._remove_accidental_hits,
+                                             self._sparse_grad)
@@ -4,6 +4,27 @@ from __future__ import print_function, division
 import numpy as np
 from renom.core import Node, get_gpu, to_value
 from renom.cuda import cuda as cu
+from renom.elementwise import fuse
+
+
+@fuse
+def _logistic_loss(positive, x, y, softplus):
+    return positive - x * y + softplus
+
+
+@fuse
+def _reciprocal_sum(e):
+    return 1. / (1. + e)
+
+
+@fuse
+def _complement(x):
+    return 1. - x
+
+
+@fuse
+def _scaled_difference(x, y, scale):
+    return (x - y) * scale
 
 
 class sigmoid_cross_entropy(Node):
@@ -14,10 +35,16 @@ class sigmoid_cross_entropy(Node):
 
     @classmethod
     def _oper_cpu(cls, lhs, rhs):
+        # The loss is computed from logits as
+        #   max(x, 0) - x * y + log(1 + exp(-|x|))
+        # which does not overflow, and the sigmoid is obtained from exp(-|x|).
         N = len(lhs)
-        z = 1. / (1. + np.exp(to_value(-lhs)))
-        loss = -np.sum(to_value(rhs) * np.log(z + 1e-8) +
-                       to_value(1 - rhs) * np.log(1 - z + 1e-8)) / N
+        x = to_value(lhs)
+        e = np.exp(-np.abs(x))
+        loss = _logistic_loss.compute(np.maximum(x, 0), x, to_value(rhs), np.log1p(e))
+        loss = np.sum(loss) / N
+        z = _reciprocal_sum.compute(e)
+        np.multiply(z, e, out=z, where=x < 0)
         ret = cls._create_node(loss)
         ret.attrs._z = z
         ret.attrs._lhs = lhs
@@ -32,7 +59,7 @@ class sigmoid_cross_entropy(Node):
         tmp2 = get_gpu(lhs).empty_like_me()
         cu.cusigmoid(get_gpu(lhs), z)
         cu.cucross_entropy(get_gpu(z), get_gpu(rhs), tmp1)
-        cu.cucross_entropy(get_gpu(-z + 1.), get_gpu(-rhs + 1.), tmp2)
+        cu.cucross_entropy(_complement.compute(z), _complement.compute(rhs), tmp2)
         loss = cu.cusum(-(tmp1 + tmp2)) / N
         ret = cls._create_node(loss)
         ret.attrs._z = z
@@ -42,15 +69,15 @@ class sigmoid_cross_entropy(Node):
 
     def _backward_cpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._lhs, Node):
-            sub = self.attrs._z - self.attrs._rhs
             N = len(self.attrs._z)
-            self.attrs._lhs._update_diff(context, sub * dy / N, **kwargs)
+            sub = _scaled_difference.compute(self.attrs._z, self.attrs._rhs, to_value(dy) / N)
+            self.attrs._lhs._update_diff(context, sub, **kwargs)
 
     def _backward_gpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._lhs, Node):
             N = len(self.attrs._lhs)
-            sub = get_gpu(self.attrs._z) - get_gpu(self.attrs._rhs)
-            self.attrs._lhs._update_diff(context, sub * get_gpu(dy) / N, **kwargs)
+            sub = _scaled_difference.compute(self.attrs._z, self.attrs._rhs, get_gpu(dy) / N)
+            self.attrs._lhs._update_diff(context, sub, **kwargs)
 
 
 class SigmoidCrossEntropy:
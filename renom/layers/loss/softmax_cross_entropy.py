@@ -2,22 +2,66 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division
 import numpy as np
-from renom.core import Node, get_gpu
+from renom.core import Node, get_gpu, to_value
 from renom.layers.activation import softmax
 from renom.cuda import cuda as cu
+from renom.cuda import is_cuda_active
+from renom.elementwise import fuse
+
+
+def _is_label(lhs, rhs):
+    # Integer class indices have the shape of the input without the class axis.
+    return isinstance(rhs, np.ndarray) and not isinstance(rhs, Node) and \
+        np.issubdtype(rhs.dtype, np.integer) and rhs.ndim == lhs.ndim - 1
+
+
+@fuse
+def _scaled_difference(x, y, scale):
+    return (x - y) * scale
+
+
+def _label_index(label):
+    # Index of the elements of the classes ``label`` in an array whose class
+    # axis is 1, that is ``(np.arange(N), label)`` for 1 dimensional labels.
+    index = [np.arange(n).reshape((-1, ) + (1, ) * (label.ndim - 1 - i))
+             for i, n in enumerate(label.shape)]
+    return (index[0], label) + tuple(index[1:])
+
+
+def _onehot(label, shape, dtype):
+    ret = np.zeros(shape, dtype=dtype)
+    ret[_label_index(label)] = 1
+    return ret
 
 
 class softmax_cross_entropy(Node):
 
     def __new__(cls, lhs, rhs):
-        assert rhs.ndim > 1, "Input arrays must have no less than 2 dimension."
+        if _is_label(lhs, rhs):
+            if is_cuda_active():
+                rhs = _onehot(rhs, lhs.shape, lhs.dtype)
+        else:
+            assert rhs.ndim > 1, "Input arrays must have no less than 2 dimension."
         return cls.calc_value(lhs, rhs)
 
     @classmethod
     def _oper_cpu(cls, lhs, rhs):
+        # Log-softmax is computed as x - max(x) - log(sum(exp(x - max(x)))),
+        # and the softmax is kept for backward propagation.
         N = len(lhs)
-        z = softmax(lhs)
-        loss = -np.sum(rhs * np.log(z + 1e-8)) / N
+        x = to_value(lhs)
+        z = x - np.max(x, axis=1, keepdims=True)
+        if _is_label(lhs, rhs):
+            picked = np.sum(z[_label_index(rhs)])
+        else:
+            picked = np.sum(to_value(rhs) * z)
+        np.exp(z, out=z)
+        summed = np.sum(z, axis=1, keepdims=True)
+        z /= summed
+        if _is_label(lhs, rhs):
+            loss = (np.sum(np.log(summed)) - picked) / N
+        else:
+            loss = (np.sum(np.sum(to_value(rhs), axis=1, keepdims=True) * np.log(summed)) - picked) / N
         ret = cls._create_node(loss)
         ret.attrs._z = z
         ret.attrs._lhs = lhs
@@ -40,14 +84,20 @@ class softmax_cross_entropy(Node):
     def _backward_cpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._lhs, Node):
             N = len(self.attrs._lhs)
-            sub = self.attrs._z - self.attrs._rhs
-            self.attrs._lhs._update_diff(context, sub * dy / N, **kwargs)
+            rhs = self.attrs._rhs
+            if _is_label(self.attrs._lhs, rhs):
+                sub = np.array(self.attrs._z)
+                sub[_label_index(rhs)] -= 1
+                sub *= to_value(dy) / N
+            else:
+                sub = _scaled_difference.compute(self.attrs._z, rhs, to_value(dy) / N)
+            self.attrs._lhs._update_diff(context, sub, **kwargs)
 
     def _backward_gpu(self, context, dy, **kwargs):
         if isinstance(self.attrs._lhs, Node):
             N = len(self.attrs._lhs)
-            sub = get_gpu(self.attrs._z) - get_gpu(self.attrs._rhs)
-            self.attrs._lhs._update_diff(context, sub * get_gpu(dy) / N, **kwargs)
+            sub = _scaled_difference.compute(self.attrs._z, self.attrs._rhs, get_gpu(dy) / N)
+            self.attrs._lhs._update_diff(context, sub, **kwargs)
 
 
 class SoftmaxCrossEntropy(object):
@@ -58,12 +108,25 @@ class SoftmaxCrossEntropy(object):
         z_{nk} &= \\frac{\exp(x_{nk})}{\sum_{j=1}^{K}\exp(x_{nj})} \\\\
         E(x) &= -\\frac{1}{N}\sum_{n}^{N}\sum_{k}^{K}y_{nk}\log(z_{nk})
 
+    The target can also be given as integer class indices, whose shape is
+    the shape of ``x`` without the second axis. One-hot targets are not
+    created in that case.
+
     Args:
         x (ndarray,Node): Input array.
-        y (ndarray,Node): Target array.
+        y (ndarray,Node): Target array or array of integer class indices.
 
     Raises:
         AssertionError: An assertion error will be raised if the given tensor dimension is less than 2.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> x = np.random.rand(3, 5)
+        >>> label = np.array([0, 3, 4])
+        >>> loss = rm.softmax_cross_entropy(x, label)
+        >>> np.allclose(loss, rm.softmax_cross_entropy(x, np.eye(5)[label]))
+        True
     """
 
     def __call__(self, lhs, rhs):
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import collections
+import threading
+import weakref
+import numpy as np
+
+
+class BufferPool(object):
+    '''Pool of numpy arrays for temporary buffers of CPU operations.
+
+    Arrays are handed out by shape and dtype, and are given back with
+    :meth:`free` by the operation which knows that they are no longer used,
+    for example after its backward calculation. Arrays which are not given
+    back are released by the garbage collector like arrays created by
+    ``np.empty``.
+
+    The pool holds at most ``limit`` bytes of free arrays. When the limit
+    is exceeded, arrays of the least recently used shapes are discarded.
+
+    Args:
+        limit (int): Maximum number of bytes of free arrays held by the pool.
+            If None, the size of the pool is not limited.
+    '''
+
+    def __init__(self, limit=256 * 1024 * 1024):
+        self.enabled = True
+        self.limit = limit
+        self._buffers = collections.OrderedDict()
+        self._lent = weakref.WeakValueDictionary()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def empty(self, shape, dtype=np.float64):
+        '''Returns an uninitialized array of given shape and dtype.'''
+        if not self.enabled:
+            return np.empty(shape, dtype=dtype)
+
+        shape = tuple(shape) if np.iterable(shape) else (shape, )
+        dtype = np.dtype(dtype)
+        key = (shape, dtype)
+        with self._lock:
+            buffers = self._buffers.get(key)
+            if buffers:
+                ret = buffers.pop()
+                if buffers:
+                    # Moves the entry to the end of the LRU order.
+                    self._buffers[key] = self._buffers.pop(key)
+                else:
+                    del self._buffers[key]
+                self._nbytes -= ret.nbytes
+                self._hits += 1
+            else:
+                ret = np.empty(shape, dtype=dtype)
+                self._misses += 1
+            self._lent[id(ret)] = ret
+            return ret
+
+    def free(self, *arrays):
+        '''Gives arrays obtained from this pool back to the pool. The arrays
+        and their views must not be used after this call. Other objects,
+        including views of pooled arrays, are ignored.'''
+        with self._lock:
+            for a in arrays:
+                if a is None or self._lent.get(id(a)) is not a:
+                    continue
+                del self._lent[id(a)]
+                if not self.enabled or (self.limit is not None and a.nbytes > self.limit):
+                    continue
+                key = (a.shape, a.dtype)
+                buffers = self._buffers.pop(key, [])
+                buffers.append(a)
+                self._buffers[key] = buffers
+                self._nbytes += a.nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.limit is not None and self._nbytes > self.limit:
+            key, buffers = self._buffers.popitem(last=False)
+            self._nbytes -= sum(b.nbytes for b in buffers)
+
+    def zeros(self, shape, dtype=np.float64):
+        '''Returns an array of given shape and dtype filled with zeros.'''
+        ret = self.empty(shape, dtype)
+        ret.fill(0)
+        return ret
+
+    def full(self, shape, fill_value, dtype=np.float64):
+        '''Returns an array of given shape and dtype filled with ``fill_value``.'''
+        ret = self.empty(shape, dtype)
+        ret.fill(fill_value)
+        return ret
+
+    def release(self):
+        '''Removes every free array from the pool.'''
+        with self._lock:
+            self._buffers.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        '''Returns statistics of the pool.
+
+        Returns:
+            dict: Dictionary which has keys ``hits``, ``misses``, ``buffers``
+            and ``nbytes`` of free arrays.
+        '''
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'buffers': sum(len(b) for b in self._buffers.values()),
+                'nbytes': self._nbytes,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = self._misses = 0
+
+
+cpu_pool = BufferPool()
+
+
+def release_cpu_pool():
+    """This function releases CPU memory pool.
+    """
+    cpu_pool.release()
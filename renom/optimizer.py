@@ -2,13 +2,184 @@
 # encoding: utf-8
 from __future__ import division, print_function
 import numpy as np
-from renom.core import get_gpu, Node
-from renom.operation import sqrt
+from renom.core import get_gpu, Variable, GraphAttrs, to_value
 from renom.cuda.cuda import is_cuda_active
+from renom.sparse import RowSparse
+from renom.elementwise import fuse
+
+
+# Update rules of the optimizers. They are evaluated with ``compute`` of
+# fused functions, which writes temporaries into reused buffers.
+
+@fuse
+def _momentum_step(dy, pdy, lr, momentum):
+    return lr * dy + momentum * pdy
+
+
+@fuse
+def _square_sum(r, dy):
+    return r + dy ** 2
+
+
+@fuse
+def _moving_average(m, dy, decay):
+    return decay * m + (1 - decay) * dy
+
+
+@fuse
+def _moving_square(r, dy, decay):
+    return decay * r + (1 - decay) * dy ** 2
+
+
+@fuse
+def _scaled_step(dy, r, lr, epsilon):
+    return lr * dy / (r ** 0.5 + epsilon)
+
+
+@fuse
+def _adam_step(u, r, lr, g, b, epsilon):
+    return lr * u / ((r / (1 - g)) ** 0.5 + epsilon) / (1 - b)
+
+
+def _dense_state(state, dy):
+    # State of an optimizer for a RowSparse gradient. It is a dense array
+    # whose rows are updated only when they have gradients.
+    if not isinstance(state, np.ndarray) or state.shape != dy.shape:
+        return np.zeros(dy.shape, dtype=dy.dtype)
+    return state
+
+
+def _view_variable(value, auto_update):
+    # Variable which shares the memory of ``value``.
+    ret = value.view(Variable)
+    ret.attrs = GraphAttrs()
+    ret._auto_update = auto_update
+    Variable.__init__(ret, value, auto_update)
+    return ret
+
+
+class _PackedParams(object):
+    '''Parameters of a model, their gradients and optimizer states in flat
+    buffers. The parameters of the model are replaced with views of the
+    parameter buffer.
+    '''
+
+    def __init__(self, model, state_names):
+        entries = []
+        seen = set()
+        for m in model.iter_models():
+            for k, v in list(m.params.items()):
+                # Variables updated by custom functions are not packed.
+                if isinstance(v, Variable) and v._auto_update is True and id(v) not in seen:
+                    seen.add(id(v))
+                    entries.append((m, k, v))
+
+        dtype = np.result_type(*[v.dtype for _, _, v in entries]) if entries else np.float32
+        self.sizes = np.array([v.size for _, _, v in entries], dtype=np.int64)
+        size = int(np.sum(self.sizes))
+        self.value = np.empty(size, dtype=dtype)
+        self.grad = np.zeros(size, dtype=dtype)
+        self.step = np.zeros(size, dtype=dtype)
+        self.work = np.zeros(size, dtype=dtype)
+        self.states = {name: np.zeros(size, dtype=dtype) for name in state_names}
+        self.counts = np.zeros(len(entries), dtype=np.int64)
+
+        self.nodes = []
+        self.slices = []
+        self.grads = []
+        offset = 0
+        for m, k, v in entries:
+            sl = slice(offset, offset + v.size)
+            offset += v.size
+            self.value[sl] = to_value(v).reshape(-1)
+            node = _view_variable(self.value[sl].reshape(v.shape), v._auto_update)
+            m.params[k] = node
+            self.nodes.append(node)
+            self.slices.append(sl)
+            self.grads.append(self.grad[sl].reshape(v.shape))
+
+    def per_element(self, values):
+        '''Returns a scalar if all parameters have the same value, or an array
+        of the values repeated for each element.'''
+        if np.all(values == values[0]):
+            return values[0]
+        return np.repeat(values, self.sizes)
+
+    def update(self, opt, grads, models=()):
+        '''Updates the parameters which have gradients in ``grads`` and returns
+        ids of all the packed parameters.'''
+        if models:
+            allowed = set(id(v) for m in models for v in m.params.values())
+        skipped = []
+        for i, node in enumerate(self.nodes):
+            dy = grads.variables.get(id(node))
+            if dy is None or node.prevent_update or (models and id(node) not in allowed):
+                skipped.append(i)
+                continue
+            if isinstance(dy, RowSparse):
+                self.grads[i][...] = 0
+                self.grads[i][dy.index] = dy.values
+            else:
+                self.grads[i][...] = to_value(dy)
+
+        if len(skipped) < len(self.nodes):
+            # Parameters without gradients keep their states and values.
+            saved = [(i, [s[self.slices[i]].copy() for s in self.states.values()])
+                     for i in skipped]
+            active = np.ones(len(self.nodes), dtype=bool)
+            active[skipped] = False
+            self.counts[active] += 1
+            opt._packed_step(self)
+            for i, values in saved:
+                sl = self.slices[i]
+                for s, v in zip(self.states.values(), values):
+                    s[sl] = v
+                self.step[sl] = 0
+            self.value -= self.step
+
+        skipped = set(skipped)
+        for i, node in enumerate(self.nodes):
+            if i not in skipped:
+                node.detach_graph()
+        return set(id(node) for node in self.nodes)
 
 
 class Optimizer(object):
-    pass
+    '''Base class of optimizers.'''
+
+    _state_names = ()
+    _packed = None
+
+    def pack(self, model):
+        '''Packs the parameters of ``model``, their gradients and the state of
+        this optimizer into contiguous flat buffers. Then :meth:`Grads.update`
+        updates all of them with a few vectorised operations on the buffers
+        instead of one call of the optimizer per parameter.
+
+        The parameters of the model and its child models are replaced with
+        Variables which share the memory of the parameter buffer. Call this
+        method again after parameters are replaced, for example by
+        :meth:`Model.load`. Gradients of the packed parameters are made dense.
+        Packed buffers are not used on GPU.
+
+        Args:
+            model (Model): Model whose parameters are packed.
+
+        Returns:
+            Optimizer: This optimizer.
+
+        Example:
+            >>> import numpy as np
+            >>> import renom as rm
+            >>> model = rm.Sequential([rm.Dense(3, input_size=2), rm.Relu(), rm.Dense(1, input_size=3)])
+            >>> opt = rm.Adam().pack(model)
+            >>> with model.train():
+            ...     loss = rm.sum(model(np.random.rand(4, 2)))
+            ...
+            >>> loss.grad().update(opt)
+        '''
+        self._packed = _PackedParams(model, self._state_names)
+        return self
 
 
 class Sgd(Optimizer):
@@ -46,14 +217,35 @@ class Sgd(Optimizer):
     def __call__(self, dy, node):
 
         node_id = id(node)
+        if isinstance(dy, RowSparse):
+            return self._update_sparse(dy, node_id)
         pdy = self._params.get(node_id, 0)
-        ret = self._lr * dy + self._momentum * pdy
+        ret = _momentum_step.compute(dy, pdy, self._lr, self._momentum)
         if self._momentum > 0:
             self._params[node_id] = ret
-        if isinstance(ret, Node):
-            ret.detach_graph()
         return ret
 
+    _state_names = ("m", )
+
+    def _packed_step(self, packed):
+        np.multiply(packed.grad, self._lr, out=packed.step)
+        if self._momentum > 0:
+            m = packed.states["m"]
+            m *= self._momentum
+            m += packed.step
+            packed.step[...] = m
+
+    def _update_sparse(self, dy, node_id):
+        idx = dy.index
+        if self._momentum > 0:
+            m = _dense_state(self._params.get(node_id), dy)
+            rows = _momentum_step.compute(dy.values, m[idx], self._lr, self._momentum)
+            m[idx] = rows
+            self._params[node_id] = m
+        else:
+            rows = self._lr * dy.values
+        return dy.with_values(rows)
+
 
 class Adagrad(Optimizer):
     '''Adaptive gradient algorithm. [Adagrad]_
@@ -73,13 +265,31 @@ class Adagrad(Optimizer):
 
     def __call__(self, dy, node):
         node_id = id(node)
+        if isinstance(dy, RowSparse):
+            return self._update_sparse(dy, node_id)
         pdy = self._params.get(node_id, 0)
-        r = pdy + dy**2
-        ret = self._lr * dy / (np.sqrt(r) + self._epsilon)
+        r = _square_sum.compute(pdy, dy)
         self._params[node_id] = r
-        if isinstance(ret, Node):
-            ret.detach_graph()
-        return ret
+        return _scaled_step.compute(dy, r, self._lr, self._epsilon)
+
+    _state_names = ("r", )
+
+    def _packed_step(self, packed):
+        g, r, work = packed.grad, packed.states["r"], packed.work
+        np.multiply(g, g, out=work)
+        r += work
+        np.sqrt(r, out=work)
+        work += self._epsilon
+        np.multiply(g, self._lr, out=packed.step)
+        packed.step /= work
+
+    def _update_sparse(self, dy, node_id):
+        idx, v = dy.index, dy.values
+        r = _dense_state(self._params.get(node_id), dy)
+        r[idx] += v**2
+        self._params[node_id] = r
+        rows = _scaled_step.compute(v, r[idx], self._lr, self._epsilon)
+        return dy.with_values(rows)
 
 
 class Rmsprop(Optimizer):
@@ -107,13 +317,34 @@ class Rmsprop(Optimizer):
 
     def __call__(self, dy, node):
         node_id = id(node)
+        if isinstance(dy, RowSparse):
+            return self._update_sparse(dy, node_id)
         pdy = self._params.get(node_id, 0)
-        r = self._g * pdy + (1 - self._g) * (dy**2)
-        ret = self._lr * dy / (sqrt(r) + self._epsilon)
+        r = _moving_square.compute(pdy, dy, self._g)
         self._params[node_id] = r
-        if isinstance(ret, Node):
-            ret.detach_graph()
-        return ret
+        return _scaled_step.compute(dy, r, self._lr, self._epsilon)
+
+    _state_names = ("r", )
+
+    def _packed_step(self, packed):
+        g, r, work = packed.grad, packed.states["r"], packed.work
+        np.multiply(g, g, out=work)
+        work *= 1 - self._g
+        r *= self._g
+        r += work
+        np.sqrt(r, out=work)
+        work += self._epsilon
+        np.multiply(g, self._lr, out=packed.step)
+        packed.step /= work
+
+    def _update_sparse(self, dy, node_id):
+        idx, v = dy.index, dy.values
+        r = _dense_state(self._params.get(node_id), dy)
+        rr = _moving_square.compute(r[idx], v, self._g)
+        r[idx] = rr
+        self._params[node_id] = r
+        rows = _scaled_step.compute(v, rr, self._lr, self._epsilon)
+        return dy.with_values(rows)
 
 
 class Adam(Optimizer):
@@ -148,12 +379,14 @@ class Adam(Optimizer):
 
     def __call__(self, dy, node):
         node_id = id(node)
+        if isinstance(dy, RowSparse):
+            return self._update_sparse(dy, node_id)
         pdy = self._params.get(node_id, None)
         if pdy is None:
             b = self._b
             g = self._g
-            u = (1 - self._b) * dy
-            r = (1 - self._g) * (dy**2)
+            u = _moving_average.compute(0, dy, self._b)
+            r = _moving_square.compute(0, dy, self._g)
         else:
             u = pdy["u"]
             r = pdy["r"]
@@ -168,14 +401,74 @@ class Adam(Optimizer):
                 min_flug = np.where(np.abs(r) < self._min, True, False)
                 u[min_flug] = 0
                 r[min_flug] = 0
-            u = self._b * u + (1 - self._b) * dy
-            r = self._g * r + (1 - self._g) * (dy**2)
+            u = _moving_average.compute(u, dy, self._b)
+            r = _moving_square.compute(r, dy, self._g)
         self._params[node_id] = {"beta": b * self._b,
                                  "ganma": g * self._g,
                                  "u": u,
                                  "r": r}
 
-        ret = self._lr * u / (sqrt(r / (1 - g)) + self._epsilon) / (1 - b)
-        if isinstance(ret, Node):
-            ret.detach_graph()
-        return ret
+        return _adam_step.compute(u, r, self._lr, g, b, self._epsilon)
+
+    _state_names = ("u", "r")
+
+    def _packed_step(self, packed):
+        g, u, r, work = packed.grad, packed.states["u"], packed.states["r"], packed.work
+        # Powers of the coefficients at this step, for each parameter.
+        # Parameters which have never been stepped have the count 0. Their
+        # steps are discarded, and the count is clamped to avoid 0 / 0.
+        counts = np.maximum(packed.counts, 1).astype(g.dtype)
+        b = packed.per_element(self._b ** counts)
+        gg = packed.per_element(self._g ** counts)
+
+        flug = np.less(np.abs(r), self._min)
+        u[flug] = 0
+        r[flug] = 0
+        u *= self._b
+        np.multiply(g, 1 - self._b, out=work)
+        u += work
+        r *= self._g
+        np.multiply(g, g, out=work)
+        work *= 1 - self._g
+        r += work
+
+        np.divide(r, 1 - gg, out=work)
+        np.sqrt(work, out=work)
+        work += self._epsilon
+        np.multiply(u, self._lr, out=packed.step)
+        packed.step /= 1 - b
+        packed.step /= work
+
+    def _update_sparse(self, dy, node_id):
+        # Moments of the rows which have no gradient are not decayed.
+        idx, v = dy.index, dy.values
+        pdy = self._params.get(node_id, None)
+        if pdy is None:
+            b = self._b
+            g = self._g
+            u = _dense_state(None, dy)
+            r = _dense_state(None, dy)
+        else:
+            b = pdy["beta"]
+            g = pdy["ganma"]
+            u = _dense_state(pdy["u"], dy)
+            r = _dense_state(pdy["r"], dy)
+            u.setflags(write=True)
+            r.setflags(write=True)
+
+        uu = u[idx]
+        rr = r[idx]
+        min_flug = np.abs(rr) < self._min
+        uu[min_flug] = 0
+        rr[min_flug] = 0
+        uu = _moving_average.compute(uu, v, self._b)
+        rr = _moving_square.compute(rr, v, self._g)
+        u[idx] = uu
+        r[idx] = rr
+        self._params[node_id] = {"beta": b * self._b,
+                                 "ganma": g * self._g,
+                                 "u": u,
+                                 "r": r}
+
+        rows = _adam_step.compute(uu, rr, self._lr, g, b, self._epsilon)
+        return dy.with_values(rows)
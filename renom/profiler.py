@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+from renom.core import Node, GPUValue, _Stored
+
+_timer = getattr(time, 'perf_counter', time.time)
+# Frames in these packages are skipped to find call sites.
+_SKIP_MODULES = ('renom', 'numpy', 'contextlib', 'threading', 'concurrent')
+
+_SORT_KEYS = ('calls', 'total_time', 'self_time', 'output_bytes', 'attr_bytes')
+
+
+def _nbytes(value):
+    if isinstance(value, Node):
+        if value._gpu:
+            return value._gpu.nbytes
+        return value.nbytes
+    if isinstance(value, (np.ndarray, GPUValue, _Stored)):
+        return value.nbytes
+    return 0
+
+
+def _attr_bytes(node, args):
+    # Bytes of arrays stored for backward propagation. Inputs of the operation
+    # and Nodes created by other operations are not counted.
+    if not isinstance(node, Node) or not node.attrs:
+        return 0
+    ids = set(id(a) for a in args)
+    return sum(_nbytes(v) for v in node.attrs.get_attrs()
+               if id(v) not in ids and not isinstance(v, Node))
+
+
+class _Frame(object):
+    __slots__ = ('name', 'phase', 'site', 'start', 'children')
+
+    def __init__(self, name, phase, site, start):
+        self.name = name
+        self.phase = phase
+        self.site = site
+        self.start = start
+        self.children = 0.
+
+
+class Profiler(object):
+    '''Collects wall time, bytes of arrays and number of calls of each
+    operation. Instances of this class are created by :func:`profile`.
+
+    Forward calculation is recorded for every call of ``calc_value`` and
+    backward calculation for every call of ``backward``. Records are keyed
+    by the class of the operation, the phase and the call site, which is the
+    first caller outside of the renom package. The call site of a forward
+    operation is kept in its node until the backward calculation of the node
+    is recorded.
+
+    Args:
+        callsite (bool): If False, call sites are not recorded. This reduces
+            the overhead of the profiler.
+        max_events (int): Maximum number of calls kept for
+            :meth:`export_chrome_trace`. Older calls are discarded. If it is
+            None, all calls are kept. Aggregated records are not limited.
+    '''
+
+    def __init__(self, callsite=True, max_events=100000):
+        self._callsite = callsite
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = collections.OrderedDict()
+        self._events = collections.deque(maxlen=max_events)
+        self._origin = _timer()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            self._local.last = None
+        return stack
+
+    def _find_site(self):
+        if not self._callsite:
+            return ''
+        frame = sys._getframe(3)
+        while frame is not None:
+            module = frame.f_globals.get('__name__', '').split('.')[0]
+            if module not in _SKIP_MODULES:
+                return '%s:%d(%s)' % (os.path.basename(frame.f_code.co_filename),
+                                      frame.f_lineno, frame.f_code.co_name)
+            frame = frame.f_back
+        return ''
+
+    def begin(self, cls, phase, node=None):
+        stack = self._stack()
+        site = None
+        if node is not None:
+            site = vars(node).pop('_profile_site', None)
+        if site is None:
+            site = self._find_site()
+            if not site and stack:
+                # Called in a worker thread of backward propagation.
+                site = stack[-1].site
+        frame = _Frame(cls.__name__, phase, site, _timer())
+        stack.append(frame)
+        return frame
+
+    def end(self, frame, value=None, args=()):
+        now = _timer()
+        stack = self._stack()
+        stack.pop()
+        elapsed = now - frame.start
+        if stack:
+            stack[-1].children += elapsed
+
+        if frame.phase == 'forward':
+            output = _nbytes(value)
+            attrs = _attr_bytes(value, args)
+            self._local.last = (frame.name, frame.site)
+        else:
+            output = attrs = 0
+
+        key = (frame.name, frame.phase, frame.site)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = [0, 0., 0., 0, 0]
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] += elapsed - frame.children
+            stat[3] += output
+            stat[4] += attrs
+            self._events.append((frame.name, frame.phase, frame.site,
+                                 frame.start - self._origin, elapsed,
+                                 threading.current_thread().ident))
+
+    def bind(self, node):
+        # Remembers the call site of the forward operation of the node for
+        # records of backward calculation.
+        if not self._callsite:
+            return
+        self._stack()
+        last = self._local.last
+        if last is not None and last[0] == type(node).__name__:
+            node._profile_site = last[1]
+        else:
+            node._profile_site = self._find_site()
+        self._local.last = None
+
+    def records(self, by_site=True):
+        '''Returns aggregated records.
+
+        Args:
+            by_site (bool): If False, records of different call sites are merged.
+
+        Returns:
+            list: List of dictionaries which have keys ``name``, ``phase``,
+            ``site``, ``calls``, ``total_time``, ``self_time``, ``output_bytes``
+            and ``attr_bytes``. Times are in seconds.
+        '''
+        merged = collections.OrderedDict()
+        with self._lock:
+            items = list(self._stats.items())
+        for (name, phase, site), stat in items:
+            key = (name, phase, site if by_site else '')
+            if key not in merged:
+                merged[key] = [0, 0., 0., 0, 0]
+            merged[key] = [a + b for a, b in zip(merged[key], stat)]
+
+        return [dict(zip(('name', 'phase', 'site') + _SORT_KEYS, key + tuple(stat)))
+                for key, stat in merged.items()]
+
+    def table(self, sort_by='self_time', limit=None, by_site=True):
+        '''Returns a table of aggregated records as a string.
+
+        Args:
+            sort_by (str): One of ``calls``, ``total_time``, ``self_time``,
+                ``output_bytes`` and ``attr_bytes``. Records are sorted in
+                descending order.
+            limit (int): Maximum number of rows.
+            by_site (bool): If False, records of different call sites are merged.
+        '''
+        if sort_by not in _SORT_KEYS:
+            raise ValueError('sort_by must be one of %s' % (_SORT_KEYS, ))
+
+        records = sorted(self.records(by_site), key=lambda r: r[sort_by], reverse=True)
+        if limit is not None:
+            records = records[:limit]
+
+        header = '{:<24} {:<9} {:>8} {:>11} {:>11} {:>10} {:>10}  {}'.format(
+            'op', 'phase', 'calls', 'total[ms]', 'self[ms]', 'out[MB]', 'attr[MB]', 'site')
+        lines = [header, '-' * len(header)]
+        for r in records:
+            lines.append('{:<24} {:<9} {:>8d} {:>11.3f} {:>11.3f} {:>10.2f} {:>10.2f}  {}'.format(
+                r['name'], r['phase'], r['calls'], r['total_time'] * 1e3, r['self_time'] * 1e3,
+                r['output_bytes'] / 2.**20, r['attr_bytes'] / 2.**20, r['site']))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.table()
+
+    def to_json(self, path=None, by_site=True):
+        '''Returns aggregated records in JSON format.
+
+        Args:
+            path (str): If specified, the JSON string is also written to the file.
+            by_site (bool): If False, records of different call sites are merged.
+        '''
+        ret = json.dumps(self.records(by_site), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(ret)
+        return ret
+
+    def export_chrome_trace(self, path):
+        '''Writes every recorded call in Chrome trace event format. The file
+        can be opened with chrome://tracing.
+
+        Args:
+            path (str): File name.
+        '''
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        trace = [{'name': name, 'cat': phase, 'ph': 'X', 'pid': pid, 'tid': tid,
+                  'ts': start * 1e6, 'dur': elapsed * 1e6, 'args': {'site': site}}
+                 for name, phase, site, start, elapsed, tid in events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace}, f)
+
+
+@contextlib.contextmanager
+def profile(callsite=True, max_events=100000):
+    '''Context manager which profiles operations executed in the context.
+
+    Note that GPU kernels run asynchronously, so that recorded times of
+    GPU operations do not include their execution time.
+
+    Args:
+        callsite (bool): If False, call sites are not recorded.
+        max_events (int): Maximum number of calls kept for the Chrome trace.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> model = rm.Sequential([rm.Dense(10), rm.Relu(), rm.Dense(2)])
+        >>> x = np.random.rand(8, 3)
+        >>> with rm.profile() as p:
+        ...     with model.train():
+        ...         loss = rm.sum(model(x))
+        ...     loss.grad()
+        ...
+        >>> print(p.table(sort_by='total_time', limit=5))
+        >>> p.export_chrome_trace('trace.json')
+    '''
+    profiler = Profiler(callsite, max_events)
+    prev = Node.PROFILER
+    Node.PROFILER = profiler
+    try:
+        yield profiler
+    finally:
+        Node.PROFILER = prev
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+from numbers import Number
+import numpy as np
+
+
+def segment_sum(indices, values, axis=0):
+    '''Sums rows of ``values`` which have the same index.
+
+    Args:
+        indices (ndarray): 1 dimensional integer array.
+        values (ndarray): Array whose axis ``axis`` has the same length as ``indices``.
+        axis (int): Axis of ``values`` along which rows are summed.
+
+    Returns:
+        tuple: Sorted unique indices and sums of rows for each of them.
+    '''
+    indices = np.asarray(indices).reshape(-1)
+    values = np.asarray(values)
+    if len(indices) == 0:
+        return indices, values
+    order = np.argsort(indices, kind='mergesort')
+    indices = indices[order]
+    starts = np.flatnonzero(np.concatenate(([True], indices[1:] != indices[:-1])))
+    return indices[starts], np.add.reduceat(np.take(values, order, axis=axis), starts, axis=axis)
+
+
+class RowSparse(object):
+    '''Gradient of a matrix in which only some rows are not zero.
+
+    Objects of this class are created on CPU as gradients of the weight of
+    :class:`renom.Embedding` whose ``sparse_grad`` is True. Optimizers update
+    only the rows which are held by the object. The object can be converted
+    to a dense array with ``np.asarray`` or :meth:`as_ndarray`.
+
+    If ``axis`` is 1, the object holds columns instead of rows, like the
+    gradients of the output layer given to
+    :class:`renom.SampledSoftmaxCrossEntropy`.
+
+    Args:
+        indices (ndarray): Row indices. Duplicated indices are summed.
+        values (ndarray): Rows of the gradient, stacked along ``axis``.
+        shape (tuple): Shape of the dense gradient.
+        axis (int): Axis which ``indices`` index.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> layer = rm.Embedding(output_size=2, input_size=5, sparse_grad=True)
+        >>> with layer.train():
+        ...     z = layer(np.array([[1], [3], [1]]))
+        ...
+        >>> grad = rm.sum(z).grad().get(layer.params.w)
+        >>> grad.indices
+        array([1, 3])
+        >>> grad.values
+        array([[ 2.,  2.],
+               [ 1.,  1.]], dtype=float32)
+    '''
+
+    def __init__(self, indices, values, shape, coalesced=False, axis=0):
+        if not coalesced:
+            indices, values = segment_sum(indices, values, axis)
+        self.indices = indices
+        self.values = values
+        self.shape = tuple(shape)
+        self.axis = axis
+
+    @property
+    def index(self):
+        '''Index of the held rows in the dense gradient.'''
+        return (slice(None), ) * self.axis + (self.indices, )
+
+    def with_values(self, values):
+        '''Returns an object which holds ``values`` in the same rows.'''
+        return RowSparse(self.indices, values, self.shape, coalesced=True, axis=self.axis)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.values.nbytes
+
+    def as_ndarray(self):
+        '''Returns the gradient as a dense array.'''
+        ret = np.zeros(self.shape, dtype=self.values.dtype)
+        ret[self.index] = self.values
+        return ret
+
+    def __array__(self, dtype=None):
+        ret = self.as_ndarray()
+        return ret if dtype is None else ret.astype(dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'RowSparse(indices=%r, values=%r, shape=%r, axis=%r)' % (
+            self.indices, self.values, self.shape, self.axis)
+
+    def __add__(self, other):
+        if isinstance(other, RowSparse) and other.axis == self.axis:
+            return RowSparse(np.concatenate([self.indices, other.indices]),
+                             np.concatenate([self.values, other.values], axis=self.axis),
+                             self.shape, axis=self.axis)
+        if isinstance(other, RowSparse):
+            other = other.as_ndarray()
+        ret = np.array(np.broadcast_to(other, self.shape), dtype=np.result_type(other, self.values))
+        ret[self.index] += self.values
+        return ret
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        if not isinstance(other, Number):
+            return NotImplemented
+        return self.with_values(self.values * other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return self.with_values(-self.values)
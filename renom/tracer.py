@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import collections
+import numpy as np
+from renom.core import Node, Variable, UnaryOp, BinOp, Grads, GPUValue
+
+_Record = collections.namedtuple('_Record', ['node', 'args', 'kwargs', 'fast', 'attrs'])
+
+
+class Tracer(object):
+    '''Records operations which are created while a function is executed,
+    and replays them on new data.
+
+    Instances of this class are created by the function :func:`trace`.
+    '''
+
+    def __init__(self):
+        self.depth = 0
+        self._records = []
+        self._inputs = []
+        self._root = None
+        self._refcounts = None
+        self._order = None
+        self._scheduled = None
+
+    def record(self, node, args, kwargs):
+        # Nodes created in an other operation are recomputed by the operation.
+        # Variables and Nodes which only wrap values are not recomputed.
+        if self.depth or type(node) in (Node, Variable):
+            return
+
+        cls = type(node)
+        fast = cls.__new__ in (UnaryOp.__new__, BinOp.__new__)
+        self._records.append(_Record(node, args, kwargs, fast, None))
+
+    def _start(self, func, args):
+        for a in args:
+            if isinstance(a, np.ndarray) and not isinstance(a, Node):
+                a = np.array(a, dtype=Node.COMPUTE_DTYPE)
+            self._inputs.append(a)
+
+        if Node.TRACER is not None:
+            raise RuntimeError('Nested trace is not supported.')
+
+        Node.TRACER = self
+        try:
+            root = func(*self._inputs)
+        finally:
+            Node.TRACER = None
+
+        if not isinstance(root, Node):
+            raise ValueError('Traced function must return Node object, not %s' % type(root))
+
+        self._root = root
+
+        # Keep attributes which are passed to following operations, such as
+        # the state of lstm. They are replaced with the attributes created at
+        # replay.
+        argids = set(id(a) for r in self._records
+                     for a in list(r.args) + list(r.kwargs.values()))
+        for i, r in enumerate(self._records):
+            if not r.fast:
+                names = r.node.attrs.get_names()
+                attrs = {k: getattr(r.node.attrs, k) for k in names}
+                attrs = {k: v for k, v in attrs.items()
+                         if isinstance(v, np.ndarray) and id(v) in argids}
+                self._records[i] = r._replace(attrs=attrs)
+
+        grads = Grads(root)
+        self._refcounts = grads._refcounts
+        self._order = grads._order
+        self._scheduled = grads._scheduled
+
+    def _set_inputs(self, args):
+        if len(args) != len(self._inputs):
+            raise ValueError('Traced function takes %d arguments, but %d given.' %
+                             (len(self._inputs), len(args)))
+
+        for buf, a in zip(self._inputs, args):
+            if buf is a:
+                continue
+            if not isinstance(buf, np.ndarray):
+                if buf != a:
+                    raise ValueError('Non array argument must be same as traced value.')
+                continue
+            if tuple(np.shape(a)) != buf.shape:
+                raise ValueError('Shape of argument %s does not match to traced shape %s.' %
+                                 (np.shape(a), buf.shape))
+            if isinstance(buf, Node):
+                buf.copy_from(Node(a))
+            else:
+                buf[...] = a
+
+    def _replay(self, rec, subst):
+        node = rec.node
+        cls = type(node)
+        args = [subst.get(id(a), a) for a in rec.args]
+        kwargs = {k: subst.get(id(v), v) for k, v in rec.kwargs.items()}
+
+        if rec.fast:
+            value = cls.calc_value(*args, **kwargs)
+            node._refill(value)
+            if not node._no_backward:
+                if cls.__new__ is BinOp.__new__:
+                    node.attrs._lhs, node.attrs._rhs = args[:2]
+                else:
+                    node.attrs._arg = args[0]
+            return
+
+        # The operation creates its output by Node._create_node, which
+        # returns the recorded node refilled with the new value.
+        Node.REPLAY_NODE = node
+        try:
+            value = cls.__new__(cls, *args, **kwargs)
+        finally:
+            Node.REPLAY_NODE = None
+
+        if value is not node:
+            # The operation returned other object, e.g. one of its inputs.
+            if isinstance(value, Node):
+                if not value._gpu:
+                    node._refill(value.view(np.ndarray))
+                node.__dict__.update(vars(value))
+            else:
+                node._refill(value)
+
+        if node._no_backward:
+            node.attrs.clear()
+        for name, org in rec.attrs.items():
+            subst[id(org)] = getattr(node.attrs, name, org)
+
+    def __call__(self, *args):
+        '''Replays recorded operations with given arguments.
+
+        Returns:
+            Node: Output of the traced function. The same object is returned
+            at every call and its value is overwritten by the next call.
+        '''
+        self._set_inputs(args)
+        subst = {}
+        for rec in self._records:
+            self._replay(rec, subst)
+        return self._root
+
+    def grad(self, initial=None, **kwargs):
+        '''Runs backward propagation through the recorded graph.
+        The graph is not destroyed, so that it can be replayed again.
+
+        Args:
+            initial (ndarray): Initial value of following the graph.
+
+        Returns:
+            Grads: Gradients of Variable objects.
+        '''
+        root = self._root
+        if initial is None:
+            if root.size > 1:
+                raise ValueError("Initial diff is required for scalar value.")
+            initial = np.ones_like(root)
+
+        context = Grads()
+        context._refcounts = self._refcounts
+        context._order = self._order
+        context._scheduled = self._scheduled
+        context.add(root, initial)
+        context._run_backward(**kwargs)
+        return context
+
+
+def trace(func, *args):
+    '''Records the operations executed by ``func`` and returns a callable
+    object which replays them on new data.
+
+    A training step whose shapes do not change builds the same graph at
+    every iteration. Replaying the recorded graph skips construction of
+    Node objects, graph reduction and topological sorting of backward
+    propagation.
+
+    Args:
+        func (function): Function which returns a Node object. Typically
+            it computes a loss of a model.
+        *args: Example arguments of ``func``. Arrays are copied to buffers
+            owned by the returned object, and arguments given at replay
+            are copied to the buffers. Shapes of arrays can not be changed.
+
+    Returns:
+        Tracer: Callable object which replays ``func``.
+
+    Example:
+        >>> import numpy as np
+        >>> import renom as rm
+        >>> model = rm.Sequential([rm.Dense(10), rm.Relu(), rm.Dense(2)])
+        >>> opt = rm.Sgd()
+        >>> def step(x, y):
+        ...     with model.train():
+        ...         return rm.mean_squared_error(model(x), y)
+        ...
+        >>> x, y = np.random.rand(8, 3), np.random.rand(8, 2)
+        >>> traced = rm.trace(step, x, y)
+        >>> for i in range(10):
+        ...     loss = traced(np.random.rand(8, 3), np.random.rand(8, 2))
+        ...     traced.grad().update(opt)
+
+    Note:
+        Python code in ``func`` is executed only once. Side effects written
+        in Python, such as updates of moving averages of BatchNormalize or
+        control flow depending on values, are not replayed.
+    '''
+    tracer = Tracer()
+    tracer._start(func, args)
+    return tracer
@@ -3,7 +3,7 @@
 from __future__ import division
 from builtins import object
 import numpy as np
-from renom.config import precision
+from renom.core import get_precision
 
 
 class Initializer(object):
@@ -53,7 +53,7 @@ class GlorotUniform(Initializer):
             fan_in = shape[0] * size
             fan_out = shape[1] * size
         lim = np.sqrt(6 / (fan_in + fan_out))
-        return (np.random.rand(*shape) * 2 * lim - lim).astype(precision)
+        return (np.random.rand(*shape) * 2 * lim - lim).astype(get_precision())
 
 
 class GlorotNormal(Initializer):
@@ -82,7 +82,7 @@ class GlorotNormal(Initializer):
             fan_in = shape[0] * size
             fan_out = shape[1] * size
         std = np.sqrt(2 / (fan_in + fan_out))
-        return (np.random.randn(*shape) * std).astype(precision)
+        return (np.random.randn(*shape) * std).astype(get_precision())
 
 
 class Gaussian(Initializer):
@@ -102,7 +102,7 @@ class Gaussian(Initializer):
         self._std = std
 
     def __call__(self, shape):
-        return (np.random.randn(*shape) * self._std + self._mean).astype(precision)
+        return (np.random.randn(*shape) * self._std + self._mean).astype(get_precision())
 
 
 class Uniform(Initializer):
@@ -124,4 +124,4 @@ class Uniform(Initializer):
     def __call__(self, shape):
         shape[1:]
         delt = self._max - self._min
-        return (np.random.rand(*shape) * delt + self._min).astype(precision)
+        return (np.random.rand(*shape) * delt + self._min).astype(get_precision())
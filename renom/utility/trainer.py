@@ -57,7 +57,7 @@ def default_event_updated(trainer):
         train_loss = trainer.losses[0].as_ndarray()
         msg = "epoch%3d: loss %6.4f" % (epoch, train_loss)
         bar.set_description(msg)
-        bar.update(1)
+        bar.update(trainer.num_accumulated)
 
 
 def default_event_end_epoch(trainer):
@@ -113,6 +113,11 @@ class Trainer(object):
         optimizer (Optimizer): Gradient descent algorithm.
         shuffle (bool): If it's true, mini batch is created randomly.
         events (dict): Dictionary of function.
+        num_gpu (int): Number of GPUs.
+        accumulate_steps (int): Number of mini batches whose gradients are
+            accumulated before each update of weight parameters. The effective
+            batch size is ``batch_size * accumulate_steps``, while memory for
+            computational graphs is bounded by ``batch_size``.
 
     Example:
         >>> import numpy as np
@@ -138,7 +143,7 @@ class Trainer(object):
     """
 
     def __init__(self, model, num_epoch, loss_func, batch_size,
-                 optimizer=None, shuffle=True, events=None, num_gpu=1):
+                 optimizer=None, shuffle=True, events=None, num_gpu=1, accumulate_steps=1):
 
         self.model = model
         self.num_epoch = num_epoch
@@ -147,6 +152,7 @@ class Trainer(object):
         self.optimizer = optimizer
         self.shuffle = shuffle
         self.num_gpu = num_gpu
+        self.accumulate_steps = accumulate_steps
         self.train_loss_list = []
         self.test_loss_list = []
 
@@ -192,6 +198,8 @@ class Trainer(object):
             self.on_event('start_epoch')
             self.nth = 0
             self.avg_train_loss = 0
+            self.num_accumulated = 0
+            self.accumulated_grads = None
 
             for iteration, (data, target) in enumerate(self.train_distributor.batch(self.batch_size, self.shuffle)):
                 datalen = len(data) // len(models)
@@ -249,11 +257,19 @@ class Trainer(object):
                 if self.num_gpu > 1:
                     models[0].join_grads(self.grads[0], zip(models[1:], self.grads[1:]))
 
-                self.grads[0].update(self.optimizer)
+                if self.accumulated_grads is None:
+                    self.accumulated_grads = self.grads[0]
+                else:
+                    self.accumulated_grads += self.grads[0]
+                self.num_accumulated += 1
 
-                self.on_event('updated')
+                if self.num_accumulated >= self.accumulate_steps:
+                    self._update()
                 self.nth += 1
 
+            if self.accumulated_grads is not None:
+                self._update()
+
             self.on_event('end_epoch')
             self.epoch += 1
 
@@ -262,6 +278,15 @@ class Trainer(object):
             self.outputs = self.losses = self.grads = None
             self.avg_train_loss = None
 
+    def _update(self):
+        grads = self.accumulated_grads
+        if self.num_accumulated > 1:
+            grads *= 1. / self.num_accumulated
+        grads.update(self.optimizer)
+        self.on_event('updated')
+        self.accumulated_grads = None
+        self.num_accumulated = 0
+
     def test(self, data):
         """Test method.
         This method executes forward propagation for given data.
@@ -274,8 +299,7 @@ class Trainer(object):
         """
         bs = self.batch_size // self.num_gpu
         N = len(data) - 1 + bs
-        self.model.set_models(inference=True)
-        ret = np.vstack([self.model(data[bs * i:bs * (i + 1)]).as_ndarray()
-                         for i in range(N // bs)])
-        self.model.set_models(inference=False)
+        with self.model.inference_mode():
+            ret = np.vstack([self.model(data[bs * i:bs * (i + 1)]).as_ndarray()
+                             for i in range(N // bs)])
         return ret
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures the cost of backward propagation against graph depth.
+
+    $ python exp_backward_depth.py
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+import renom as rm
+
+
+def chain(depth):
+    x = rm.Variable(np.random.rand(8, 8))
+    h = x
+    for _ in range(depth):
+        h = h * 0.5 + x
+    return x, rm.sum(h), None
+
+
+def lstm(timesteps):
+    layer = rm.Lstm(16)
+    x = rm.Variable(np.random.rand(4, 8))
+    with layer.train():
+        z = 0
+        for _ in range(timesteps):
+            z += rm.sum(layer(x))
+    return x, z, layer
+
+
+def bench(build, size, repeat=5):
+    best = None
+    for _ in range(repeat):
+        x, loss, model = build(size)
+        start = time.time()
+        try:
+            loss.grad().get(x)
+        except RuntimeError:
+            return None
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print('recursion limit: %d' % sys.getrecursionlimit())
+    print('%-8s %8s %12s' % ('graph', 'depth', 'backward[s]'))
+    for build, sizes in ((chain, (10, 100, 1000, 5000)),
+                         (lstm, (10, 50, 200, 500))):
+        for size in sizes:
+            t = bench(build, size)
+            print('%-8s %8d %12s' % (build.__name__, size,
+                                     'RecursionError' if t is None else '%.5f' % t))
+
+
+if __name__ == '__main__':
+    main()
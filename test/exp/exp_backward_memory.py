@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures peak RSS of one training step of VGG16 on CPU.
+
+    $ python exp_backward_memory.py [batch_size] [image_size]
+"""
+from __future__ import print_function
+import resource
+import sys
+import numpy as np
+import renom as rm
+from renom.algorithm.image.model.vgg import VGG16
+
+
+def peak_rss():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def main(batch_size=8, image_size=64):
+    model = VGG16(classes=10)
+    x = np.random.rand(batch_size, 3, image_size, image_size).astype(np.float32)
+    y = np.zeros((batch_size, 10), dtype=np.float32)
+    y[:, 0] = 1
+
+    # Initialize weights outside of the measured step.
+    model(x)
+    base = peak_rss()
+
+    with model.train():
+        loss = rm.softmax_cross_entropy(model(x), y)
+    forward = peak_rss()
+    loss.grad().update(rm.Sgd())
+    backward = peak_rss()
+
+    print('batch size      : %d' % batch_size)
+    print('image size      : %d' % image_size)
+    print('peak RSS        : %.1f MB' % backward)
+    print('forward  (+)    : %.1f MB' % (forward - base))
+    print('backward (+)    : %.1f MB' % (backward - forward))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures backward propagation of a model which has parallel towers with
+different numbers of backward threads. Speedup requires multiple cores.
+
+    $ python exp_backward_threads.py [towers] [units]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def bench(towers, x, repeat=5):
+    best = None
+    for _ in range(repeat):
+        loss = rm.sum(rm.concat([t(x) for t in towers]))
+        start = time.time()
+        loss.grad()
+        t = time.time() - start
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main(num_towers=4, units=1024):
+    towers = [rm.Sequential([rm.Dense(units), rm.Relu(), rm.Dense(units), rm.Relu(), rm.Dense(units)])
+              for _ in range(num_towers)]
+    x = rm.Variable(np.random.rand(256, units).astype(precision))
+    for threads in (1, 2, 4):
+        rm.set_backward_threads(threads)
+        print('threads={} {:>8.2f} ms'.format(threads, bench(towers, x) * 1000))
+    rm.set_backward_threads(1)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
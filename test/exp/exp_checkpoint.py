@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures peak RSS and time of one training step of a deep conv stack
+with and without gradient checkpointing. Run each setting in its own
+process, since peak RSS can not be reset.
+
+    $ python exp_checkpoint.py [checkpoint_every] [depth] [batch_size]
+"""
+from __future__ import print_function
+import resource
+import sys
+import time
+import numpy as np
+import renom as rm
+
+
+def peak_rss():
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def main(checkpoint_every=0, depth=16, batch_size=32):
+    layers = []
+    for _ in range(depth):
+        layers.extend([rm.Conv2d(16, padding=1), rm.BatchNormalize(mode='feature'), rm.Relu()])
+    layers.extend([rm.Flatten(), rm.Dense(10)])
+    model = rm.Sequential(layers, checkpoint_every=checkpoint_every * 3 or None)
+
+    x = np.random.rand(batch_size, 3, 32, 32).astype(np.float32)
+    y = np.zeros((batch_size, 10), dtype=np.float32)
+    y[:, 0] = 1
+
+    # Initialize weights outside of the measured step.
+    model(x)
+    base = peak_rss()
+
+    start = time.time()
+    with model.train():
+        loss = rm.softmax_cross_entropy(model(x), y)
+    loss.grad().update(rm.Sgd())
+    elapsed = time.time() - start
+
+    print('checkpoint every: %d conv blocks' % checkpoint_every)
+    print('step time       : %.3f sec' % elapsed)
+    print('peak RSS (+)    : %.1f MB' % (peak_rss() - base))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
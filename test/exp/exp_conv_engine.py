@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures forward and backward propagation of VGG style convolution
+layers with each CPU convolution algorithm. ``tensordot`` is the former
+implementation of Conv2d with the 6-D im2col array.
+
+    $ python exp_conv_engine.py [batch]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+import renom as rm
+from renom.config import precision
+from renom.layers.function import conv_engine
+from renom.layers.function.utils import im2col, col2im
+
+
+def tensordot_step(x, w, dy):
+    out = dy.shape[2:]
+    col = im2col(x, out, w.shape[2:], (1, 1), (1, 1))
+    y = np.rollaxis(np.tensordot(col, w, ([1, 2, 3], [1, 2, 3])), 3, 1)
+    dx = col2im(np.rollaxis(np.tensordot(w, dy, (0, 1)), 3), x.shape[2:], (1, 1), (1, 1))
+    dw = np.tensordot(dy, col, ([0, 2, 3], [0, 4, 5]))
+    return y, dx, dw
+
+
+def engine_step(x, w, dy):
+    y, col = conv_engine.conv_forward(x, w, (1, 1), (1, 1), keep_col=True)
+    dx = conv_engine.conv_backward_data(dy, w, x.shape, (1, 1), (1, 1))
+    dw = conv_engine.conv_backward_filter(x, dy, w.shape[2:], (1, 1), (1, 1), col)
+    return y, dx, dw
+
+
+def bench(func, args, repeat=3):
+    func(*args)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func(*args)
+        t = time.time() - start
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main(batch=16):
+    layers = [(64, 32), (128, 16), (256, 8), (512, 4)]
+    names = ['tensordot', 'gemm', 'winograd', 'fft', 'autotune']
+    print('{:>16}'.format('channel x size') + ''.join('{:>11}'.format(n) for n in names))
+    for channel, size in layers:
+        x = np.random.rand(batch, channel, size, size).astype(precision)
+        w = np.random.rand(channel, channel, 3, 3).astype(precision)
+        dy = np.random.rand(batch, channel, size, size).astype(precision)
+        times = [bench(tensordot_step, (x, w, dy))]
+        for name in names[1:]:
+            conv_engine.set_algorithm(None if name == 'autotune' else name)
+            if name == 'autotune':
+                conv_engine.autotune(engine_step, x, w, dy)
+            times.append(bench(engine_step, (x, w, dy)))
+        conv_engine.set_algorithm(None)
+        print('{:>16}'.format('%d x %d' % (channel, size)) +
+              ''.join('{:>9.1f}ms'.format(t * 1000) for t in times))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures training steps of a small convolutional network with and
+without the CPU buffer pool. Time per step and statistics of the pool
+are reported.
+
+    $ python exp_cpu_pool.py [batch] [steps]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+import renom as rm
+from renom.config import precision
+from renom.mempool import cpu_pool
+
+
+def bench(model, x, y, steps):
+    opt = rm.Sgd(0.01)
+    best = None
+    for _ in range(steps):
+        start = time.time()
+        with model.train():
+            loss = rm.softmax_cross_entropy(model(x), y)
+        loss.grad().update(opt)
+        t = time.time() - start
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main(batch=32, steps=10):
+    model = rm.Sequential([
+        rm.Conv2d(16, padding=1), rm.Relu(), rm.Dropout(0.2),
+        rm.Conv2d(16, padding=1), rm.Relu(), rm.MaxPool2d(2, stride=2),
+        rm.Flatten(), rm.Dense(10),
+    ])
+    x = np.random.rand(batch, 3, 32, 32).astype(precision)
+    y = np.eye(10)[np.random.randint(0, 10, batch)].astype(precision)
+    model(x)
+
+    for enabled in (False, True):
+        cpu_pool.enabled = enabled
+        cpu_pool.release()
+        cpu_pool.reset_stats()
+        t = bench(model, x, y, steps)
+        print('pool={:<6} {:>8.2f} ms/step  {}'.format(str(enabled), t * 1000, cpu_pool.stats()))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
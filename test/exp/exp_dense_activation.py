@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares forward and backward propagation of an MLP whose Dense layers
+are followed by activation layers with the same MLP whose Dense layers
+apply the activation themselves.
+
+    $ python exp_dense_activation.py [batch] [units] [layers]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=256, units=1024, layers=4):
+    x = np.random.rand(batch, units).astype(precision)
+    activations = ((rm.Relu, "relu"), (rm.Sigmoid, "sigmoid"), (rm.Tanh, "tanh"))
+
+    print('{:>10} {:>10} {:>11} {:>11}'.format('', '', 'forward', 'backward'))
+    for act, name in activations:
+        separate = rm.Sequential(sum(([rm.Dense(units, input_size=units), act()]
+                                      for _ in range(layers)), []))
+        fused = rm.Sequential([rm.Dense(units, input_size=units, activation=name)
+                               for _ in range(layers)])
+        for label, model in (('separate', separate), ('fused', fused)):
+            with model.train():
+                loss = rm.sum(model(x))
+            f = bench(lambda: model(x))
+            b = bench(lambda: loss.grad(detach_graph=False))
+            print('{:>10} {:>10} {:>9.2f}ms {:>9.2f}ms'.format(name, label, f * 1000, b * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares forward and backward propagation of dropout with the former
+implementation, which drew float64 random numbers and kept a float mask
+of the same shape as the input.
+
+    $ python exp_dropout.py [batch] [channel] [size]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def old_dropout(x, keep_ratio):
+    mask = np.empty(x.shape, dtype=precision)
+    np.less(np.random.rand(*x.shape), keep_ratio, out=mask)
+    mask /= keep_ratio
+    return x * mask, mask
+
+
+def new_backward(z, dy):
+    # Same calculation as dropout._backward_cpu.
+    dx = np.multiply(dy, z._unpacked_mask())
+    dx *= z.attrs._scale
+    return dx
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=64, channel=64, size=32):
+    x = rm.Variable(np.random.rand(batch, channel, size, size).astype(precision))
+    dy = np.random.rand(*x.shape).astype(precision)
+    y, mask = old_dropout(x.as_ndarray(), 0.5)
+    z = rm.dropout(x)
+    layer = rm.Dropout(seed=0)
+
+    print('{:>22} {:>11} {:>11} {:>10}'.format('', 'forward', 'backward', 'mask[MB]'))
+    rows = [
+        ('old (np.random)', bench(lambda: old_dropout(x.as_ndarray(), 0.5)),
+         bench(lambda: mask * dy), mask.nbytes),
+        ('new (np.random)', bench(lambda: rm.dropout(x)),
+         bench(lambda: new_backward(z, dy)), z.attrs._mask.nbytes),
+        ('new (Generator)', bench(lambda: layer(x)), None, None),
+    ]
+    for name, f, b, nbytes in rows:
+        print('{:>22} {:>9.2f}ms'.format(name, f * 1000) +
+              (' {:>9.2f}ms {:>10.2f}'.format(b * 1000, nbytes / 2.**20) if b else ''))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares a training step of an embedding layer with the former
+implementation, which accumulated the gradient of the weight into a dense
+zero array row by row and updated every row of the weight. The new step
+uses sparse gradients.
+
+    $ python exp_embedding.py [vocabulary] [size] [batch]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+
+
+def old_backward(w, index, dy):
+    dx = np.zeros(w.shape, dtype=w.dtype)
+    for i in range(len(index)):
+        dx[index[i]] += dy[i]
+    return dx
+
+
+def step(layer, x, opt):
+    with layer.train():
+        z = layer(x)
+    rm.sum(z).grad().update(opt)
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(vocabulary=1000000, size=64, batch=256):
+    x = np.random.randint(0, vocabulary, (batch, 1))
+    dy = np.ones((batch, size), dtype=rm.precision)
+
+    print('{:>10} {:>11} {:>11}'.format('', 'old', 'new'))
+    for opt_class in (rm.Sgd, rm.Adagrad, rm.Rmsprop, rm.Adam):
+        layer = rm.Embedding(size, vocabulary, sparse_grad=True)
+        w = layer.params.w
+        dense_opt, sparse_opt = opt_class(), opt_class()
+        # Former step: dense gradient, dense optimizer update.
+        old = bench(lambda: w.__isub__(np.asarray(
+            dense_opt(old_backward(w, x[:, 0], dy), w))))
+        new = bench(lambda: step(layer, x, sparse_opt))
+        print('{:>10} {:>9.2f}ms {:>9.2f}ms'.format(opt_class.__name__, old * 1000, new * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares an elementwise expression built from Node operators with the
+same expression fused by renom.fuse. Time and peak of memory allocated by
+numpy in forward and backward propagation are reported.
+
+    $ python exp_fuse.py [size]
+"""
+from __future__ import print_function
+import sys
+import time
+import tracemalloc
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def axpbyc(a, x, b, y, c):
+    return a * x + b * y - c
+
+
+def bench(func, size, repeat=10):
+    x = rm.Variable(np.random.rand(size).astype(precision))
+    y = rm.Variable(np.random.rand(size).astype(precision))
+    c = np.random.rand(size).astype(precision)
+    a = rm.Variable(np.random.rand(size).astype(precision))
+    dy = np.ones(size, dtype=precision)
+
+    func(a, x, 2., y, c).grad(dy)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func(a, x, 2., y, c).grad(dy)
+        t = time.time() - start
+        best = t if best is None else min(best, t)
+
+    tracemalloc.start()
+    func(a, x, 2., y, c).grad(dy)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(size=1000000):
+    print('{:>8} {:>10} {:>12}'.format('', 'time[ms]', 'peak[MB]'))
+    for name, func in (('nodes', axpbyc), ('fused', rm.fuse(axpbyc))):
+        t, peak = bench(func, size)
+        print('{:>8} {:>10.2f} {:>12.1f}'.format(name, t * 1000, peak / 2.**20))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
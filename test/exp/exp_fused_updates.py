@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares update rules of optimizers and backward propagation of
+elementwise losses written as numpy expressions, which was the former
+implementation, with the same expressions evaluated by fused functions.
+Time and peak of memory allocated by numpy are reported.
+
+    $ python exp_fused_updates.py [size]
+"""
+from __future__ import print_function
+import sys
+import time
+import tracemalloc
+import numpy as np
+from renom.config import precision
+from renom.optimizer import _moving_average, _moving_square, _adam_step, _scaled_step
+from renom.layers.loss.mean_squared_error import _scaled_difference
+
+lr, g, b, eps = 0.001, 0.999, 0.9, 1e-8
+
+
+def old_adam(u, r, dy):
+    u = b * u + (1 - b) * dy
+    r = g * r + (1 - g) * (dy**2)
+    return lr * u / (np.sqrt(r / (1 - g)) + eps) / (1 - b)
+
+
+def fused_adam(u, r, dy):
+    u = _moving_average.compute(u, dy, b)
+    r = _moving_square.compute(r, dy, g)
+    return _adam_step.compute(u, r, lr, g, b, eps)
+
+
+def old_rmsprop(u, r, dy):
+    r = g * r + (1 - g) * (dy**2)
+    return lr * dy / (np.sqrt(r) + eps)
+
+
+def fused_rmsprop(u, r, dy):
+    r = _moving_square.compute(r, dy, g)
+    return _scaled_step.compute(dy, r, lr, eps)
+
+
+def old_loss_backward(z, y, dy):
+    sub = z - y
+    return sub * dy / len(z)
+
+
+def fused_loss_backward(z, y, dy):
+    return _scaled_difference.compute(z, y, dy / len(z))
+
+
+def bench(func, args, repeat=10):
+    func(*args)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func(*args)
+        t = time.time() - start
+        best = t if best is None else min(best, t)
+
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(size=1000000):
+    u, r, dy = [np.random.rand(size).astype(precision) for _ in range(3)]
+    shape = (size // 1000, 1000)
+    z, y = [np.random.rand(*shape).astype(precision) for _ in range(2)]
+    cases = (
+        ('adam', old_adam, fused_adam, (u, r, dy)),
+        ('rmsprop', old_rmsprop, fused_rmsprop, (u, r, dy)),
+        ('loss', old_loss_backward, fused_loss_backward, (z, y, np.array(1., dtype=precision))),
+    )
+    print('{:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+        '', 'old[ms]', 'old[MB]', 'fused[ms]', 'fused[MB]'))
+    for name, old, fused, args in cases:
+        t1, m1 = bench(old, args)
+        t2, m2 = bench(fused, args)
+        print('{:>8} {:>10.2f} {:>10.1f} {:>10.2f} {:>10.1f}'.format(
+            name, t1 * 1000, m1 / 2.**20, t2 * 1000, m2 / 2.**20))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares backward propagation of indexing with the former
+implementation, which copied the indexed node, assigned the gradient into
+a zero array of the same shape and added the arrays of all items.
+
+    $ python exp_getitem.py [batch] [steps] [size]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.core import GetItem, Node
+from renom.config import precision
+
+
+class OldGetItem(GetItem):
+
+    def _backward_cpu(self, context, dy, **kwargs):
+        if isinstance(self.attrs._lhs, Node):
+            zero = np.zeros_like(np.array(self.attrs._lhs))
+            zero[self.attrs._rhs] = np.array(dy)
+            self.attrs._lhs._update_diff(context, zero, **kwargs)
+
+
+def timesteps(getitem, x):
+    return sum(rm.sum(getitem(x, (slice(None), t))) for t in range(x.shape[1]))
+
+
+def actions(getitem, x, action):
+    return rm.sum(getitem(x, (np.arange(len(x)), action)))
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=64, steps=50, size=256):
+    x = rm.Variable(np.random.rand(batch, steps, size).astype(precision))
+    q = rm.Variable(np.random.rand(batch * 16, 1000).astype(precision))
+    action = np.random.randint(0, 1000, len(q))
+
+    print('{:>10} {:>11} {:>11}'.format('', 'old', 'new'))
+    for name, func, args in (('timesteps', timesteps, (x, )), ('actions', actions, (q, action))):
+        times = []
+        for getitem in (OldGetItem, GetItem):
+            loss = func(getitem, *args)
+            times.append(bench(lambda: loss.grad(detach_graph=False)))
+        print('{:>10} {:>9.2f}ms {:>9.2f}ms'.format(name, times[0] * 1000, times[1] * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
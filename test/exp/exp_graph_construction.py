@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures the cost of graph construction per node against graph depth.
+
+    $ python exp_graph_construction.py
+"""
+from __future__ import print_function
+import time
+import numpy as np
+import renom as rm
+
+
+def chain(depth):
+    x = rm.Variable(np.random.rand(2, 2))
+    h = x
+    for _ in range(depth):
+        h = h * 0.5 + x
+    return depth * 2
+
+
+def lstm(depth):
+    layer = rm.Lstm(2, input_size=(2,))
+    x = rm.Variable(np.random.rand(2, 2))
+    with layer.train():
+        for _ in range(depth):
+            layer(x)
+    return depth
+
+
+def bench(build, depth, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        nodes = build(depth)
+        t = (time.time() - start) / nodes
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main():
+    print('{:>6} {:>6} {:>14}'.format('graph', 'depth', 'per node[us]'))
+    for build in (chain, lstm):
+        for depth in (10, 100, 1000, 5000):
+            t = bench(build, depth)
+            print('{:>6} {:>6} {:>14.2f}'.format(build.__name__, depth, t * 1e6))
+
+
+if __name__ == '__main__':
+    main()
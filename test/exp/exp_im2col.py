@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares im2col and col2im of renom.layers.function.utils with the former
+implementations, which padded the input with np.pad and copied each kernel
+offset in a Python loop. ``view`` is im2col without copying the columns.
+col2im is also compared with a scatter by np.add.at.
+
+    $ python exp_im2col.py [batch] [channel] [size]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+from renom.config import precision
+from renom.layers.function.utils import im2col, col2im, out_size
+
+
+def old_im2col(img, size, kernel, stride, padding, padwith=0.):
+    N, channel, in_h, in_w = img.shape
+    out_h, out_w = size
+    k_h, k_w = kernel
+    s_h, s_w = stride
+    p_h, p_w = padding
+    img_n = np.pad(img, ((0, 0), (0, 0), (p_h, p_h + s_h - 1),
+                         (p_w, p_w + s_w - 1)), mode="constant", constant_values=padwith)
+    col = np.ndarray((N, channel, k_h, k_w, out_h, out_w), dtype=precision)
+    for i in range(k_h):
+        iu = i + s_h * out_h
+        for j in range(k_w):
+            ju = j + s_w * out_w
+            col[:, :, k_h - 1 - i, k_w - 1 - j, :, :] = img_n[:, :, i:iu:s_h, j:ju:s_w]
+    return col
+
+
+def old_col2im(col, size, stride, padding):
+    in_h, in_w = size
+    s_h, s_w = stride
+    p_h, p_w = padding
+    N, channel, k_h, k_w, out_h, out_w = col.shape
+    img = np.zeros((N, channel, in_h + 2 * p_h + s_h - 1,
+                    in_w + 2 * p_w + s_w - 1), dtype=precision)
+    for i in range(k_h):
+        iu = i + s_h * out_h
+        for j in range(k_w):
+            ju = j + s_w * out_w
+            img[:, :, i:iu:s_h, j:ju:s_w] += col[:, :, k_h - 1 - i, k_w - 1 - j, :, :]
+    im_shape = img.shape
+    return img[:, :, p_h:im_shape[2] - (p_h + s_h - 1), p_w:im_shape[3] - (p_w + s_w - 1)]
+
+
+def add_at_col2im(col, size, stride, padding):
+    N, channel, k_h, k_w, out_h, out_w = col.shape
+    s_h, s_w = stride
+    p_h, p_w = padding
+    h, w = (out_h - 1) * s_h + k_h, (out_w - 1) * s_w + k_w
+    rows = np.arange(k_h)[::-1, None, None, None] + s_h * np.arange(out_h)[None, None, :, None]
+    cols = np.arange(k_w)[None, ::-1, None, None] + s_w * np.arange(out_w)[None, None, None, :]
+    img = np.zeros((N * channel, max(h, size[0] + 2 * p_h) * max(w, size[1] + 2 * p_w)), dtype=precision)
+    index = (rows * max(w, size[1] + 2 * p_w) + cols).ravel()
+    np.add.at(img, (slice(None), index), col.reshape(N * channel, -1))
+    img = img.reshape(N, channel, max(h, size[0] + 2 * p_h), -1)
+    return img[:, :, p_h:p_h + size[0], p_w:p_w + size[1]]
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=32, channel=32, size=32):
+    x = np.random.rand(batch, channel, size, size).astype(precision)
+    configs = [((3, 3), (1, 1), (1, 1)), ((5, 5), (1, 1), (2, 2)), ((3, 3), (2, 2), (1, 1)),
+               ((2, 2), (2, 2), (0, 0)), ((3, 3), (3, 3), (0, 0))]
+    print('{:>18} {:>11} {:>11} {:>11} {:>11} {:>11} {:>11}'.format(
+        'kernel/stride/pad', 'old im2col', 'im2col', 'view', 'old col2im', 'add.at', 'col2im'))
+    for kernel, stride, padding in configs:
+        out = tuple(out_size(x.shape[2:], kernel, stride, padding))
+        col = im2col(x, out, kernel, stride, padding)
+        assert np.array_equal(col, old_im2col(x, out, kernel, stride, padding))
+        assert np.allclose(col2im(col, x.shape[2:], stride, padding),
+                           old_col2im(col, x.shape[2:], stride, padding))
+        assert np.allclose(col2im(col, x.shape[2:], stride, padding),
+                           add_at_col2im(col, x.shape[2:], stride, padding))
+        times = [
+            bench(lambda: old_im2col(x, out, kernel, stride, padding)),
+            bench(lambda: im2col(x, out, kernel, stride, padding)),
+            bench(lambda: im2col(x, out, kernel, stride, padding, copy=False)),
+            bench(lambda: old_col2im(col, x.shape[2:], stride, padding)),
+            bench(lambda: add_at_col2im(col, x.shape[2:], stride, padding), repeat=1, number=1),
+            bench(lambda: col2im(col, x.shape[2:], stride, padding)),
+        ]
+        print('{:>18}'.format('%dx%d/%d/%d' % (kernel + stride[:1] + padding[:1])) +
+              ''.join(' {:>9.2f}ms'.format(t * 1000) for t in times))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares the channel window sum of lrn, computed with a cumulative sum,
+with the former implementation, which added shifted channel slices n // 2
+times in each direction. Times of lrn are of forward and backward
+propagation. The former one uses the former window sum and np.power for
+the scale.
+
+    $ python exp_lrn.py [batch] [channel] [size]
+"""
+from __future__ import print_function
+import contextlib
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+import renom.layers.function.lrn as lrn_module
+from renom.layers.function.lrn import lrn, _window_sum
+
+
+def old_window_sum(x, n):
+    ret = x.copy()
+    for i in range(1, n // 2 + 1):
+        ret[:, i:, :, :] += x[:, :-i, :, :]
+        ret[:, :-i, :, :] += x[:, i:, :, :]
+    return ret
+
+
+@contextlib.contextmanager
+def patched():
+    window_sum, inverse_power = lrn_module._window_sum, lrn_module._inverse_power
+    lrn_module._window_sum = old_window_sum
+    lrn_module._inverse_power = lambda x, b: x ** -b
+    try:
+        yield
+    finally:
+        lrn_module._window_sum, lrn_module._inverse_power = window_sum, inverse_power
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=32, channel=96, size=27):
+    x = rm.Variable(np.random.rand(batch, channel, size, size).astype(precision))
+    dy = np.random.rand(*x.shape).astype(precision)
+    xs = np.square(x.as_ndarray())
+    print('{:>4} {:>12} {:>12} {:>12} {:>12}'.format('n', 'old sum', 'sum', 'old lrn', 'lrn'))
+    for n in (3, 5, 9, 15, 31):
+        assert np.allclose(_window_sum(xs, n), old_window_sum(xs, n), rtol=1e-4, atol=1e-4)
+        with patched():
+            expected = lrn(x, n).grad(dy).get(x)
+        assert np.allclose(lrn(x, n).grad(dy).get(x), expected, rtol=1e-4, atol=1e-6)
+
+        def new_lrn():
+            return lrn(x, n).grad(dy)
+
+        def old_lrn():
+            # lrn with the former window sum and np.power.
+            with patched():
+                return lrn(x, n).grad(dy)
+
+        times = [bench(lambda: old_window_sum(xs, n)), bench(lambda: _window_sum(xs, n)),
+                 bench(old_lrn), bench(new_lrn)]
+        print('{:>4}'.format(n) + ''.join(' {:>10.2f}ms'.format(t * 1000) for t in times))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
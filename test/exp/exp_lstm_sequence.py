@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares a training step of Lstm called for each timestep with
+Lstm(sequence=True), which processes the whole sequence in one node.
+The default sizes follow example/simple_mnist_lstm.py.
+
+    $ python exp_lstm_sequence.py [batch] [timesteps] [input_size] [hidden]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+class StepModel(rm.Model):
+
+    def __init__(self, hidden):
+        self.lstm = rm.Lstm(hidden)
+        self.fc = rm.Dense(10)
+
+    def forward(self, x):
+        self.lstm.truncate()
+        for t in range(x.shape[1]):
+            h = self.lstm(x[:, t])
+        return self.fc(h)
+
+
+class SequenceModel(rm.Model):
+
+    def __init__(self, hidden):
+        self.lstm = rm.Lstm(hidden, sequence=True)
+        self.fc = rm.Dense(10)
+
+    def forward(self, x):
+        self.lstm.truncate()
+        return self.fc(self.lstm(x)[:, -1])
+
+
+def main(batch=128, timesteps=28, input_size=28, hidden=50):
+    x = np.random.rand(batch, timesteps, input_size).astype(precision)
+    y = np.eye(10, dtype=precision)[np.random.randint(10, size=batch)]
+    opt = rm.Sgd()
+
+    def step(model):
+        with model.train():
+            loss = rm.softmax_cross_entropy(model(x), y)
+        loss.grad().update(opt)
+
+    times = {}
+    for model in (StepModel(hidden), SequenceModel(hidden)):
+        step(model)
+        times[type(model).__name__] = min(timeit.repeat(lambda: step(model), repeat=5, number=3)) / 3
+    for name, t in times.items():
+        print('{:>14} {:>9.2f}ms'.format(name, t * 1000))
+    print('speedup {:.1f}x'.format(times['StepModel'] / times['SequenceModel']))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares forward and backward propagation of max_pool2d with the former
+implementation, which scattered the gradient to the argmax positions in a
+Python loop over every output element.
+
+    $ python exp_max_pool.py [batch] [channel] [size]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+from renom.layers.function.utils import im2col, col2im, out_size
+
+
+def old_max_pool(x, kernel, stride, padding):
+    N, C = x.shape[:2]
+    out_h, out_w = out_size(x.shape[2:], kernel, stride, padding)
+    col = im2col(x, (out_h, out_w), kernel, stride, padding)
+    col = col.reshape(N, C, kernel[0] * kernel[1], out_h, out_w)
+    index = np.argmax(col, axis=2)
+    return np.max(col, axis=2), index
+
+
+def old_max_pool_backward(dy, index, x_shape, kernel, stride, padding):
+    N, C, out_h, out_w = dy.shape
+    col = np.zeros((N, C, kernel[0], kernel[1], out_h, out_w))
+    col_k = np.rollaxis(col.reshape(N, C, -1, out_h, out_w), 2)
+    for i in np.ndindex(N, C, out_h, out_w):
+        col_k[index[i]][i] = dy[i]
+    return col2im(col, x_shape[2:], stride, padding)
+
+
+def bench(func, repeat=3, number=1):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=32, channel=32, size=32):
+    x = rm.Variable(np.random.rand(batch, channel, size, size).astype(precision))
+    configs = [((2, 2), (2, 2), (0, 0)), ((3, 3), (3, 3), (0, 0)),
+               ((3, 3), (2, 2), (1, 1)), ((3, 3), (1, 1), (1, 1))]
+    print('{:>18} {:>11} {:>11} {:>11} {:>11}'.format(
+        'kernel/stride/pad', 'old fwd', 'fwd', 'old bwd', 'bwd'))
+    for kernel, stride, padding in configs:
+        y, index = old_max_pool(x.as_ndarray(), kernel, stride, padding)
+        dy = np.random.rand(*y.shape).astype(precision)
+        z = rm.max_pool2d(x, kernel, stride, padding)
+        assert np.array_equal(z.as_ndarray(), y)
+        dx = old_max_pool_backward(dy, index, x.shape, kernel, stride, padding)
+        assert np.allclose(z.grad(dy, detach_graph=False).get(x), dx)
+        times = [
+            bench(lambda: old_max_pool(x.as_ndarray(), kernel, stride, padding)),
+            bench(lambda: rm.max_pool2d(x, kernel, stride, padding)),
+            bench(lambda: old_max_pool_backward(dy, index, x.shape, kernel, stride, padding)),
+            bench(lambda: z.grad(dy, detach_graph=False)),
+        ]
+        print('{:>18}'.format('%dx%d/%d/%d' % (kernel + stride[:1] + padding[:1])) +
+              ''.join(' {:>9.2f}ms'.format(t * 1000) for t in times))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
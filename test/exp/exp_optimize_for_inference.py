@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares inference time of a convolutional network with batch
+normalization before and after rm.optimize_for_inference.
+
+    $ python exp_optimize_for_inference.py [batch] [size]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def main(batch=64, size=32):
+    model = rm.Sequential([
+        rm.Conv2d(32, padding=1), rm.BatchNormalize(mode="feature"), rm.Relu(),
+        rm.Conv2d(32, padding=1), rm.BatchNormalize(mode="feature"), rm.Relu(),
+        rm.MaxPool2d(filter=2, stride=2),
+        rm.Conv2d(64, padding=1), rm.BatchNormalize(mode="feature"), rm.Relu(),
+        rm.MaxPool2d(filter=2, stride=2), rm.Flatten(),
+        rm.Dense(128), rm.BatchNormalize(), rm.Relu(), rm.Dense(10),
+    ])
+    x = np.random.rand(batch, 3, size, size).astype(precision)
+    with model.train():
+        model(x)
+    model.set_models(inference=True)
+    folded = rm.optimize_for_inference(model)
+    print('max abs difference: %g' % np.abs(folded(x) - model(x)).max())
+
+    with rm.no_grad():
+        for name, m in (('original', model), ('folded', folded)):
+            t = min(timeit.repeat(lambda: m(x), repeat=5, number=3)) / 3
+            print('{:>9} {:>9.2f}ms  {} layers'.format(name, t * 1000, len(m._layers)))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
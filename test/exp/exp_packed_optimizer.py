@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares the update of a model with many small parameters by optimizers
+called once per parameter and by optimizers whose parameters, gradients
+and states are packed into flat buffers.
+
+    $ python exp_packed_optimizer.py [layers] [units]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(layers=200, units=16):
+    x = np.random.rand(8, units).astype(precision)
+
+    print('{:>10} {:>11} {:>11}'.format('', 'per param', 'packed'))
+    for opt_class in (rm.Sgd, rm.Adagrad, rm.Rmsprop, rm.Adam):
+        times = []
+        for pack in (False, True):
+            model = rm.Sequential([rm.Dense(units, input_size=units) for _ in range(layers)])
+            opt = opt_class()
+            if pack:
+                opt.pack(model)
+            with model.train():
+                loss = rm.sum(model(x))
+            grads = loss.grad()
+            times.append(bench(lambda: grads.update(opt)))
+        print('{:>10} {:>9.2f}ms {:>9.2f}ms'.format(opt_class.__name__, times[0] * 1000, times[1] * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares memory of arrays kept for backward propagation and time of a
+training step of a convolutional network with and without float16 storage.
+
+    $ python exp_precision_policy.py [batch]
+"""
+from __future__ import print_function
+import sys
+import time
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def step(model, x):
+    with rm.profile(callsite=False) as p:
+        start = time.time()
+        with model.train():
+            loss = rm.sum(model(x))
+        loss.grad()
+        t = time.time() - start
+    return t, sum(r['attr_bytes'] for r in p.records())
+
+
+def main(batch=32):
+    model = rm.Sequential([
+        rm.Conv2d(16, padding=1), rm.Relu(), rm.Dropout(0.2),
+        rm.Conv2d(16, padding=1), rm.Relu(), rm.MaxPool2d(2, stride=2),
+        rm.Flatten(), rm.Dense(10),
+    ])
+    x = np.random.rand(batch, 3, 32, 32).astype(precision)
+    model(x)
+    for storage in (None, np.float16):
+        model.set_precision_policy(storage=storage)
+        t, nbytes = step(model, x)
+        print('storage={:<8} {:>8.2f} ms {:>8.1f} MB'.format(
+            np.dtype(storage or precision).name, t * 1000, nbytes / 2.**20))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares a training step of an output layer with a full softmax cross
+entropy and with the sampled softmax cross entropy, both followed by an
+Sgd update of the weight and the bias of the Dense output layer.
+
+    $ python exp_sampled_softmax.py [batch] [size] [classes] [sampled]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=64, size=256, classes=100000, sampled=256):
+    x = rm.Variable(np.random.rand(batch, size).astype(precision))
+    y = np.random.randint(0, classes, batch)
+    layer = rm.Dense(classes, input_size=size)
+    opt = rm.Sgd()
+    loss_func = rm.SampledSoftmaxCrossEntropy(sampled, "log_uniform", seed=0, sparse_grad=True)
+
+    def full():
+        with layer.train():
+            loss = rm.softmax_cross_entropy(layer(x), y)
+        loss.grad().update(opt)
+
+    def sampled_step():
+        with layer.train():
+            loss = loss_func(x, y, layer)
+        loss.grad().update(opt)
+
+    print('{:>10} {:>11}'.format('', 'step'))
+    for name, func in (('full', full), ('sampled', sampled_step)):
+        print('{:>10} {:>9.2f}ms'.format(name, bench(func) * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares softmax cross entropy of the former implementation, which
+applied the softmax node and took the logarithm of its output, with the
+single pass log-sum-exp implementation given one-hot targets and integer
+class indices.
+
+    $ python exp_softmax_cross_entropy.py [batch] [classes]
+"""
+from __future__ import print_function
+import sys
+import timeit
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+def old_forward(x, y):
+    z = rm.softmax(x)
+    return -np.sum(y * np.log(z + 1e-8)) / len(x), z
+
+
+def old_backward(z, y):
+    return (z - y) / len(z)
+
+
+def step(x, y):
+    loss = rm.softmax_cross_entropy(x, y)
+    loss.grad()
+
+
+def bench(func, repeat=5, number=3):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(batch=64, classes=50000):
+    x = rm.Variable(np.random.randn(batch, classes).astype(precision))
+    label = np.random.randint(0, classes, batch)
+    onehot = np.zeros(x.shape, dtype=precision)
+    onehot[np.arange(batch), label] = 1
+
+    print('{:>10} {:>11} {:>11}'.format('', 'step', 'target[MB]'))
+    rows = [
+        ('old', bench(lambda: old_backward(old_forward(x, onehot)[1], onehot)), onehot.nbytes),
+        ('one-hot', bench(lambda: step(x, onehot)), onehot.nbytes),
+        ('label', bench(lambda: step(x, label)), label.nbytes),
+    ]
+    for name, t, nbytes in rows:
+        print('{:>10} {:>9.2f}ms {:>11.3f}'.format(name, t * 1000, nbytes / 2.**20))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
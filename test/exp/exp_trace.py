@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compares the time of a small batch training step built at every
+iteration with the step replayed by renom.trace.
+
+    $ python exp_trace.py
+"""
+from __future__ import print_function
+import time
+import numpy as np
+import renom as rm
+from renom.config import precision
+
+
+class Rnn(rm.Model):
+    def __init__(self):
+        self.lstm = rm.Lstm(32)
+        self.dense = rm.Dense(10)
+
+    def forward(self, x):
+        self.lstm.truncate()
+        for t in range(x.shape[1]):
+            h = self.lstm(x[:, t])
+        return self.dense(h)
+
+
+def mlp():
+    model = rm.Sequential([rm.Dense(64), rm.Relu(), rm.Dense(64), rm.Relu(), rm.Dense(10)])
+    return model, (8, 32)
+
+
+def rnn():
+    return Rnn(), (8, 20, 16)
+
+
+def bench(build, iteration=200):
+    model, shape = build()
+    opt = rm.Sgd(0.01)
+    x = np.random.rand(*shape).astype(precision)
+    y = np.random.rand(shape[0], 10).astype(precision)
+
+    def step(x, y):
+        with model.train():
+            return rm.mean_squared_error(model(x), y)
+
+    step(x, y)
+    start = time.time()
+    for _ in range(iteration):
+        step(x, y).grad().update(opt)
+    eager = (time.time() - start) / iteration
+
+    traced = rm.trace(step, x, y)
+    start = time.time()
+    for _ in range(iteration):
+        traced(x, y)
+        traced.grad().update(opt)
+    replay = (time.time() - start) / iteration
+    return eager, replay
+
+
+def main():
+    print('{:>6} {:>12} {:>12}'.format('model', 'eager[ms]', 'replay[ms]'))
+    for build in (mlp, rnn):
+        eager, replay = bench(build)
+        print('{:>6} {:>12.3f} {:>12.3f}'.format(build.__name__, eager * 1000, replay * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -352,6 +352,29 @@ def test_dense(node, use_gpu):
     compare(func, layer.params["b"], node)
 
 
+@pytest.mark.parametrize("node", [
+    Variable(rand((2, 2))),
+    Variable(rand((3, 1))),
+])
+@pytest.mark.parametrize("activation, act", [
+    ["relu", rm.relu],
+    ["sigmoid", rm.sigmoid],
+    ["tanh", rm.tanh],
+])
+def test_dense_activation(node, activation, act, use_gpu):
+    node = Variable(node)
+    set_cuda_active(use_gpu)
+
+    layer = Dense(output_size=3, input_size=node.shape[1], activation=activation)
+    assert np.allclose(layer(node), act(rm.dot(node, layer.params.w) + layer.params.b), atol=1e-6)
+
+    def func(node):
+        return sum(layer(node))
+    compare(func, node, node)
+    compare(func, layer.params["w"], node)
+    compare(func, layer.params["b"], node)
+
+
 @pytest.mark.parametrize("node", [
     np.array([[0, ], [1, ]]),
     np.array([[0, ], [1, ], [0, ]]),
@@ -388,12 +411,19 @@ def test_batch_normalize(node, use_gpu):
 @pytest.mark.parametrize("node", [
     Variable(rand((2, 2, 3, 3))),
     Variable(rand((2, 3, 4, 5))),
+    Variable(rand((1, 8, 2, 2))),
 ])
-def test_lrn(node, use_gpu):
+@pytest.mark.parametrize("n, a", [
+    [5, 1e-4],
+    [1, 0.5],
+    [3, 0.5],
+    [7, 0.5],
+])
+def test_lrn(node, n, a, use_gpu):
     node = Variable(node)
     set_cuda_active(use_gpu)
 
-    layer = Lrn()
+    layer = Lrn(n=n, a=a)
 
     def func(node):
         return sum(layer(node))
@@ -434,6 +464,33 @@ def test_conv2d(node, use_gpu):
     compare(func, layer.params["b"], node)
 
 
+@pytest.mark.parametrize("algorithm", ["gemm", "winograd", "fft"])
+@pytest.mark.parametrize("filter, padding, stride", [
+    [3, 1, 1],
+    [3, 0, 2],
+    [5, 2, 1],
+    [2, 3, 1],
+])
+def test_conv2d_algorithm(algorithm, filter, padding, stride):
+    from renom.layers.function import conv_engine
+    node = Variable(rand((2, 2, 5, 6)))
+    set_cuda_active(False)
+
+    layer = Conv2d(channel=3, filter=filter, padding=padding, stride=stride)
+    layer2 = Deconv2d(channel=2, filter=filter, padding=padding, stride=stride)
+
+    def func(node):
+        return sum(layer2(layer(node)))
+
+    conv_engine.set_algorithm(algorithm)
+    try:
+        compare(func, node, node)
+        compare(func, layer.params["w"], node)
+        compare(func, layer2.params["w"], node)
+    finally:
+        conv_engine.set_algorithm(None)
+
+
 @pytest.mark.parametrize("node", [
     Variable(rand((2, 3, 3, 3))),
     Variable(rand((2, 3, 4, 5))),
@@ -481,6 +538,30 @@ def test_average_pool2d(node, use_gpu):
     compare(func, node, node)
 
 
+@pytest.mark.parametrize("shape", [
+    (2, 3, 4, 4),
+    (2, 3, 5, 7),
+])
+@pytest.mark.parametrize("filter, stride, padding", [
+    [2, 2, 0],
+    [(2, 3), (2, 3), 0],
+    [2, 2, 1],
+    [3, 2, 1],
+])
+@pytest.mark.parametrize("layer_class", [MaxPool2d, AveragePool2d])
+def test_pool2d_stride(shape, filter, stride, padding, layer_class, use_gpu):
+    # Distinct positive values keep maximums apart from each other and from
+    # the zero padding.
+    node = Variable((np.random.permutation(np.prod(shape)).reshape(shape) + 1) / 10.)
+    set_cuda_active(use_gpu)
+
+    layer = layer_class(filter=filter, stride=stride, padding=padding)
+
+    def func(node):
+        return sum(layer(node))
+    compare(func, node, node)
+
+
 @pytest.mark.parametrize("node, seed", [
     [Variable(rand((2, 2))), 1],
     [Variable(rand((2, 5))), 2],
@@ -568,6 +649,28 @@ def test_lstm_temporal_connection(node, use_gpu):
         compare(func, layer1.params[k], node)
 
 
+@pytest.mark.parametrize("node", [
+    Variable(rand((2, 3, 2))),
+    Variable(rand((2, 1, 1))),
+    Variable(rand((1, 4, 2))),
+])
+def test_lstm_sequence(node, use_gpu):
+    node = Variable(node)
+    set_cuda_active(use_gpu)
+
+    layer1 = Lstm(output_size=4, sequence=True)
+
+    def func(node):
+        z = layer1(node)
+        loss = sum(z) + sum(z[:, -1] * z[:, 0])
+        layer1.truncate()
+        return loss
+
+    compare(func, node, node)
+    for k in layer1.params.keys():
+        compare(func, layer1.params[k], node)
+
+
 @pytest.mark.parametrize("node", [
     Variable(rand((2, 2))),
     Variable(rand((2, 1))),
@@ -629,6 +732,39 @@ def test_softmax_cross_entropy(node, x, use_gpu):
     compare(func, node, node, x)
 
 
+@pytest.mark.parametrize("shape", [(2, 3), (1, 2), (3, 4, 2, 2)])
+def test_softmax_cross_entropy_label(shape, use_gpu):
+    node = Variable(rand(shape))
+    label = np.random.randint(0, shape[1], (shape[0], ) + shape[2:])
+    set_cuda_active(use_gpu)
+
+    onehot = np.moveaxis(np.eye(shape[1])[label], -1, 1)
+    assert np.allclose(rm.softmax_cross_entropy(node, label),
+                       rm.softmax_cross_entropy(node, onehot), atol=1e-5)
+
+    def func(node):
+        return rm.softmax_cross_entropy(node, label)
+    compare(func, node, node)
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "log_uniform", np.arange(1, 11)])
+@pytest.mark.parametrize("use_bias", [True, False])
+def test_sampled_softmax_cross_entropy(distribution, use_bias):
+    set_cuda_active(False)
+    node = Variable(rand((3, 4)))
+    w = Variable(rand((4, 10)))
+    b = Variable(rand((1, 10))) if use_bias else None
+    y = np.array([1, 7, 1])
+
+    def func(node):
+        generator = np.random.RandomState(0)
+        return rm.sampled_softmax_cross_entropy(node, y, w, b, 5, distribution, generator)
+    compare(func, node, node)
+    compare(func, w, node)
+    if use_bias:
+        compare(func, b, node)
+
+
 @pytest.mark.parametrize("node, x", [
     [Variable(rand((1, 1))), Variable(randInteger((1, 1)))],
     [Variable(rand((2, 1))), Variable(randInteger((2, 1)))],
@@ -714,6 +850,27 @@ def test_concat(node, axis, use_gpu):
     compare(func, node[0], node)
 
 
+@pytest.mark.parametrize("index", [
+    1,
+    slice(1, 3),
+    (slice(None), 2),
+    (Ellipsis, None, slice(0, 2)),
+    [0, 0, 2],
+    np.array([[1, 1], [2, 0]]),
+    (np.array([0, 2, 2]), np.array([1, 1, 1])),
+    np.array([True, False, True]),
+])
+def test_getitem(index, use_gpu):
+    node = Variable(rand((3, 4)))
+    set_cuda_active(use_gpu)
+    w = rand(node.as_ndarray()[index].shape)
+
+    def func(node):
+        # Gradients of several items of the same node are accumulated.
+        return sum(node[index] * w) + sum(node[1:] * 2) + sum(node[index])
+    compare(func, node, node)
+
+
 @pytest.mark.parametrize("node", [
     Variable(rand((2, 2))),
     Variable(rand((2, 2, 1, 1))),
@@ -1634,3 +1634,27 @@ def test_rand():
     g2 = x.new_array()
 
     assert np.allclose(g1, g2)
+
+
+@test_utility.skipgpu
+@pytest.mark.parametrize("opt_class", [rm.Sgd, rm.Adagrad, rm.Rmsprop, rm.Adam])
+def test_gpu_fused_compute(opt_class):
+    # Fused update rules and losses are evaluated on GPUValue objects, with
+    # scalars on either side of the operators.
+    a = rand((2, 3))
+    b = randInt((2, 3))
+    dy = rand((2, 3))
+    results = []
+    for use_gpu in (False, True):
+        set_cuda_active(use_gpu)
+        w = Variable(a)
+        opt = opt_class()
+        steps = [opt(get_gpu(dy) if use_gpu else dy, w) for _ in range(2)]
+        loss = rm.sigmoid_cross_entropy(Variable(a), b)
+        for v in steps + [loss]:
+            if use_gpu:
+                v = get_gpu(v).new_array()
+            results.append(to_value(v))
+    set_cuda_active(False)
+    for c, g in zip(results[:3], results[3:]):
+        close(c, g)
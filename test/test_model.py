@@ -6,6 +6,7 @@ import renom as rm
 from renom.core import Variable, to_value, DEBUG_GRAPH_INIT, DEBUG_NODE_GRAPH
 from renom.cuda.cuda import set_cuda_active
 from renom.cuda import use_device
+from renom.config import precision
 import test_utility
 
 set_cuda_active(True)
@@ -226,3 +227,234 @@ def test_multi_gpu():
                            org_l1_w + grad2.get(nn2.layer1.params.w).copy())
 
         grad1.update(models=[nn])
+
+
+def test_trace():
+    set_cuda_active(False)
+    model = rm.Sequential([rm.Dense(5), rm.Relu(), rm.Dense(2)])
+    data = [(np.random.rand(4, 3).astype(precision),
+             np.random.rand(4, 2).astype(precision)) for _ in range(3)]
+
+    def step(x, y):
+        with model.train():
+            return rm.mean_squared_error(model(x), y)
+
+    traced = rm.trace(step, *data[0])
+    for x, y in data:
+        loss1 = step(x, y)
+        grad1 = loss1.grad()
+        loss2 = traced(x, y)
+        grad2 = traced.grad()
+        assert np.allclose(loss1, loss2)
+        for layer in (model[0], model[2]):
+            for p in layer.params.values():
+                assert np.allclose(grad1.get(p), grad2.get(p))
+
+    with pytest.raises(ValueError):
+        traced(np.random.rand(5, 3), np.random.rand(5, 2))
+
+
+def test_trace_lstm():
+    set_cuda_active(False)
+
+    class Rnn(rm.Model):
+        def __init__(self):
+            self.lstm = rm.Lstm(4)
+            self.dense = rm.Dense(2)
+
+        def forward(self, x):
+            self.lstm.truncate()
+            for t in range(x.shape[1]):
+                h = self.lstm(x[:, t])
+            return self.dense(h)
+
+    model = Rnn()
+    opt = rm.Sgd(0.1)
+    data = [(np.random.rand(3, 5, 2).astype(precision),
+             np.random.rand(3, 2).astype(precision)) for _ in range(3)]
+
+    def step(x, y):
+        with model.train():
+            return rm.mean_squared_error(model(x), y)
+
+    traced = rm.trace(step, *data[0])
+    for x, y in data:
+        loss1 = step(x, y)
+        loss2 = traced(x, y)
+        assert np.allclose(loss1, loss2)
+        traced.grad().update(opt)
+
+
+def test_trace_reuses_nodes(monkeypatch):
+    set_cuda_active(False)
+
+    class Net(rm.Model):
+        def __init__(self):
+            self.lstm = rm.Lstm(4)
+            self.dense = rm.Dense(3, activation="tanh")
+            self.out = rm.Dense(2)
+
+        def forward(self, x):
+            self.lstm.truncate()
+            for t in range(x.shape[1]):
+                h = self.lstm(x[:, t])
+            return self.out(rm.relu(self.dense(h)))
+
+    model = Net()
+    data = [(np.random.rand(3, 4, 2).astype(precision),
+             np.random.rand(3, 2).astype(precision)) for _ in range(3)]
+
+    def step(x, y):
+        with model.train():
+            return rm.softmax_cross_entropy(model(x), y) + rm.sum(model.out.params.w ** 2)
+
+    traced = rm.trace(step, *data[0])
+    recorded = [r.node for r in traced._records]
+    assert len(set(type(n) for n in recorded)) > 5
+
+    created = []
+    create_node = rm.Node._create_node.__func__
+
+    def counting(cls, value):
+        ret = create_node(cls, value)
+        created.append(ret)
+        return ret
+    monkeypatch.setattr(rm.Node, "_create_node", classmethod(counting))
+
+    for x, y in data:
+        loss = traced(x, y)
+        # Every node created at replay is a recorded node.
+        assert created and all(any(c is n for n in recorded) for c in created)
+        assert all(r.node is n for r, n in zip(traced._records, recorded))
+        del created[:]
+
+        monkeypatch.undo()
+        assert np.allclose(loss, step(x, y))
+        traced.grad()
+        monkeypatch.setattr(rm.Node, "_create_node", classmethod(counting))
+
+
+@pytest.mark.parametrize("every", [1, 2, 4])
+def test_checkpoint(every):
+    set_cuda_active(False)
+    model = rm.Sequential([rm.Conv2d(3, padding=1), rm.BatchNormalize(mode='feature'),
+                           rm.Relu(), rm.Dropout(), rm.Conv2d(3, padding=1), rm.Relu(),
+                           rm.MaxPool2d(filter=2, stride=2), rm.Flatten(), rm.Dense(2)])
+    x = rm.Variable(np.random.rand(2, 2, 4, 4))
+    model(x.as_ndarray())
+    params = [p for m in model.iter_models() for p in m.params.values()]
+
+    grads = []
+    for k in (None, every):
+        model._checkpoint_every = k
+        np.random.seed(10)
+        with model.train():
+            loss = rm.sum(model(x) * np.arange(4).reshape(2, 2))
+        grad = loss.grad()
+        grads.append([grad.get(x)] + [grad.get(p) for p in params])
+
+    for g1, g2 in zip(*grads):
+        assert np.allclose(g1, g2)
+
+
+def test_optimize_for_inference():
+    set_cuda_active(False)
+
+    class Net(rm.Model):
+        def __init__(self):
+            self.features = rm.Sequential([rm.Conv2d(4, padding=1), rm.BatchNormalize(mode='feature'),
+                                           rm.Relu(), rm.Flatten()])
+            self.classifier = rm.Sequential([rm.Dense(5), rm.BatchNormalize(), rm.Relu(),
+                                             rm.BatchNormalize(), rm.Dense(2)])
+
+        def forward(self, x):
+            return self.classifier(self.features(x))
+
+    model = Net()
+    x = np.random.rand(8, 3, 5, 5).astype(precision)
+    for _ in range(3):
+        with model.train():
+            model(np.random.rand(8, 3, 5, 5).astype(precision))
+    model.set_models(inference=True)
+    expected = model(x)
+    w = model.features[0].params.w.copy()
+
+    folded = rm.optimize_for_inference(model)
+    assert len(folded.features._layers) == 3
+    # The second BatchNormalize follows Relu and is not folded.
+    assert len(folded.classifier._layers) == 4
+    assert np.allclose(folded(x), expected, atol=1e-4)
+
+    # The original model is not modified.
+    assert len(model.features._layers) == 4
+    assert np.allclose(model.features[0].params.w, w)
+    assert np.allclose(model(x), expected)
+
+    # Batch normalization after a Dense layer with activation is not folded.
+    model = rm.Sequential([rm.Dense(5, activation="relu"), rm.BatchNormalize()])
+    with model.train():
+        model(x.reshape(8, -1))
+    model.set_models(inference=True)
+    assert len(rm.optimize_for_inference(model)._layers) == 2
+
+
+@pytest.mark.parametrize("opt_class", [rm.Sgd, rm.Adagrad, rm.Rmsprop, rm.Adam])
+def test_packed_optimizer(opt_class):
+    set_cuda_active(False)
+
+    class Net(rm.Model):
+        def __init__(self):
+            self.l0 = rm.Dense(4, input_size=3)
+            self.l1 = rm.Dense(2, input_size=4)
+            self.extra = rm.Dense(2, input_size=4)
+
+        def forward(self, x, use_extra=False):
+            h = rm.relu(self.l0(x))
+            return self.l1(h) + (self.extra(h) if use_extra else 0)
+
+    models = []
+    for pack in (False, True):
+        np.random.seed(0)
+        model = Net()
+        opt = opt_class()
+        if pack:
+            assert opt.pack(model) is opt
+            w = model.l0.params.w
+        for i in range(4):
+            x = np.random.rand(5, 3)
+            with model.train():
+                # Parameters of ``extra`` have gradients only in some steps.
+                loss = rm.sum(model(x, use_extra=i % 2 == 0))
+            loss.grad().update(opt)
+        with model.train(), model.l1.prevent_update():
+            loss = rm.sum(model(x, use_extra=True))
+        loss.grad().update(opt)
+        models.append(model)
+
+    dense, packed = models
+    # Parameters of the model share the buffer.
+    assert packed.l0.params.w is w
+    assert np.shares_memory(w, opt._packed.value)
+    for name in ("l0", "l1", "extra"):
+        for k in ("w", "b"):
+            assert np.allclose(getattr(dense, name).params[k], getattr(packed, name).params[k],
+                               atol=1e-6)
+
+
+@pytest.mark.parametrize("opt_class", [rm.Sgd, rm.Adagrad, rm.Rmsprop, rm.Adam])
+def test_packed_optimizer_without_grad(opt_class):
+    set_cuda_active(False)
+    model = rm.Sequential([rm.Dense(4, input_size=3), rm.Dense(2)])
+    unused = rm.Dense(2, input_size=4)
+    model.unused = unused
+    opt = opt_class().pack(model)
+    before = unused.params.w.as_ndarray()
+    # Parameters which have never had gradients are not updated, and no
+    # floating point error occurs for them.
+    with np.errstate(all='raise'):
+        for _ in range(2):
+            with model.train():
+                loss = rm.sum(model(np.random.rand(5, 3)))
+            loss.grad().update(opt)
+    assert np.all(unused.params.w == before)
+    assert np.all(np.isfinite(model[0].params.w))
@@ -54,3 +54,574 @@ def test_grad():
     assert g._refcounts[id(g3)] == g._backwards[id(g3)]
     assert g._refcounts[id(g4)] == g._backwards[id(g4)]
     assert g._refcounts[id(g5)] == g._backwards[id(g5)]
+
+
+def test_grad_deep_graph():
+    x = Variable(np.array([1., 2.]))
+    h = x
+    for _ in range(3000):
+        h = h + x
+    g = rm.sum(h).grad()
+    assert np.allclose(g.get(x), [3001., 3001.])
+
+
+def test_grad_shared_buffer():
+    x = Variable(np.array([1., 2.]))
+    y = Variable(np.array([3., 4.]))
+    g = ((x + y) + x).grad(np.array([1., 1.]))
+    assert np.allclose(g.get(x), [2., 2.])
+    assert np.allclose(g.get(y), [1., 1.])
+
+
+def test_grad_release_graph():
+    x = Variable(np.array([1., 2.]))
+    h = x * 2
+    y = h + x
+    g = y.grad(np.array([1., 1.]))
+    assert not h.attrs.get_names()
+    assert g.get(h, None) is None
+    assert np.allclose(g.get(x), [3., 3.])
+
+    h = x * 2
+    y = h + x
+    g = y.grad(np.array([1., 1.]), detach_graph=False)
+    assert list(h.attrs.get_names())
+    assert np.allclose(g.get(h), [1., 1.])
+    assert np.allclose(g.get(x), [3., 3.])
+
+
+def test_no_grad():
+    x = Variable(np.array([1., 2.]))
+    with rm.no_grad():
+        y = rm.sum(x * 2 + x)
+        w = Variable(np.array([1., 2.]))
+    assert np.allclose(y, 9.)
+    assert not y.attrs.get_names()
+    assert y.grad().get(x, None) is None
+
+    # Variables created in the context can be trained.
+    z = rm.sum(w * 2)
+    assert np.allclose(z.grad().get(w), [2., 2.])
+
+
+def test_inference_mode():
+    model = rm.Sequential([rm.Dense(3), rm.Dropout(), rm.Lstm(2)])
+    x = np.random.rand(4, 5)
+    with model.inference_mode():
+        z1 = model(x)
+        z2 = model(x)
+        assert model[1].inference
+
+    assert not model[1].inference
+    assert not z2.attrs.get_names()
+    assert model[2]._state is not None
+
+    model.truncate()
+    model.set_models(inference=True)
+    assert np.allclose(model(x), z1)
+    assert np.allclose(model(x), z2)
+
+
+def test_requires_grad():
+    x = Variable(np.array([[1., 2.]]))
+    c = Variable(np.array([[1., 2.]]), auto_update=False)
+    assert x.requires_grad
+    assert not c.requires_grad
+
+    h = c * 2
+    assert not h.requires_grad
+    assert not h.attrs.get_names()
+
+    y = rm.concat([h, x * 2])
+    assert y.requires_grad
+    assert np.allclose(y.grad(np.ones((1, 4))).get(x), [[2., 2.]])
+
+    model = rm.Dense(2)
+    with model.train():
+        z = model(np.random.rand(3, 2))
+    assert z.requires_grad
+
+    with model.prevent_update():
+        with model.train():
+            z = model(np.random.rand(3, 2))
+    assert not z.requires_grad
+
+
+def test_fuse():
+    def func(x, y, w, c):
+        h = -(x * y) / (w + 3.) + x ** 2
+        return h * h - 0.5 * y / x + c * x - 1.
+
+    x = Variable(np.random.rand(3, 4) + 1.)
+    y = Variable(np.random.rand(1, 4))
+    w = Variable(np.random.rand(4))
+    c = np.random.rand(3, 4)
+    dy = np.random.rand(3, 4)
+
+    z1 = func(x, y, w, c)
+    z2 = rm.fuse(func)(x, y, w, c)
+    assert np.allclose(z1, z2)
+
+    g1 = z1.grad(dy)
+    g2 = z2.grad(dy)
+    for v in (x, y, w):
+        assert g1.get(v).shape == v.shape
+        assert np.allclose(g1.get(v), g2.get(v), rtol=1e-4)
+
+    # Square roots and squares are evaluated without the generic power.
+    def root(x, w):
+        return (x ** 2 + w) ** 0.5 / 2.
+
+    z = rm.fuse(root).compute(x, w)
+    assert type(z) is np.ndarray
+    assert np.allclose(z, root(x, w))
+
+
+def test_profile(tmpdir):
+    import json
+    x = Variable(np.random.rand(2, 3))
+    with rm.profile() as p:
+        h = x * 2 + x
+        z = rm.sum(h)
+        assert h._profile_site.startswith('test_node.py')
+        z.grad()
+
+    # Call sites are released after backward calculation is recorded.
+    assert not hasattr(h, '_profile_site') and not hasattr(z, '_profile_site')
+
+    # Backward calculation may create nodes, which are recorded as forward.
+    records = {(r['name'], r['phase']): r for r in p.records(by_site=False)}
+    assert records['Add', 'backward']['calls'] == 1
+    assert records['Mul', 'backward']['calls'] == 1
+    assert records['Mul', 'forward']['output_bytes'] >= x.nbytes
+    assert all(r['site'].startswith('test_node.py') for r in p.records())
+    assert len(json.loads(p.to_json())) == len(p.records())
+
+    path = str(tmpdir.join('trace.json'))
+    p.export_chrome_trace(path)
+    with open(path) as f:
+        assert len(json.load(f)['traceEvents']) == sum(r['calls'] for r in p.records())
+
+    assert 'Mul' in p.table(sort_by='calls')
+    assert rm.core.Node.PROFILER is None
+
+    with rm.profile(max_events=3) as p:
+        for _ in range(5):
+            x * 2
+    assert len(p._events) == 3
+    assert p.records()[0]['calls'] == 5
+
+
+def test_cpu_pool():
+    from renom.mempool import BufferPool, cpu_pool
+    pool = BufferPool()
+    a = pool.empty((2, 3), np.float32)
+    b = pool.empty((2, 3), np.float32)
+    assert a is not b
+    assert pool.empty((3, 2), np.float32) is not a
+
+    # Only arrays handed out by the pool are taken back, once.
+    pool.free(a, a[1:], np.empty((2, 3), np.float32))
+    pool.free(a)
+    assert pool.stats() == {'hits': 0, 'misses': 3, 'buffers': 1, 'nbytes': 24}
+    c = pool.zeros((2, 3), np.float32)
+    assert c is a
+    assert np.all(c == 0)
+    assert pool.stats()['hits'] == 1
+
+    # Free arrays of the least recently used shapes are discarded.
+    pool.limit = 200
+    arrays = [pool.empty((n, 4), np.float64) for n in (1, 2, 3)]
+    pool.free(*arrays)
+    assert pool.stats()['nbytes'] == 32 + 64 + 96
+    pool.free(b)
+    assert pool.stats() == {'hits': 1, 'misses': 6, 'buffers': 3, 'nbytes': 24 + 64 + 96}
+    assert pool.empty((1, 4), np.float64) is not arrays[0]
+    assert pool.empty((3, 4), np.float64) is arrays[2]
+
+    pool.release()
+    assert pool.stats()['nbytes'] == 0
+
+    # Buffers of operations are given back after backward propagation.
+    model = rm.Sequential([rm.Conv2d(2, filter=3, padding=1), rm.MaxPool2d(2, stride=2)])
+    x = np.random.rand(2, 3, 6, 6)
+    cpu_pool.release()
+    cpu_pool.reset_stats()
+    for _ in range(2):
+        with model.train():
+            loss = rm.sum(model(x))
+        loss.grad()
+    stats = cpu_pool.stats()
+    assert stats['hits'] > 0 and 0 < stats['nbytes'] <= cpu_pool.limit
+
+
+def test_backward_threads():
+    towers = [rm.Sequential([rm.Dense(4), rm.Relu(), rm.Dense(3)]) for _ in range(3)]
+    head = rm.Checkpoint(rm.Dense(2))
+    x = Variable(np.random.rand(5, 6))
+
+    def grads():
+        h = rm.concat([t(x) for t in towers])
+        g = rm.sum(head(h)).grad()
+        params = [p for m in towers + [head] for sub in m.iter_models()
+                  for p in sub.params.values()]
+        return [g.get(x)] + [g.get(p) for p in params]
+
+    expected = grads()
+    rm.set_backward_threads(3)
+    try:
+        for _ in range(3):
+            for a, b in zip(grads(), expected):
+                assert np.allclose(a, b)
+    finally:
+        rm.set_backward_threads(1)
+
+
+def test_backward_threads_error():
+    import time
+    from renom.core import Node, to_value
+    started, finished = [], []
+
+    class op(Node):
+        def __new__(cls, x, fail):
+            return cls.calc_value(x, fail)
+
+        @classmethod
+        def _oper_cpu(cls, x, fail):
+            ret = cls._create_node(to_value(x))
+            ret.attrs._x = x
+            ret.attrs._fail = fail
+            return ret
+
+        def _backward_cpu(self, context, dy, **kwargs):
+            if self.attrs._fail:
+                raise ValueError('backward failed')
+            started.append(self)
+            time.sleep(0.01)
+            finished.append(self)
+            self.attrs._x._update_diff(context, dy, **kwargs)
+
+    x = Variable(np.random.rand(2, 3))
+    rm.set_backward_threads(3)
+    try:
+        for _ in range(3):
+            del started[:], finished[:]
+            z = rm.sum(rm.concat([op(op(x, False), i == 2) for i in range(6)]))
+            with pytest.raises(ValueError):
+                z.grad()
+            # Every task has finished when the error is raised.
+            assert len(started) == len(finished)
+        z = rm.sum(rm.concat([op(x, False) for i in range(6)]))
+        assert np.allclose(z.grad().get(x), 6)
+    finally:
+        rm.set_backward_threads(1)
+
+
+def test_precision_policy():
+    from renom.core import GraphAttrs, _Stored
+    x = Variable(np.random.rand(2, 3))
+    with rm.precision_policy(compute=np.float64):
+        z = rm.sum(x * x)
+        dx = z.grad().get(x)
+    assert z.dtype == np.float64
+    assert dx.dtype == np.float64
+    assert rm.sum(x * x).dtype == rm.config.precision
+    assert GraphAttrs.STORAGE_DTYPE is None
+
+    model = rm.Sequential([rm.Conv2d(2, padding=1), rm.Relu(), rm.Flatten(), rm.Dense(2)])
+    x = Variable(np.random.rand(2, 3, 4, 4))
+    grads = [rm.sum(model(x)).grad() for _ in range(2)]
+    with rm.precision_policy(storage=np.float16):
+        h = rm.Lstm(2, sequence=True)(Variable(np.random.rand(2, 3, 4)))
+    assert isinstance(h.attrs.v__attrs['_gated'], _Stored)
+    assert h.attrs._gated.dtype == rm.config.precision
+
+    model.set_precision_policy(storage=np.float16)
+    grads[1] = rm.sum(model(x)).grad()
+    for p in [x] + [p for m in model.iter_models() for p in m.params.values()]:
+        assert np.allclose(grads[0].get(p), grads[1].get(p), rtol=1e-2, atol=1e-3)
+
+    # Moving statistics of batch normalization are not stored in float16.
+    x = 1000.12 + np.random.rand(8, 3) * 1e-3
+    layers = [rm.BatchNormalize(momentum=0.5) for _ in range(2)]
+    layers[1].set_precision_policy(storage=np.float16)
+    for layer in layers:
+        with layer.train():
+            layer(x)
+    assert np.allclose(layers[0]._mov_mean, np.mean(x, axis=0) / 2)
+    assert np.array_equal(layers[0]._mov_mean, layers[1]._mov_mean)
+    assert np.array_equal(layers[0]._mov_std, layers[1]._mov_std)
+
+
+def test_grads_accumulate():
+    model = rm.Dense(2)
+    x = np.random.rand(6, 3)
+    model(x)
+    with model.train():
+        expected = rm.sum(model(x)).grad()
+
+    micro = []
+    for v in np.split(x, 3):
+        with model.train():
+            micro.append(rm.sum(model(v)).grad())
+    saved = [g.get(model.params.w).copy() for g in micro]
+
+    total = micro[0]
+    total += micro[1]
+    total += micro[2]
+    for k in ("w", "b"):
+        assert np.allclose(total.get(model.params[k]), expected.get(model.params[k]))
+    assert np.allclose(micro[1].get(model.params.w), saved[1])
+
+    total *= 0.5
+    assert np.allclose(total.get(model.params.w), expected.get(model.params.w) * 0.5)
+
+
+def test_conv_autotune(tmpdir, monkeypatch):
+    import json
+    from renom.layers.function import conv_engine
+    monkeypatch.delenv("RENOM_CONV_CACHE", raising=False)
+    monkeypatch.setattr(conv_engine, "_cache", None)
+    monkeypatch.setattr(conv_engine, "_cache_file", None)
+
+    x = np.random.rand(2, 3, 6, 6).astype(rm.config.precision)
+    w = np.random.rand(4, 3, 3, 3).astype(rm.config.precision)
+    key = conv_engine._key(x.shape, w.shape, (1, 1), (1, 1), x.dtype)
+    y, col = conv_engine.conv_forward(x, w, (1, 1), (1, 1), keep_col=True)
+    assert col is not None and conv_engine._load_cache() == {}
+
+    # Algorithms are measured after the function returns.
+    z = conv_engine.autotune(conv_engine.conv_forward, x, w, (1, 1), (1, 1))[0]
+    assert np.allclose(y, z, atol=1e-4)
+    assert conv_engine._load_cache()[key] in ("gemm", "winograd", "fft")
+    for name in ("gemm", "winograd", "fft"):
+        z = conv_engine.ALGORITHMS[name].forward(x, w, (1, 1), (1, 1))
+        assert np.allclose(y, z, atol=1e-4)
+
+    # Results of autotuning are stored only if a file is given.
+    path = str(tmpdir.join("conv.json"))
+    conv_engine.set_cache_file(path)
+    try:
+        conv_engine.autotune(conv_engine.conv_forward, x, w, (1, 1), (1, 1))
+        with open(path) as f:
+            cache = json.load(f)
+        assert list(cache) == [key]
+        monkeypatch.setattr(conv_engine, "_cache", None)
+        assert conv_engine._load_cache() == cache
+        conv_engine.clear_cache()
+        assert not tmpdir.join("conv.json").exists()
+    finally:
+        conv_engine.set_cache_file(None)
+
+    # Layers measure new configurations while autotuning is enabled, and
+    # results are stored in the default file.
+    default = tmpdir.join("default", "conv.json")
+    monkeypatch.setattr(conv_engine, "DEFAULT_CACHE_FILE", str(default))
+    layer = rm.Conv2d(4, filter=3, padding=1)
+    z = layer(x)
+    assert conv_engine._load_cache() == {} and not default.exists()
+    rm.conv_autotune(True)
+    try:
+        assert np.allclose(layer(x), z, atol=1e-4)
+        with open(str(default)) as f:
+            assert conv_engine._load_cache()[key] == json.load(f)[key]
+    finally:
+        rm.conv_autotune(False)
+
+
+def test_lstm_sequence():
+    x = np.random.rand(3, 5, 4).astype(rm.config.precision)
+    dy = np.random.rand(3, 5, 6).astype(rm.config.precision)
+    seq = rm.Lstm(6, sequence=True)
+    step = rm.Lstm(6)
+    seq(x)
+    seq.truncate()
+    step.params = seq.params
+
+    # Outputs and states are carried across calls until truncation.
+    for _ in range(2):
+        z = seq(x)
+        expected = [step(x[:, t]) for t in range(5)]
+        assert np.allclose(z, np.stack(expected, axis=1), atol=1e-5)
+
+    seq.truncate()
+    step.truncate()
+    with seq.train(), step.train():
+        z = seq(x)
+        loss = 0
+        for t in range(5):
+            loss += rm.sum(step(x[:, t]) * dy[:, t])
+    expected = loss.grad()
+    grad = z.grad(dy)
+    for k in seq.params:
+        assert np.allclose(grad.get(seq.params[k]), expected.get(step.params[k]), atol=1e-4)
+
+
+def test_dropout_seed():
+    x = Variable(np.random.rand(4, 3, 8, 8))
+    for layer_class in (rm.Dropout, rm.SpatialDropout):
+        outputs = []
+        for _ in range(2):
+            layer = layer_class(0.3, seed=3)
+            z = layer(x)
+            outputs.append(z)
+        assert np.allclose(outputs[0], outputs[1])
+        assert not np.allclose(layer(x), outputs[1])
+
+        dx = rm.sum(outputs[0]).grad().get(x)
+        kept = outputs[0] != 0
+        assert np.allclose(dx[kept], 1 / 0.7, rtol=1e-4)
+        assert np.all(dx[~kept] == 0)
+
+    # Ratio of dropped elements and packed mask.
+    z = rm.Dropout(0.3, seed=0)(Variable(np.ones((100, 1000))))
+    assert abs(np.mean(z == 0) - 0.3) < 0.01
+    assert np.allclose(np.mean(z), 1, atol=0.01)
+    assert z.attrs._mask.nbytes == 100 * 1000 // 8
+    z = rm.SpatialDropout(0.3, seed=0)(Variable(np.ones((100, 80, 2, 2))))
+    assert z.attrs._mask.nbytes == 100 * 80 // 8
+    assert np.allclose(z._unpacked_mask()[..., 0, 0], z[..., 0, 0] != 0)
+
+    # Layers without a seed use the global random state.
+    for layer_class in (rm.Dropout, rm.SpatialDropout):
+        outputs = []
+        for _ in range(2):
+            np.random.seed(5)
+            outputs.append(layer_class(0.3)(x))
+        assert np.allclose(outputs[0], outputs[1])
+
+    # Random numbers of layers are replayed in recomputation.
+    model = rm.Sequential([rm.Dense(8), rm.Dropout(seed=1), rm.Dense(2)])
+    grads = []
+    for every in (None, 1):
+        model.l1._rng = np.random.RandomState(1)
+        model._checkpoint_every = every
+        with model.train():
+            loss = rm.sum(model(x.reshape(4, -1)))
+        grads.append(loss.grad().get(model.l0.params.w))
+    assert np.allclose(grads[0], grads[1])
+
+
+def test_lrn_dynamic_range():
+    from renom.layers.function.lrn import _window_sum
+    # Small channels after large ones are not lost in the window sums.
+    x = np.random.rand(2, 16, 3, 3).astype(np.float32) * 1e-3
+    x[:, :4] = 1e8
+    for n in (3, 5, 9):
+        expected = np.zeros(x.shape)
+        for c in range(16):
+            expected[:, c] = np.sum(x[:, max(c - n // 2, 0):c + n // 2 + 1], axis=1, dtype=np.float64)
+        ret = _window_sum(x, n)
+        assert ret.dtype == np.float32
+        assert np.allclose(ret, expected, rtol=1e-3, atol=0)
+
+
+@pytest.mark.parametrize("opt_class", [rm.Sgd, rm.Adagrad, rm.Rmsprop, rm.Adam])
+def test_embedding_sparse_update(opt_class):
+    index = np.array([[1], [4], [1], [6]])
+    # Gradients are dense by default.
+    layer = rm.Embedding(output_size=3, input_size=8)
+    with layer.train():
+        z = layer(index)
+    dw = rm.sum(z * 2).grad().get(layer.params.w)
+    assert isinstance(dw, np.ndarray)
+    expected = np.zeros((8, 3))
+    expected[[1, 4, 6]] = [[4] * 3, [2] * 3, [2] * 3]
+    assert np.allclose(dw, expected)
+
+    layer = rm.Embedding(output_size=3, input_size=8, sparse_grad=True)
+    w = layer.params.w
+    with layer.train():
+        z = layer(index)
+    grad = rm.sum(z * 2).grad(detach_graph=False)
+    dw = grad.get(w)
+    assert isinstance(dw, rm.RowSparse)
+    assert np.all(dw.indices == [1, 4, 6])
+    assert np.allclose(dw.values, [[4] * 3, [2] * 3, [2] * 3])
+
+    # Accumulation and scaling keep gradients sparse.
+    grad += rm.sum(z).grad(detach_graph=False)
+    grad *= 0.5
+    dw = grad.get(w)
+    assert isinstance(dw, rm.RowSparse)
+    assert np.allclose(dw, np.asarray(dw.as_ndarray()))
+    assert np.allclose(dw.values, [[3] * 3, [1.5] * 3, [1.5] * 3])
+
+    # Updates of the touched rows are the same as dense updates and
+    # the other rows are left unchanged.
+    sparse_opt, dense_opt = opt_class(), opt_class()
+    dense = w.as_ndarray()
+    for _ in range(3):
+        before = w.as_ndarray()
+        grad.update(sparse_opt)
+        dense -= np.asarray(dense_opt(dw.as_ndarray(), dense))
+        assert np.allclose(w[dw.indices], dense[dw.indices], atol=1e-6)
+        assert np.all(np.delete(w, dw.indices, axis=0) == np.delete(before, dw.indices, axis=0))
+
+
+def test_cross_entropy_large_logits():
+    x = Variable(np.array([[1000., 0., -1000.], [-1000., 0., 1000.]]))
+    label = np.array([0, 1])
+    loss = rm.softmax_cross_entropy(x, label)
+    assert np.allclose(loss, 1000. / 2)
+    dx = loss.grad().get(x)
+    assert np.allclose(dx, [[0, 0, 0], [0, -0.5, 0.5]])
+
+    # One-hot targets of labels have the dtype of the logits.
+    from renom.layers.loss.softmax_cross_entropy import _onehot
+    for dtype in (np.float16, np.float32, np.float64):
+        onehot = _onehot(label, x.shape, dtype)
+        assert onehot.dtype == dtype
+        assert np.all(onehot == [[1, 0, 0], [0, 1, 0]])
+
+    x = Variable(np.array([[100., -100.]]))
+    y = np.array([[0., 0.]])
+    loss = rm.sigmoid_cross_entropy(x, y)
+    assert np.allclose(loss, 100.)
+    assert np.allclose(loss.grad().get(x), [[1, 0]])
+
+
+def test_sampled_softmax_cross_entropy():
+    classes = 1000
+    x = Variable(np.random.rand(4, 8))
+    y = np.array([3, 500, 3, 999])
+    layer = rm.Dense(classes, input_size=8)
+    w, b = layer.params.w, layer.params.b
+
+    loss = rm.SampledSoftmaxCrossEntropy(num_sampled=16, seed=1)(x, y, layer)
+    assert isinstance(loss.grad().get(w), np.ndarray)
+
+    loss_func = rm.SampledSoftmaxCrossEntropy(num_sampled=16, distribution="log_uniform", seed=1,
+                                              sparse_grad=True)
+    loss = loss_func(x, y, layer)
+    sampled = loss.attrs._sampled
+    assert np.all((0 <= sampled) & (sampled < classes))
+    grad = loss.grad()
+    for param in (w, b):
+        dw = grad.get(param)
+        assert isinstance(dw, rm.RowSparse) and dw.axis == 1
+        assert set(dw.indices) <= set(y) | set(sampled)
+
+    # Only the columns of the true and sampled classes are updated.
+    for opt in (rm.Sgd(), rm.Adam()):
+        before = w.as_ndarray()
+        grad.update(opt)
+        changed = np.flatnonzero(np.any(w != before, axis=0))
+        assert set(changed) <= set(y) | set(sampled)
+
+    # Same classes are sampled with the same seed.
+    loss_func2 = rm.SampledSoftmaxCrossEntropy(num_sampled=16, distribution="log_uniform", seed=1)
+    assert np.all(loss_func2(x, y, w, b).attrs._sampled == sampled)
+
+    # Training with the parameters of the layer decreases the full softmax
+    # cross entropy used for evaluation.
+    x = Variable(np.random.rand(64, 8))
+    y = np.random.randint(0, 50, 64)
+    loss_func = rm.SampledSoftmaxCrossEntropy(num_sampled=64, seed=0, sparse_grad=True)
+    opt = rm.Adam(lr=0.01)
+    before = rm.softmax_cross_entropy(layer(x), y)
+    for _ in range(50):
+        with layer.train():
+            loss = loss_func(x, y, layer)
+        loss.grad().update(opt)
+    assert rm.softmax_cross_entropy(layer(x), y) < before
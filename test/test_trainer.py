@@ -52,3 +52,30 @@ def test_trainer():
 
     trainer.train(distributor)
     assert l == set(['start', 'start_epoch', 'forward', 'backward', 'updated', 'end_epoch'])
+
+
+@pytest.mark.parametrize("batch_size, steps", [(2, 4), (3, 2)])
+def test_trainer_accumulate(batch_size, steps):
+    x = np.random.rand(8, 3)
+    y = np.random.rand(8, 2)
+    models = [rm.Dense(2) for _ in range(2)]
+    models[0](x)
+    models[1](x)
+    models[1].copy_params(models[0])
+
+    events = {'start': lambda trainer: None}
+    Trainer(models[0], 1, rm.mean_squared_error, 8, rm.Sgd(0.1),
+            shuffle=False, events=events).train(NdarrayDistributor(x, y))
+
+    # Remaining mini batches are accumulated at the end of epoch.
+    trainer = Trainer(models[1], 1, rm.mean_squared_error, batch_size, rm.Sgd(0.1),
+                      shuffle=False, events=events, accumulate_steps=steps)
+    updates = []
+    trainer.events.updated = lambda trainer: updates.append(trainer.num_accumulated)
+    trainer.train(NdarrayDistributor(x, y))
+
+    assert sum(updates) == -(-8 // batch_size)
+    if batch_size * steps == 8:
+        assert updates == [steps]
+        for k in ("w", "b"):
+            assert np.allclose(models[0].params[k], models[1].params[k])